@@ -5,10 +5,23 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+import sys
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+# Load .env before src.config reads the environment
 load_dotenv()
 
+# Make the local src package importable when running with `streamlit run`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import perf
+from src.alerts import METHODS
+from src.charts import category_colors, downsample, reuse_figure
+from src.config import PERF_WINDOW, STORE_DIR
+from src.export import EXPORT_FORMATS
+from src.query import QueryEngine
+
 # ===============================
 # PAGE CONFIG & STYLE
 # ===============================
@@ -41,34 +54,27 @@ st.markdown("""
 # ===============================
 # LOAD DATA
 # ===============================
-@st.cache_data
-def load_data():
-    path = os.getenv("CLEAN_DATA_FILE_PATH")
-    if not path:
-        raise ValueError("CLEAN_DATA_FILE_PATH not found in .env")
-    df = pd.read_csv(path)
-    df["date_inclusion"] = pd.to_datetime(df["date_inclusion"], errors="coerce")
-    disease_cols = ["Arbovirus", "ILI", "SARI", "Diarrhoea", "Malaria_case"]
-    df[disease_cols] = df[disease_cols].apply(pd.to_numeric, errors="coerce")
-    return df
+# One query engine per server process, shared by every browser session: the
+# dataset is held once and identical queries share their results. It reloads
+# by itself when the cleaned CSV or the store changes (see src.query).
+@st.cache_resource
+def get_engine():
+    return QueryEngine(store_dir=STORE_DIR)
 
 # ===============================
 # SIDEBAR
 # ===============================
-def sidebar(df):
+def sidebar(meta):
     st.sidebar.header("🛠️ Filters")
     st.sidebar.markdown("Refine your data using the filters below:")
 
     # Country
-    countries = ["All"] + sorted(df["country"].dropna().unique())
+    countries = meta["countries"]
     country = st.sidebar.selectbox("🌍 Country", countries)
     st.sidebar.caption("Select a country to filter the data")
 
     # Disease
-    disease = st.sidebar.selectbox(
-        "🦠 Disease",
-        ["Arbovirus", "ILI", "SARI", "Diarrhoea", "Malaria_case"]
-    )
+    disease = st.sidebar.selectbox("🦠 Disease", meta["diseases"])
     st.sidebar.caption("Choose the disease of interest")
 
     # Aggregation Frequency
@@ -76,7 +82,7 @@ def sidebar(df):
     st.sidebar.caption("Select how data should be aggregated")
 
     # Date range
-    min_d, max_d = df["date_inclusion"].min(), df["date_inclusion"].max()
+    min_d, max_d = pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"])
     dates = st.sidebar.date_input("📅 Date range", [min_d, max_d], min_value=min_d, max_value=max_d)
     st.sidebar.caption("Choose the time period for analysis")
 
@@ -86,219 +92,313 @@ def sidebar(df):
     return country, disease, freq, dates
 
 # ===============================
-# FILTER DATA
+# TABS
 # ===============================
-def filter_data(df, country, dates):
-    df = df[(df["date_inclusion"] >= pd.to_datetime(dates[0])) &
-            (df["date_inclusion"] <= pd.to_datetime(dates[1]))].copy()
-    if country != "All":
-        df = df[df["country"] == country]
-    return df
+# Tab payloads are computed only when their tab is open, by the engine, and
+# shared by every session through its result cache (see src.query).
+# Figures are kept per session and only their data is replaced on reruns;
+# time series are downsampled to the point budget (see src.charts)
+def figures():
+    return st.session_state.setdefault("figures", {})
 
-# ===============================
-# GROUP DATA
-# ===============================
-def group_data(df, disease, freq):
-    if freq == "Daily":
-        g = df.groupby(df["date_inclusion"].dt.date)[disease].sum()
-    elif freq == "Weekly":
-        g = df.groupby(df["date_inclusion"].dt.to_period("W"))[disease].sum()
-    elif freq == "Monthly":
-        g = df.groupby(df["date_inclusion"].dt.to_period("M"))[disease].sum()
-    elif freq == "Quarterly":
-        g = df.groupby(df["date_inclusion"].dt.to_period("Q"))[disease].sum()
+def trends_tab(grouped, disease):
+    st.subheader("📈 Trends")
+    points = downsample(grouped)
+    fig = reuse_figure(
+        figures(), "trends",
+        [
+            {"type": "bar", "x": points.index, "y": points.values, "name": "Cases",
+             "marker": {"color": points.values, "colorscale": "Blues"}},
+            # Ligne rouge qui suit exactement les barres
+            {"type": "scatter", "x": points.index, "y": points.values, "mode": "lines+markers",
+             "line": {"color": "red", "width": 3}, "name": "Trend"},
+        ],
+        title=f"{disease} cases over time", xaxis_title="Period", yaxis_title="Cases"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    if len(points) < len(grouped):
+        st.caption(f"{len(points)} of {len(grouped)} periods shown (LTTB downsampling)")
+
+def alerts_tab(engine, country, disease, freq, dates):
+    st.subheader("🚨 Epidemic Alert System")
+    method = st.selectbox("Detection method", list(METHODS), index=list(METHODS).index("C2"))
+    st.caption("rolling: mean + 2σ of the previous 8 periods · C1/C2/C3: CDC EARS · "
+               "seasonal: same period ±1 in the 3 previous years")
+    series = engine.alerts(disease, freq, country, method, *dates)
+    # Alert periods are always plotted, whatever the downsampling keeps
+    points = downsample(series, column="cases", keep=series["alert"].to_numpy())
+    fig_alert = reuse_figure(
+        figures(), "alerts",
+        [
+            {"type": "bar", "x": points.index, "y": points["cases"], "name": "Cases",
+             "marker": {"color": "#1f77b4"}},
+            {"type": "scatter", "x": points.index, "y": points["baseline"], "mode": "lines",
+             "name": "Baseline", "line": {"color": "gray", "dash": "dot"}},
+            {"type": "scatter", "x": points.index, "y": points["threshold"], "mode": "lines",
+             "name": "Threshold", "line": {"color": "red"}},
+        ]
+    )
+    st.plotly_chart(fig_alert, use_container_width=True)
+    alerts = series.loc[series["alert"], ["cases", "baseline", "threshold", "score"]]
+    if alerts.empty:
+        st.success("🟢 No epidemic signal detected.")
     else:
-        g = df.groupby(df["date_inclusion"].dt.to_period("Y"))[disease].sum()
-    g.index = g.index.astype(str)
-    return g
+        st.error("🔴 Epidemic signal detected")
+        st.dataframe(alerts.reset_index())
+        st.download_button(
+            "Download alert periods",
+            alerts.reset_index().to_csv(index=False).encode("utf-8"),
+            "alerts.csv",
+            "text/csv"
+        )
+    st.markdown(f"**Signals in the latest {freq.lower()} period (all diseases and countries)**")
+    signals = engine.signals(freq, method)
+    st.dataframe(signals[["disease", "country", "period", "cases", "threshold", "score"]])
 
-# ===============================
-# KPIs
-# ===============================
-def compute_kpis(df, grouped, disease):
-    total = int(grouped.sum()) if not grouped.empty else 0
-    peak = str(grouped.idxmax()) if not grouped.empty else "N/A"
-    cases = df[df[disease] == 1].copy()
-    male = cases["gender"].value_counts().get("Male", 0)
-    female = cases["gender"].value_counts().get("Female", 0)
-    tot = male + female
-    male_pct = int(male / tot * 100) if tot else 0
-    female_pct = int(female / tot * 100) if tot else 0
-    return total, peak, male_pct, female_pct, cases
+def gender_tab(by_gender):
+    if by_gender.sum() > 0:
+        fig_gender = reuse_figure(
+            figures(), "gender",
+            [{"type": "pie", "labels": by_gender.index, "values": by_gender.values,
+              "marker": {"colors": px.colors.sequential.RdBu}}],
+            title="Gender Distribution"
+        )
+        st.plotly_chart(fig_gender, use_container_width=True)
 
-# ===============================
-# MAIN APP
-# ===============================
-def main():
-    df = load_data()
-    country, disease, freq, dates = sidebar(df)
-    df_f = filter_data(df, country, dates)
-    grouped = group_data(df_f, disease, freq)
-    total, peak, male_pct, female_pct, cases = compute_kpis(df_f, grouped, disease)
+def cumulative_tab(engine, country, disease, freq, dates):
+    # Differences of the prefix sums kept by the engine, no cumsum per rerun
+    points = downsample(engine.cumulative(disease, freq, country, *dates))
+    fig_cum = reuse_figure(
+        figures(), "cumulative",
+        [{"type": "scatter", "x": points.index, "y": points.values, "mode": "lines+markers", "name": disease}],
+        title="Cumulative Cases Over Time"
+    )
+    st.plotly_chart(fig_cum, use_container_width=True)
 
-    # ===============================
-    # KPI CARDS
-    # ===============================
-    c1, c2, c3 = st.columns(3)
-    c1.metric("Total cases", total, delta=f"{total - grouped.mean():.0f} from mean")
-    c2.metric("Peak period", peak)
-    c3.metric("Male : Female", f"{male_pct}% : {female_pct}%")
+def statistics_tab(engine, country, disease, freq, dates):
+    stats = engine.series_stats(disease, freq, country, *dates)
+    if stats["count"]:
+        stats_df = pd.DataFrame({
+            "Statistic": ["Mean", "Median", "Std Dev", "Min", "Max", "Observations"],
+            "Value": [stats["mean"], stats["median"], stats["std"], stats["min"], stats["max"], stats["count"]]
+        })
+        st.dataframe(stats_df)
+    else:
+        st.warning("No data available.")
 
-    # ===============================
-    # TABS
-    # ===============================
-    tabs = st.tabs([
-        "📈 Trends",
-        "🚨 Alerts",
-        "👥 Gender",
-        "📊 Cumulative",
-        "📑 Descriptive statistics",
-        "📉 Comparison",
-        "🎂 Age Groups",
-        "🤒 Symptoms",
-        "🗓️ Seasonality",
-        "✅ Data Quality"
-    ])
+def comparison_tab(engine, country, dates):
+    compare = downsample(engine.comparison(country, *dates))
+    fig_compare = reuse_figure(
+        figures(), "comparison",
+        [{"type": "scatter", "x": compare.index, "y": compare[col], "mode": "lines", "name": col}
+         for col in compare.columns],
+        title="Comparison of Diseases Over Time"
+    )
+    st.plotly_chart(fig_compare, use_container_width=True)
 
-    # ===============================
-    # Trends
-    # ===============================
-    with tabs[0]:
-        st.subheader("📈 Trends")
-        fig = px.bar(
-            x=grouped.index, y=grouped.values,
-            labels={"x": "Period", "y": "Cases"},
-            color=grouped.values,
-            color_continuous_scale="Blues",
-            title=f"{disease} cases over time"
-        )
-        # Ligne rouge qui suit exactement les barres
-        fig.add_scatter(
-            x=grouped.index,
-            y=grouped.values,
-            mode="lines+markers",
-            line=dict(color="red", width=3),
-            name="Trend"
+def count_bars(key, counts, title):
+    # One coloured bar per category, from counts computed on the server
+    fig = reuse_figure(
+        figures(), key,
+        [{"type": "bar", "x": counts.index.astype(str), "y": counts.values,
+          "marker": {"color": category_colors(len(counts))}}],
+        title=title
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def age_tab(engine, country, disease, dates):
+    ages = engine.age_counts(disease, country, *dates)
+    if not ages.empty:
+        count_bars("age", ages, "Cases by Age Group")
+
+def symptoms_tab(engine, country, disease, dates):
+    # Counted on the packed symptom / disease flags of the selected records (see src.symptoms)
+    report = engine.symptom_analysis(disease, country, *dates)
+    if report["counts"].empty:
+        return
+    count_bars("symptoms", report["counts"], "Symptoms Counts")
+    if not report["cases"]:
+        st.warning("No cases found.")
+        return
+    left, right = st.columns(2)
+    with left:
+        st.markdown(f"**Symptom frequencies among the {report['cases']} {disease} cases**")
+        st.dataframe(report["conditional"].style.format("{:.1%}"))
+        st.markdown("**Most frequent symptom combinations**")
+        st.dataframe(report["combinations"].style.format({"share": "{:.1%}"}), hide_index=True)
+    with right:
+        cooc = report["cooccurrence"]
+        fig_cooc = reuse_figure(
+            figures(), "cooccurrence",
+            [{"type": "heatmap", "x": cooc.columns, "y": cooc.index, "z": cooc.to_numpy(),
+              "colorscale": "Reds"}],
+            title=f"Symptom co-occurrence ({disease} cases)"
         )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig_cooc, use_container_width=True)
 
-    # ===============================
-    # Alerts
-    # ===============================
-    with tabs[1]:
-        st.subheader("🚨 Epidemic Alert System")
-        baseline = grouped.mean()
-        threshold = baseline + 2 * grouped.std()
-        st.markdown(f"**Baseline (mean):** {baseline:.2f}")
-        st.markdown(f"**Alert threshold (mean + 2σ):** {threshold:.2f}")
-        alerts = grouped[grouped > threshold]
-        if alerts.empty:
-            st.success("🟢 No epidemic signal detected.")
-        else:
-            st.error("🔴 Epidemic signal detected")
-            st.dataframe(alerts.reset_index(name="Cases"))
-            st.download_button(
-                "Download alert periods",
-                alerts.reset_index().to_csv(index=False).encode("utf-8"),
-                "alerts.csv",
-                "text/csv"
-            )
+def seasonality_tab(engine, country, disease, dates):
+    # Profiles over every year of the data, precomputed once per data version
+    label = st.radio("Period of the year", ["Epi week (ISO)", "Month"], horizontal=True)
+    unit = "week" if label.startswith("Epi") else "month"
+    profile = engine.seasonal_profile(disease, country, unit)
+    if profile.empty:
+        st.warning("No data available.")
+        return
+    compare = engine.season_compare(disease, country, unit, dates[1])
+    low, high = [c for c in profile.columns if c.startswith("p")][:2]
+    this_year, last_year = str(compare["year"]), str(compare["year"] - 1)
+    traces = [
+        {"type": "scatter", "x": profile.index, "y": profile[high], "mode": "lines",
+         "line": {"width": 0}, "showlegend": False, "hoverinfo": "skip"},
+        {"type": "scatter", "x": profile.index, "y": profile[low], "mode": "lines", "fill": "tonexty",
+         "line": {"width": 0}, "fillcolor": "rgba(31,119,180,0.2)", "name": f"Baseline {low}–{high}"},
+        {"type": "scatter", "x": profile.index, "y": profile["median"], "mode": "lines",
+         "line": {"color": "gray", "dash": "dot"}, "name": "Baseline median"},
+    ]
+    for year, color in [(last_year, "orange"), (this_year, "red")]:
+        if year in profile.columns:
+            traces.append({"type": "scatter", "x": profile.index, "y": profile[year], "mode": "lines+markers",
+                           "line": {"color": color}, "name": year})
+    fig_season = reuse_figure(
+        figures(), f"season-{len(traces)}", traces,
+        title="Seasonal Profile of Cases", xaxis_title=label, yaxis_title="Cases"
+    )
+    st.plotly_chart(fig_season, use_container_width=True)
+    previous = compare["last_year"] if compare["last_year"] is not None else "no data"
+    st.caption(
+        f"{unit.capitalize()} {compare['period']} of {compare['year']}"
+        f"{'' if compare['complete'] else ' (so far)'}: {compare['cases']} cases · "
+        f"same period last year: {previous} · baseline median {compare['median']:.0f} "
+        f"({low}–{high}: {compare['low']:.0f}–{compare['high']:.0f}), "
+        f"over the complete periods of the years before the latest one"
+    )
 
-    # ===============================
-    # Gender
-    # ===============================
-    with tabs[2]:
-        if not cases.empty:
-            fig_gender = px.pie(cases, names="gender", title="Gender Distribution",
-                                color_discrete_sequence=px.colors.sequential.RdBu)
-            st.plotly_chart(fig_gender, use_container_width=True)
+def quality_tab(engine, country, dates):
+    # Read from the profile written once per data version, not from the records
+    st.dataframe(engine.quality_summary(country, *dates).reset_index())
+    st.caption("Whole months of the selected range · invalid: missing-value tokens (n/a, unknown, ?...) "
+               "left as text · distinct: estimated (HyperLogLog, about ±3 %)")
 
-    # ===============================
-    # Cumulative
-    # ===============================
-    with tabs[3]:
-        fig_cum = px.line(grouped.cumsum(), title="Cumulative Cases Over Time")
-        fig_cum.update_traces(mode="lines+markers")
-        st.plotly_chart(fig_cum, use_container_width=True)
+def breakdowns_tab(engine, country, disease):
+    # Group-bys over the country x age group x gender cells, written once per data version
+    labels = {"Country": "country", "Age group": "age_group", "Gender": "gender"}
+    label = st.radio("Breakdown by", list(labels), horizontal=True)
+    table = engine.breakdown(labels[label], country)
+    if table.empty or not table[disease].sum():
+        st.warning("No data available.")
+        return
+    share = table[disease] / table[disease].sum()
+    count_bars("breakdown", share * 100, f"Share of {disease} cases by {label.lower()} (%)")
+    st.markdown(f"**Cases of every disease by {label.lower()} (all dates)**")
+    st.dataframe(table)
+    st.markdown(f"**{disease} cases by age group and gender**")
+    by_age_gender = engine.breakdown_crosstab("age_group", "gender", disease, country)
+    st.dataframe(by_age_gender.set_axis(by_age_gender.columns.astype(str), axis=1))
 
-    # ===============================
-    # Descriptive statistics
-    # ===============================
-    with tabs[4]:
-        if not grouped.empty:
-            stats_df = pd.DataFrame({
-                "Statistic": ["Mean", "Median", "Std Dev", "Min", "Max", "Observations"],
-                "Value": [grouped.mean(), grouped.median(), grouped.std(), grouped.min(), grouped.max(), grouped.count()]
-            })
-            st.dataframe(stats_df)
-        else:
-            st.warning("No data available.")
+# Render time of a tab, shown under it and kept for the sidebar summary
+# (and recorded by src.perf when FISSA_PERF is on)
+@contextmanager
+def timed(name):
+    t0 = time.perf_counter()
+    with perf.stage(f"tab {name}"):
+        yield
+    ms = (time.perf_counter() - t0) * 1000
+    st.session_state.setdefault("tab_timings", {})[name] = ms
+    st.caption(f"⏱️ {name} rendered in {ms:.0f} ms")
 
-    # ===============================
-    # Comparison
-    # ===============================
-    with tabs[5]:
-        compare = df_f.groupby(df_f["date_inclusion"].dt.to_period("M"))[
-            ["Arbovirus", "ILI", "SARI", "Diarrhoea", "Malaria_case"]
-        ].sum()
-        compare.index = compare.index.astype(str)
-        fig_compare = px.line(compare, title="Comparison of Diseases Over Time")
-        st.plotly_chart(fig_compare, use_container_width=True)
+# Filtered cases of a disease, written in chunks only when the button is clicked (see src.export);
+# in low-memory mode the records are streamed from disk (see src.rowstore)
+def export(engine, country, dates, export_format, disease):
+    with perf.stage("export") as record:
+        record["rows"] = engine.row_count(country, *dates)
+        return engine.export(country, *dates, export_format, where=lambda chunk: chunk[disease] == 1)
 
-    # ===============================
-    # Age groups
-    # ===============================
-    with tabs[6]:
-        if "age" in cases.columns:
-            cases["age_group"] = pd.cut(cases["age"], [0, 5, 15, 50, 120], labels=["<5", "5–14", "15–49", "50+"])
-            fig_age = px.bar(cases["age_group"].value_counts(), title="Cases by Age Group",
-                             color=cases["age_group"].value_counts().index)
-            st.plotly_chart(fig_age, use_container_width=True)
+# ===============================
+# MAIN APP
+# ===============================
+def main():
+    # Stages are recorded only when FISSA_PERF is on (see src.perf)
+    perf.start_run()
+    with perf.stage("load_data") as record:
+        engine = get_engine()
+        meta = engine.meta()
+        record["rows"] = meta["rows"]
+    if meta["start"] is None:
+        st.warning("No dated records available.")
+        st.stop()
+    with perf.stage("sidebar"):
+        country, disease, freq, dates = sidebar(meta)
+    # Hashable dates, part of the result cache keys
+    dates = tuple(pd.Timestamp(d) for d in dates)
+    # Only counted here: the records are read when the download button is clicked
+    with perf.stage("filter_data") as record:
+        record["rows"] = engine.row_count(country, *dates)
+    # Rolled up from the per-day totals, not from the patient rows
+    with perf.stage("group_data") as record:
+        grouped = engine.timeseries(disease, freq, country, *dates)
+        record["rows"] = len(grouped)
+    with perf.stage("compute_kpis"):
+        by_gender = engine.gender_counts(disease, country, *dates)
+        kpis = engine.kpis(disease, freq, country, *dates)
 
     # ===============================
-    # Symptoms
+    # KPI CARDS
     # ===============================
-    with tabs[7]:
-        sym_cols = [c for c in df.columns if c.startswith("sym_")]
-        if sym_cols:
-            cases[sym_cols] = cases[sym_cols].apply(pd.to_numeric, errors="coerce")
-            fig_sym = px.bar(cases[sym_cols].sum(), title="Symptoms Counts",
-                             color=cases[sym_cols].sum().index)
-            st.plotly_chart(fig_sym, use_container_width=True)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Total cases", kpis["total"], delta=f"{kpis['total'] - kpis['mean']:.0f} from mean")
+    c2.metric("Peak period", kpis["peak"])
+    c3.metric("Male : Female", f"{kpis['male_pct']}% : {kpis['female_pct']}%")
 
     # ===============================
-    # Seasonality
+    # TABS
     # ===============================
-    with tabs[8]:
-        df_f["month"] = df_f["date_inclusion"].dt.month
-        season = df_f.groupby("month")[disease].sum()
-        fig_season = px.bar(season, title="Seasonal Distribution of Cases")
-        st.plotly_chart(fig_season, use_container_width=True)
+    # Only the open tab is computed; switching tabs triggers a rerun
+    renderers = {
+        "📈 Trends": lambda: trends_tab(grouped, disease),
+        "🚨 Alerts": lambda: alerts_tab(engine, country, disease, freq, dates),
+        "👥 Gender": lambda: gender_tab(by_gender),
+        "📊 Cumulative": lambda: cumulative_tab(engine, country, disease, freq, dates),
+        "📑 Descriptive statistics": lambda: statistics_tab(engine, country, disease, freq, dates),
+        "📉 Comparison": lambda: comparison_tab(engine, country, dates),
+        "🎂 Age Groups": lambda: age_tab(engine, country, disease, dates),
+        "🤒 Symptoms": lambda: symptoms_tab(engine, country, disease, dates),
+        "🗓️ Seasonality": lambda: seasonality_tab(engine, country, disease, dates),
+        "✅ Data Quality": lambda: quality_tab(engine, country, dates),
+        "🧮 Breakdowns": lambda: breakdowns_tab(engine, country, disease),
+    }
+    tabs = st.tabs(list(renderers), key="tab", on_change="rerun")
+    for tab, (name, render) in zip(tabs, renderers.items()):
+        if tab.open:
+            with tab, timed(name):
+                render()
 
-    # ===============================
-    # Data Quality
-    # ===============================
-    with tabs[9]:
-        missing = df_f.isna().mean() * 100
-        st.dataframe(missing.reset_index(name="% missing"))
+    timings = st.session_state.get("tab_timings", {})
+    with st.sidebar.expander("⏱️ Tab render times"):
+        if timings:
+            st.dataframe(pd.Series(timings, name="ms").round(1))
+        cache = engine.cache_info()
+        st.caption(f"Shared result cache: {cache['hits']} hits, {cache['misses']} misses, "
+                   f"{cache['entries']} entries, {cache['bytes'] / 1e6:.1f} / {cache['max_bytes'] / 1e6:.0f} MB")
+        if engine.low_memory:
+            st.caption(f"Low-memory mode: records on disk, {engine.ram_budget_mb} MB budget")
+
+    # Hidden unless FISSA_PERF is on: rolling p50 / p95 of every stage, all sessions
+    if perf.enabled():
+        with st.sidebar.expander("⚙️ Performance"):
+            st.dataframe(perf.summary().round(1))
+            st.caption(f"Last {PERF_WINDOW} runs per stage; JSON records on the fissa.perf logger")
 
     # ===============================
     # Download filtered data
     # ===============================
-    download_df = df.copy()
-    if country != "All":
-        download_df = download_df[download_df["country"] == country]
-    download_df = download_df[
-        (download_df["date_inclusion"] >= pd.to_datetime(dates[0])) &
-        (download_df["date_inclusion"] <= pd.to_datetime(dates[1]))
-    ]
-    download_df = download_df[download_df[disease] == 1]
-
+    # Written in chunks only when the button is clicked (see src.export)
+    export_format = st.sidebar.selectbox("💾 Export format", list(EXPORT_FORMATS))
+    extension, mime = EXPORT_FORMATS[export_format]
     st.sidebar.download_button(
         "Download filtered data",
-        download_df.to_csv(index=False).encode("utf-8"),
-        f"filtered_data_{disease}_{country}.csv",
-        "text/csv"
+        lambda: export(engine, country, dates, export_format, disease),
+        f"filtered_data_{disease}_{country}.{extension}",
+        mime
     )
 
 if __name__ == "__main__":
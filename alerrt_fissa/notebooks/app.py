@@ -4,11 +4,23 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+import sys
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables (before src.config reads them)
 load_dotenv()
 
+# Make the local src package importable when running with `streamlit run`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import perf
+from src.cache import read_csv_cached
+from src.charts import downsample
+from src.cube import build_cube, daily_totals, rollup
+from src.config import PERF_WINDOW
+from src.export import EXPORT_FORMATS, export_file
+from src.schema import build_schema
+from src.series_stats import SeriesPrefix
+
 # Load dataset from .env
 @st.cache_data
 def load_data():
@@ -16,10 +28,25 @@ def load_data():
     if not data_path:
         raise ValueError("CLEAN_DATA_FILE_PATH not found in .env")
 
-    df = pd.read_csv(data_path, parse_dates=["date_inc"])
+    # Typed Parquet cache, rebuilt only when the CSV changes; symptom and
+    # disease flags are stored as int8 (see src.schema)
+    schema = build_schema(pd.read_csv(data_path, nrows=0).columns)
+    df = read_csv_cached(data_path, schema=schema, dates=["date_inc"])
     df["sexe"] = df["sexe"].map({1: "Male", 2: "Female"})
     return df
 
+# Per-day case counts, built once per load; the time series are rolled up from these
+@st.cache_data
+def load_daily():
+    cube = build_cube(load_data(), "date_inc", ["arbovirus", "influ_like_ill"], dims=["sexe"])
+    return daily_totals(cube, ["arbovirus", "influ_like_ill"])
+
+# Prefix sums of one series, shared by every session: rolling means and
+# cumulative totals of any date range are read from them
+@st.cache_resource
+def load_prefix(disease, freq):
+    return SeriesPrefix(load_daily()[disease], freq)
+
 # Sidebar filters
 def sidebar_filters(df):
     st.sidebar.header("Filters")
@@ -45,30 +72,9 @@ def filter_data(df, disease, date_range):
 
 
 # Group data (Daily / Weekly / Monthly)
-def group_data(df_filtered, disease, freq):
-
-    if freq == "Daily":
-        grouped = df_filtered.groupby(df_filtered["date_inc"].dt.date)[disease].sum()
-        compare_grouped = df_filtered.groupby(df_filtered["date_inc"].dt.date)[["arbovirus", "influ_like_ill"]].sum()
-
-    elif freq == "Weekly":
-        grouped = df_filtered.groupby(df_filtered["date_inc"].dt.to_period("W"))[disease].sum()
-        grouped.index = grouped.index.astype(str)
-
-        compare_grouped = df_filtered.groupby(df_filtered["date_inc"].dt.to_period("W"))[
-            ["arbovirus", "influ_like_ill"]
-        ].sum()
-        compare_grouped.index = compare_grouped.index.astype(str)
-
-    elif freq == "Monthly":
-        grouped = df_filtered.groupby(df_filtered["date_inc"].dt.to_period("M"))[disease].sum()
-        grouped.index = grouped.index.astype(str)
-
-        compare_grouped = df_filtered.groupby(df_filtered["date_inc"].dt.to_period("M"))[
-            ["arbovirus", "influ_like_ill"]
-        ].sum()
-        compare_grouped.index = compare_grouped.index.astype(str)
-
+def group_data(daily, disease, freq, date_range):
+    grouped = rollup(daily, disease, freq, date_range)
+    compare_grouped = rollup(daily, ["arbovirus", "influ_like_ill"], freq, date_range)
     return grouped, compare_grouped
 
 
@@ -169,7 +175,7 @@ def set_xaxis_ticks(fig, data_index):
 
 
 # Tabs and charts
-def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
+def display_tabs(grouped, compare_grouped, cases_data, disease, freq, prefix, date_range):
 
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         f"{disease.capitalize()} Cases",
@@ -181,25 +187,27 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
     ])
 
     # Table 1: Time series
-    with tab1:
+    with tab1, perf.stage("tab cases"):
         st.subheader(f"{disease.capitalize()} Cases Over Time")
         if grouped.empty:
             st.warning("No data available.")
         else:
+            # 7-period moving average over the selected range (SeriesPrefix), then both cut to the point budget
+            rolling = prefix.moving_average(7, *date_range)
+            points = downsample(pd.DataFrame({"cases": grouped, "rolling": rolling}))
             fig = px.bar(
-                x=grouped.index,
-                y=grouped.values,
+                x=points.index,
+                y=points["cases"].values,
                 labels={"x": "Period", "y": "Cases"},
-                color=grouped.values,
+                color=points["cases"].values,
                 color_continuous_scale="Blues"
             )
-            rolling = grouped.rolling(window=7, min_periods=1).mean()
-            fig.add_scatter(x=grouped.index, y=rolling, mode="lines", name="7-day Rolling Mean", line=dict(color="red"))
-            set_xaxis_ticks(fig, grouped.index)
+            fig.add_scatter(x=points.index, y=points["rolling"], mode="lines", name="7-day Rolling Mean", line=dict(color="red"))
+            set_xaxis_ticks(fig, points.index)
             st.plotly_chart(fig, use_container_width=True)
 
     # Table 2: Gender
-    with tab2:
+    with tab2, perf.stage("tab gender"):
         st.subheader("Gender Breakdown")
         if cases_data.empty:
             st.warning("No cases found.")
@@ -215,12 +223,12 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
             st.plotly_chart(fig2, use_container_width=True)
 
     # Tab 3: Cumulative
-    with tab3:
+    with tab3, perf.stage("tab cumulative"):
         st.subheader("Cumulative Cases")
         if grouped.empty:
             st.warning("No data.")
         else:
-            cumulative = grouped.cumsum()
+            cumulative = downsample(prefix.cumulative(*date_range))
             fig3 = px.line(
                 x=cumulative.index,
                 y=cumulative.values,
@@ -229,7 +237,7 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
             st.plotly_chart(fig3, use_container_width=True)
 
     # Table 4: Compare Arbovirus vs Influenza
-    with tab4:
+    with tab4, perf.stage("tab comparison"):
         st.subheader("Disease Comparison")
         if compare_grouped.empty:
             st.warning("No comparison data.")
@@ -238,7 +246,7 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
             st.plotly_chart(fig4, use_container_width=True)
 
     # Table 5: Age groups
-    with tab5:
+    with tab5, perf.stage("tab age groups"):
         st.subheader("Age Group Distribution")
         if not cases_data.empty and "age" in cases_data:
             bins = [0, 5, 18, 120]
@@ -249,7 +257,7 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
             st.plotly_chart(fig_age, use_container_width=True)
 
     # Table 6: Symptoms
-    with tab6:
+    with tab6, perf.stage("tab symptoms"):
         st.subheader("Symptom Frequency")
         symptom_cols = [
             'thorax_1','orl_6','thorax_2','thorax_4','syst_nev_1',
@@ -270,40 +278,67 @@ def display_tabs(grouped, compare_grouped, cases_data, disease, freq):
             fig = px.bar(x=freq_symptoms.index, y=freq_symptoms.values, color=freq_symptoms.values)
             st.plotly_chart(fig, use_container_width=True)
 
+# Export of the filtered cases, recorded as a stage when FISSA_PERF is on
+def export(cases_data, export_format):
+    with perf.stage("export", rows=len(cases_data)):
+        return export_file(cases_data, export_format)
+
+
 # Download Button
 def add_download_button(cases_data):
+    # Written in chunks only when the button is clicked (see src.export)
+    export_format = st.sidebar.selectbox("Export format", list(EXPORT_FORMATS))
+    extension, mime = EXPORT_FORMATS[export_format]
     st.sidebar.download_button(
         label="Download filtered data",
-        data=cases_data.to_csv(index=False).encode("utf-8"),
-        file_name="filtered_data.csv",
-        mime="text/csv"
+        data=lambda: export(cases_data, export_format),
+        file_name=f"filtered_data.{extension}",
+        mime=mime
     )
 
 
 # Main application
 def main():
 
-    df = load_data()
+    # Stages are recorded only when FISSA_PERF is on (see src.perf)
+    perf.start_run()
+    with perf.stage("load_data") as record:
+        df = load_data()
+        daily = load_daily()
+        record["rows"] = len(df)
 
     homepage_header()
 
-    disease, freq, date_range = sidebar_filters(df)
+    with perf.stage("sidebar"):
+        disease, freq, date_range = sidebar_filters(df)
 
-    df_filtered = filter_data(df, disease, date_range)
-    grouped, compare_grouped = group_data(df_filtered, disease, freq)
+    with perf.stage("filter_data") as record:
+        df_filtered = filter_data(df, disease, date_range)
+        record["rows"] = len(df_filtered)
+    with perf.stage("group_data") as record:
+        grouped, compare_grouped = group_data(daily, disease, freq, date_range)
+        record["rows"] = len(grouped)
 
-    total_cases, peak_period_fmt, male_pct, female_pct, cases_data = calculate_kpis(
-        grouped, df_filtered, disease
-    )
+    with perf.stage("compute_kpis") as record:
+        total_cases, peak_period_fmt, male_pct, female_pct, cases_data = calculate_kpis(
+            grouped, df_filtered, disease
+        )
+        record["rows"] = len(df_filtered)
 
     display_kpis(total_cases, peak_period_fmt, male_pct, female_pct, disease)
 
     display_summary_table(total_cases, male_pct, female_pct, cases_data)
 
-    display_tabs(grouped, compare_grouped, cases_data, disease, freq)
+    display_tabs(grouped, compare_grouped, cases_data, disease, freq, load_prefix(disease, freq), date_range)
 
     add_download_button(cases_data)
 
+    # Hidden unless FISSA_PERF is on: rolling p50 / p95 of every stage, all sessions
+    if perf.enabled():
+        with st.sidebar.expander("⚙️ Performance"):
+            st.dataframe(perf.summary().round(1))
+            st.caption(f"Last {PERF_WINDOW} runs per stage; JSON records on the fissa.perf logger")
+
 
 # Run the app
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+"""
+Alerts for every frequency x disease x country: one pandas rolling baseline per
+series (rollup + rolling) vs the batch engine (src.alerts), and the incremental
+update after a new month of data vs a full recomputation.
+
+Usage: python scripts/bench_alerts.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.alerts import PERIODS_PER_YEAR, alert_series, compute_alerts, update_alerts  # noqa: E402
+from src.config import DISEASES  # noqa: E402
+from src.cube import build_cube, daily_totals, rollup  # noqa: E402
+from src.synthetic import make_clean_frame  # noqa: E402
+
+CUT = pd.Timestamp("2023-12-01")
+
+
+def per_series(daily):
+    """Rolling mean + 2 sd of the previous 8 periods, one series at a time"""
+    out = {}
+    for freq in PERIODS_PER_YEAR:
+        for country in daily.index.get_level_values(0).unique():
+            for disease in DISEASES:
+                grouped = rollup(daily, disease, freq, key=country)
+                past = grouped.shift(1).rolling(8)
+                out[freq, disease, country] = past.mean() + 2 * past.std().clip(lower=1)
+    return out
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = make_clean_frame(n_rows)
+    cube = build_cube(df, "date_inclusion", DISEASES, ["country"])
+    daily = daily_totals(cube, DISEASES, by="country")
+
+    t0 = time.perf_counter()
+    expected = per_series(daily)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rolling = compute_alerts(daily, DISEASES, methods=["rolling"])
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    alerts = compute_alerts(daily, DISEASES)
+    t_all = time.perf_counter() - t0
+
+    for (freq, disease, country), threshold in expected.items():
+        got = alert_series(rolling, "rolling", freq, disease, country)["threshold"]
+        assert np.allclose(got.reindex(threshold.index).to_numpy(), threshold.to_numpy(), equal_nan=True)
+
+    before = daily_totals(build_cube(df[df["date_inclusion"] < CUT], "date_inclusion", DISEASES, ["country"]),
+                          DISEASES, by="country")
+    previous = compute_alerts(before, DISEASES)
+    t0 = time.perf_counter()
+    updated = update_alerts(previous, daily, DISEASES, CUT)
+    t_update = time.perf_counter() - t0
+    pd.testing.assert_frame_equal(updated, alerts)
+
+    print(f"{n_rows} rows, {len(expected)} series, {len(alerts)} scored periods")
+    print(f"per-series rolling (1 method) : {t_loop:8.3f} s")
+    print(f"batch engine (1 method)       : {t_batch:8.3f} s  ({t_loop / t_batch:.0f}x)")
+    print(f"batch engine (5 methods)      : {t_all:8.3f} s")
+    print(f"incremental update (5 methods): {t_update:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Load test of the JSON API (src.api): N concurrent clients sending dashboard
+queries (time series, KPIs, alerts) to one server process.
+
+By default the server is started in a child process over a synthetic dataset;
+pass --url to load-test a running server instead.
+
+Usage: python scripts/bench_api.py [--rows 1000000] [--clients 1 4 16 64] [--seconds 5] [--url URL]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.api import make_server  # noqa: E402
+from src.config import DISEASES  # noqa: E402
+from src.query import QueryEngine  # noqa: E402
+from src.schema import memory_usage  # noqa: E402
+from src.synthetic import COUNTRIES, make_clean_frame  # noqa: E402
+
+# Random dashboard views: a few years, every country, every frequency
+YEARS = ["2019", "2020", "2021", "2022", "2023"]
+
+
+def serve(rows, conn):
+    engine = QueryEngine.from_frame(make_clean_frame(rows))
+    server = make_server(engine, port=0)
+    conn.send((server.server_port, memory_usage(engine.data()["frame"])))
+    server.serve_forever()
+
+
+def random_query(rng):
+    endpoint = rng.choice(["/timeseries", "/kpis", "/alerts"])
+    params = {
+        "disease": rng.choice(DISEASES),
+        "freq": rng.choice(["Daily", "Weekly", "Monthly"]),
+        "country": rng.choice(["All"] + COUNTRIES),
+    }
+    year = rng.choice(YEARS)
+    params.update({"start": f"{year}-01-01", "end": f"{year}-12-31"})
+    return f"{endpoint}?{urlencode(params)}"
+
+
+def client(url, seconds, seed, latencies, errors):
+    rng = random.Random(seed)
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        try:
+            urllib.request.urlopen(url + random_query(rng)).read()
+        except OSError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+
+def run(url, n_clients, seconds):
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(url, seconds, seed, latencies, errors))
+               for seed in range(n_clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ms = np.array(latencies) * 1000
+    return len(ms) / seconds, np.percentile(ms, 50), np.percentile(ms, 95), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        parent, child = mp.Pipe()
+        server = mp.Process(target=serve, args=(args.rows, child), daemon=True)
+        server.start()
+        port, frame_bytes = parent.recv()
+        url = f"http://127.0.0.1:{port}"
+        print(f"server: {args.rows} records, one shared frame of {frame_bytes / 1e6:.0f} MB")
+
+    print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for n_clients in args.clients:
+        rps, p50, p95, errors = run(url, n_clients, args.seconds)
+        print(f"{n_clients:>8} {rps:>8.0f} {p50:>8.1f} {p95:>8.1f} {errors:>7}")
+    stats = json.loads(urllib.request.urlopen(url + "/stats").read())
+    print(f"result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    if server is not None:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Syndrome classification at millions of rows: row-wise apply vs pandas boolean
+expressions (exploration notebook) vs the compiled bitmask engine (src.case_definitions).
+
+The row-wise version is timed on a sample and extrapolated.
+
+Usage: python scripts/bench_case_definitions.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.case_definitions import FISSA_PRIORITY, FISSA_RULES, classify, compile_rules, label_syndrome  # noqa: E402
+
+ROW_SAMPLE = 50_000
+BINARY = ["sym_chest", "inf_resp", "hospitalized_last_14_days", "sym_neurologic", "sym_musc_bone_joint",
+          "sym_skin_mucosa", "sym_ent", "sym_other", "malaria_result", "eti_malaria", "Malaria",
+          "recent_digestive", "sym_abdomen", "inf_digestive"]
+
+
+def make_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: (rng.random(n_rows) < 0.25).astype("float64") for col in BINARY})
+    df.loc[rng.random(n_rows) < 0.05, "hospitalized_last_14_days"] = np.nan
+    df["duration_of_symptoms"] = rng.integers(0, 20, n_rows).astype("float64")
+    return df
+
+
+def pandas_expressions(data):
+    """Definitions as written in Exploronation_All_Fissa_data.ipynb"""
+    out = pd.DataFrame(index=data.index)
+    respiratory = (data['sym_chest'] == 1) | (data['inf_resp'] == 1)
+    short = data['duration_of_symptoms'] <= 10
+    out['ILI'] = (respiratory & short & (data['hospitalized_last_14_days'] == 0)).astype(int)
+    arbo = data[['sym_neurologic', 'sym_musc_bone_joint', 'sym_skin_mucosa', 'sym_ent', 'sym_other']].sum(axis=1)
+    out['Arbovirus'] = ((~respiratory) & (arbo >= 2) & (data['hospitalized_last_14_days'] == 0)).astype(int)
+    out['Malaria_case'] = ((data['malaria_result'] == 1) | (data['eti_malaria'] == 1) | (data['Malaria'] == 1)).astype(int)
+    out['Diarrhoea'] = ((data['recent_digestive'] == 1) | (data['sym_abdomen'] == 1) |
+                        (data['inf_digestive'] == 1)).astype(int)
+    out['SARI'] = (respiratory & short & (data['hospitalized_last_14_days'] == 1)).astype(int)
+    return out
+
+
+def classify_row(row):
+    """Row-wise equivalent of the definitions and of classify_syndrome"""
+    respiratory = row['sym_chest'] == 1 or row['inf_resp'] == 1
+    short = row['duration_of_symptoms'] <= 10
+    hosp = row['hospitalized_last_14_days']
+    arbo = sum(row[c] for c in ['sym_neurologic', 'sym_musc_bone_joint', 'sym_skin_mucosa', 'sym_ent', 'sym_other'])
+    if respiratory and short and hosp == 1:
+        return 'SARI'
+    if row['malaria_result'] == 1 or row['eti_malaria'] == 1 or row['Malaria'] == 1:
+        return 'Malaria'
+    if not respiratory and arbo >= 2 and hosp == 0:
+        return 'Arbovirus'
+    if respiratory and short and hosp == 0:
+        return 'ILI'
+    if row['recent_digestive'] == 1 or row['sym_abdomen'] == 1 or row['inf_digestive'] == 1:
+        return 'Diarrhoeal disease'
+    return 'Other'
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    df = make_frame(n_rows)
+    compiled = compile_rules(FISSA_RULES)
+
+    sample = df.head(ROW_SAMPLE)
+    t0 = time.perf_counter()
+    row_labels = sample.apply(classify_row, axis=1)
+    t_row = (time.perf_counter() - t0) * n_rows / len(sample)
+
+    t0 = time.perf_counter()
+    expected = pandas_expressions(df)
+    t_pandas = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    flags = classify(df, compiled, duration_col="duration_of_symptoms")
+    labels = label_syndrome(flags, FISSA_PRIORITY)
+    t_engine = time.perf_counter() - t0
+
+    assert (flags[expected.columns].to_numpy() == expected.to_numpy()).all()
+    assert (labels.head(ROW_SAMPLE).astype(str).to_numpy() == row_labels.to_numpy()).all()
+    print(f"{n_rows} rows, {len(compiled['rules'])} definitions over {len(compiled['columns'])} columns")
+    print(f"row-wise apply (extrapolated) : {t_row:8.2f} s")
+    print(f"pandas expressions            : {t_pandas:8.2f} s")
+    print(f"bitmask engine + labels       : {t_engine:8.2f} s  ({t_row / t_engine:.0f}x vs row-wise)")
+
+
+if __name__ == "__main__":
+    main()
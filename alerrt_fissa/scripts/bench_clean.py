@@ -0,0 +1,74 @@
+"""
+Cleaning a wide synthetic CRF export: per-cell clean_column (cleaning notebook) vs src.clean.clean_frame.
+
+Usage: python scripts/bench_clean.py [rows] [columns]
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil import parser
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.clean import clean_frame, is_text  # noqa: E402
+
+TEXT_VALUES = ["Yes", "No", "  Not Done ", "N/A", "unknown", "", "___", "Positive", "negative ", "Hospital  A"]
+
+
+def clean_value(val):
+    """Per-cell implementation previously used in fissa_gambia_data_cleaning.ipynb"""
+    if pd.isna(val):
+        return val
+    val = str(val).strip()
+    try:
+        parsed_date = parser.parse(val, fuzzy=False)
+        return parsed_date.strftime('%d-%m-%Y')
+    except (ValueError, TypeError):
+        pass
+    val = val.lower()
+    if re.match(r"^\s*$|^_+$|^(n/a|na|null|none|unknown|\?)$", val, re.IGNORECASE):
+        return pd.NA
+    val = re.sub(r"\s+", "_", val)
+    return val
+
+
+def make_wide_frame(n_rows, n_cols, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = (pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, n_rows), unit="D"))
+    columns = {}
+    for i in range(n_cols):
+        if i % 10 == 0:
+            # ISO dates: dateutil reads ambiguous dd/mm/YYYY month-first, clean_frame day-first
+            values = dates.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        else:
+            values = rng.choice(np.array(TEXT_VALUES, dtype=object), n_rows)
+        values[rng.random(n_rows) < 0.2] = np.nan
+        columns[f"col_{i}"] = values
+    return pd.DataFrame(columns)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    df = make_wide_frame(n_rows, n_cols)
+    print(f"{n_rows} rows x {n_cols} object columns")
+
+    t0 = time.perf_counter()
+    per_cell = df.apply(lambda col: col.map(clean_value) if is_text(col) else col)
+    t_cell = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    vectorized = clean_frame(df)
+    t_vec = time.perf_counter() - t0
+
+    same = (per_cell.isna() == vectorized.isna()).all().all() and \
+        per_cell.fillna("").astype(str).equals(vectorized.fillna("").astype(str))
+    print(f"per-cell   : {t_cell:8.3f} s")
+    print(f"vectorized : {t_vec:8.3f} s  ({t_cell / t_vec:.0f}x faster, identical output: {same})")
+
+
+if __name__ == "__main__":
+    main()
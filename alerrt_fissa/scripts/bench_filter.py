@@ -0,0 +1,54 @@
+"""
+Filter latency against row count: boolean masks (previous filter_data) vs the sorted date index.
+
+Usage: python scripts/bench_filter.py [max_rows]
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.date_index import build_partitions, filter_sorted, sort_by_date  # noqa: E402
+from src.synthetic import make_clean_frame  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+DATES = ("2020-03-01", "2021-09-30")
+REPEAT = 5
+
+
+def mask_filter(df, country, dates):
+    df = df[(df["date_inclusion"] >= pd.to_datetime(dates[0])) &
+            (df["date_inclusion"] <= pd.to_datetime(dates[1]))].copy()
+    if country != "All":
+        df = df[df["country"] == country]
+    return df
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    print(f"{'rows':>10} {'country':>8} {'mask ms':>10} {'index ms':>10} {'speedup':>8}")
+    for n in [s for s in SIZES if s <= max_rows]:
+        df = make_clean_frame(n)
+        sorted_df = sort_by_date(df, "date_inclusion")
+        parts = build_partitions(sorted_df, "date_inclusion", "country")
+        for country in ["All", "Gambia"]:
+            expected = len(mask_filter(df, country, DATES))
+            assert len(filter_sorted(sorted_df, "date_inclusion", parts, country, *DATES)) == expected
+            t_mask = best_of(mask_filter, df, country, DATES)
+            t_index = best_of(filter_sorted, sorted_df, "date_inclusion", parts, country, *DATES)
+            print(f"{n:>10} {country:>8} {t_mask:>10.2f} {t_index:>10.3f} {t_mask / t_index:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Loading a wide CRF export: full read, dropna on columns and rows, duplicate
+renaming loop and clean_names (cleaning notebook) vs one normalization of
+the header and per-chunk pruning (src.clean.read_export).
+
+The synthetic export has hundreds of columns, a share of them empty, some
+repeated or accented headers, and a few empty records. Each load runs in a
+fresh process and reports its wall time and the growth of its peak resident
+memory (Arrow-backed strings are not seen by tracemalloc; Linux).
+
+Usage: python scripts/bench_header.py [rows] [columns]
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.clean import clean_names, read_export  # noqa: E402
+
+
+def make_wide_export(path, n_rows, n_cols, empty_share=0.3, seed=0):
+    """CSV export with numeric, text and date columns, empty columns and rows, repeated headers"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for j in range(n_cols):
+        # Repeated and accented headers, as in the CRF exports
+        name = f"Question {j % (n_cols - 20) if j >= 20 else j} (réponse)"
+        kind = j % 3
+        if rng.random() < empty_share:
+            values = np.full(n_rows, np.nan)
+        elif kind == 0:
+            values = np.where(rng.random(n_rows) < 0.5, rng.integers(0, 100, n_rows), np.nan)
+        elif kind == 1:
+            values = np.where(rng.random(n_rows) < 0.5, rng.choice(["oui", "non", "inconnu"], n_rows), None)
+        else:
+            days = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 700, n_rows), unit="D")
+            values = np.where(rng.random(n_rows) < 0.5, days.strftime("%Y-%m-%d"), None)
+        columns[j] = (name, values)
+    df = pd.DataFrame({j: values for j, (_, values) in columns.items()})
+    df.columns = [name for name, _ in columns.values()]
+    # A few records without any value
+    df.iloc[rng.choice(n_rows, n_rows // 50, replace=False)] = np.nan
+    df.to_csv(path, index=False)
+
+
+def notebook_load(path):
+    """Steps previously run by fissa_gambia_data_cleaning.ipynb"""
+    df = pd.read_csv(path)
+    df = df.dropna(axis=1, how='all')
+    df = df.dropna(axis=0, how='all')
+    new_columns, seen = [], {}
+    for col in df.columns:
+        if col not in seen:
+            seen[col] = 0
+            new_columns.append(col)
+        else:
+            seen[col] += 1
+            new_columns.append(f"{col}.{seen[col]}")
+    df.columns = new_columns
+    # janitor's clean_names returns a renamed frame
+    return df.rename(columns=dict(zip(df.columns, clean_names(df.columns))))
+
+
+def pruned_load(path):
+    return read_export(path, clean=True)[0]
+
+
+def _peak_rss():
+    """Peak resident memory of the process, in bytes (ru_maxrss survives exec, VmHWM does not)"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run(name, path, queue):
+    loads = {"notebook": notebook_load, "read_export": pruned_load}
+    before = _peak_rss()
+    t0 = time.perf_counter()
+    df = loads[name](path)
+    seconds = time.perf_counter() - t0
+    peak = _peak_rss() - before
+    queue.put((seconds, peak, df))
+
+
+def measure(name, path):
+    """Wall time, peak memory growth and result of a load in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(name, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 1_500
+    path = os.path.join(tempfile.gettempdir(), f"fissa-wide-{n_rows}x{n_cols}.csv")
+    if not os.path.exists(path):
+        make_wide_export(path, n_rows, n_cols)
+    print(f"{n_rows} x {n_cols} export, {os.path.getsize(path) / 1e6:.0f} MB on disk")
+
+    old_s, old_peak, old = measure("notebook", path)
+    new_s, new_peak, new = measure("read_export", path)
+    try:
+        pd.testing.assert_frame_equal(old.reset_index(drop=True), new, check_dtype=False)
+        same = True
+    except AssertionError:
+        same = False
+    print(f"{'':12} {'seconds':>8} {'peak MB':>8} {'shape':>14}")
+    print(f"{'notebook':12} {old_s:8.2f} {old_peak / 1e6:8.0f} {str(old.shape):>14}")
+    print(f"{'read_export':12} {new_s:8.2f} {new_peak / 1e6:8.0f} {str(new.shape):>14}")
+    print(f"{old_peak / new_peak:.1f}x less peak memory, same frame: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Peak memory of the query engine in low-memory mode (src.rowstore) against the
+in-memory engine, on a synthetic cleaned CSV.
+
+Each mode runs in a fresh process on its own copy of the CSV: a cold start
+(the Parquet cache, or the row store, is built), then a warm start where the
+engine reopens what was built, each followed by every view of Dash.py over
+a date range and a full download of the cases. The peak resident memory of
+the whole process (VmHWM, Linux) is reported and, in low-memory mode, checked
+against the RAM budget: the script exits with an error if it is exceeded.
+
+Usage: python scripts/bench_low_memory.py [rows] [budget_mb]
+"""
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+from src.config import RAM_BUDGET_MB  # noqa: E402
+from src.synthetic import make_clean_frame  # noqa: E402
+
+DATA_DIR = os.path.join(tempfile.gettempdir(), "fissa-bench")
+DISEASE = "ILI"
+DATES = ("2020-03-01", "2022-09-30")
+FREQ = "Weekly"
+
+
+def _peak_rss():
+    """Peak resident memory of the process, in bytes (ru_maxrss survives exec, VmHWM does not)"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serve(engine):
+    """Every query of the dashboard tabs, then the download of the cases; returns the bytes exported"""
+    country = "All"
+    engine.meta()
+    engine.row_count(country, *DATES)
+    engine.kpis(DISEASE, FREQ, country, *DATES)
+    engine.timeseries(DISEASE, FREQ, country, *DATES)
+    engine.gender_counts(DISEASE, country, *DATES)
+    engine.age_counts(DISEASE, country, *DATES)
+    engine.alerts(DISEASE, FREQ, country, "C2", *DATES)
+    engine.signals(FREQ, "C2")
+    engine.cumulative(DISEASE, FREQ, country, *DATES)
+    engine.series_stats(DISEASE, FREQ, country, *DATES)
+    engine.comparison(country, *DATES)
+    engine.symptom_analysis(DISEASE, country, *DATES)
+    engine.seasonal_profile(DISEASE, country, "week")
+    engine.season_compare(DISEASE, country, "week", DATES[1])
+    engine.quality_summary(country, *DATES)
+    engine.breakdown("age_group", country)
+    engine.breakdown_crosstab("age_group", "gender", DISEASE, country)
+    with engine.export(country, *DATES, "CSV (gzip)", where=lambda chunk: chunk[DISEASE] == 1) as out:
+        return out.seek(0, os.SEEK_END)
+
+
+def _run(path, low_memory, budget_mb, queue):
+    from src.query import QueryEngine
+    results = []
+    for start in ("cold", "warm"):
+        engine = QueryEngine(path=path, store_dir=None, low_memory=low_memory, ram_budget_mb=budget_mb)
+        t0 = time.perf_counter()
+        engine.data()
+        load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        size = serve(engine)
+        results.append((start, load, time.perf_counter() - t0, size, _peak_rss()))
+        del engine
+    queue.put(results)
+
+
+def measure(path, low_memory, budget_mb):
+    """Load and query times, export size and peak memory of a cold then a warm start, in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(path, low_memory, budget_mb, queue))
+    process.start()
+    results = queue.get()
+    process.join()
+    return results
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    budget_mb = int(sys.argv[2]) if len(sys.argv) > 2 else RAM_BUDGET_MB
+    os.makedirs(DATA_DIR, exist_ok=True)
+    source = os.path.join(DATA_DIR, f"dash-{n_rows}.csv")
+    if not os.path.exists(source):
+        make_clean_frame(n_rows).to_csv(source, index=False)
+    print(f"{n_rows} records, {os.path.getsize(source) / 1e6:.0f} MB CSV, budget {budget_mb} MB")
+
+    print(f"{'mode':12} {'start':6} {'load s':>7} {'views s':>8} {'export MB':>10} {'peak MB':>8}")
+    peaks = {}
+    for name, low_memory in (("in-memory", False), ("low-memory", True)):
+        # A private copy, so that each mode builds its own cache files next to it
+        folder = tempfile.mkdtemp(prefix="fissa-lowmem-")
+        try:
+            path = os.path.join(folder, "clean.csv")
+            shutil.copy(source, path)
+            for start, load, views, size, peak in measure(path, low_memory, budget_mb):
+                print(f"{name:12} {start:6} {load:7.2f} {views:8.2f} {size / 1e6:10.1f} {peak / 2 ** 20:8.0f}")
+                peaks[name] = peak
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    peak_mb = peaks["low-memory"] / 2 ** 20
+    print(f"low-memory peak {peak_mb:.0f} MB of {budget_mb} MB, "
+          f"{peaks['in-memory'] / peaks['low-memory']:.1f}x less than in memory")
+    assert peak_mb <= budget_mb, f"peak memory {peak_mb:.0f} MB exceeds the {budget_mb} MB budget"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Memory footprint of a wide synthetic CRF export: default read_csv vs the dictionary schema (src.schema).
+
+Also reports the pickled size, which is what st.cache_data stores and copies.
+
+Usage: python scripts/bench_schema.py [rows]
+"""
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import DICT_TYPE_COL, DICT_VARIABLE_COL  # noqa: E402
+from src.schema import apply_schema, build_schema, memory_usage, read_dtypes  # noqa: E402
+
+FLAG_PREFIXES = ["thorax", "orl", "muscl", "peau", "sym"]
+
+
+def make_export(path, n_rows, missing, seed=0):
+    """Write a wide export (mostly 0/1 flags, like the CRF) and return its data dictionary."""
+    rng = np.random.default_rng(seed)
+    columns, types = {}, {}
+    for prefix in FLAG_PREFIXES:
+        for i in range(1, 31):
+            p = [(1 - missing) * 2 / 3, (1 - missing) / 3, missing]
+            values = rng.choice(np.array(["0", "1", ""], dtype=object), n_rows, p=p)
+            columns[f"{prefix}_{i}"], types[f"{prefix}_{i}"] = values, "yesno"
+    for i in range(10):
+        columns[f"site_answer_{i}"] = rng.choice(np.array(["hospital", "health_centre", "home"]), n_rows)
+        types[f"site_answer_{i}"] = "radio"
+    for i in range(5):
+        days = rng.integers(0, 1500, n_rows)
+        columns[f"date_{i}"] = (pd.Timestamp("2020-01-01") + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+        types[f"date_{i}"] = "date"
+    for name in ["temperature", "weight", "height", "dur_sympt"]:
+        columns[name], types[name] = rng.normal(37, 2, n_rows).round(1), "number"
+    columns["comment"], types["comment"] = rng.choice(np.array(["", "patient referred", "no comment"]), n_rows), "text"
+    pd.DataFrame(columns).to_csv(path, index=False)
+    return pd.DataFrame({DICT_VARIABLE_COL: list(types), DICT_TYPE_COL: list(types.values())})
+
+
+def report(n_rows, missing):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "export.csv")
+        dictionary = make_export(path, n_rows, missing)
+        before = pd.read_csv(path)
+        schema = build_schema(before.columns, dictionary)
+        after = apply_schema(pd.read_csv(path, dtype=read_dtypes(schema)), schema)
+
+    mem_before, mem_after = memory_usage(before), memory_usage(after)
+    pkl_before = len(pickle.dumps(before, protocol=pickle.HIGHEST_PROTOCOL))
+    pkl_after = len(pickle.dumps(after, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"{n_rows} rows x {before.shape[1]} columns, {missing:.0%} missing flags")
+    print(f"  dtypes before: {before.dtypes.astype(str).value_counts().to_dict()}")
+    print(f"  dtypes after : {after.dtypes.astype(str).value_counts().to_dict()}")
+    print(f"  memory : {mem_before / 1e6:8.1f} MB -> {mem_after / 1e6:8.1f} MB ({mem_before / mem_after:.1f}x)")
+    print(f"  pickle : {pkl_before / 1e6:8.1f} MB -> {pkl_after / 1e6:8.1f} MB ({pkl_before / pkl_after:.1f}x)")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for missing in (0.1, 0.0):
+        report(n_rows, missing)
+
+
+if __name__ == "__main__":
+    main()
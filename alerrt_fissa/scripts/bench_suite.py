@@ -0,0 +1,250 @@
+"""
+Benchmark of the dashboard data path, stage by stage, without Streamlit.
+
+For each size, a synthetic dataset with the columns of each dashboard is
+written to CSV once (kept in the temporary folder for later runs), then the
+stages of ``main()`` are timed on it:
+
+- ``Dash.py``: loading through the query engine (cold: CSV parse and Parquet
+  cache build; warm: from the cache), then every query of ``main()`` and of
+  the tabs, with the result cache disabled so that each call computes
+- ``app.py``: ``load_data``, ``load_daily``, ``filter_data``, ``group_data``,
+  ``calculate_kpis`` and the export
+
+Each stage reports its best time over ``--repeat`` runs and its peak traced
+memory, measured in one more run (tracemalloc slows allocations down). The
+results are written to ``results/bench-<commit>.csv``; pass ``--compare`` with
+the file of another commit to print the ratios.
+
+Usage: python scripts/bench_suite.py [--sizes 10000 100000 1000000 10000000] [--app dash gambia]
+                                     [--repeat 3] [--compare results/bench-<commit>.csv]
+"""
+import argparse
+import datetime
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from streamlit.logger import set_log_level
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+from src.cache import cache_path  # noqa: E402
+from src.export import export_file  # noqa: E402
+from src.query import QueryEngine  # noqa: E402
+from src.synthetic import make_clean_frame, make_gambia_frame  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+RESULTS_DIR = os.path.join(ROOT, "results")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "fissa-bench")
+
+# Dashboard state of the benchmark: default filters over a sub-range of the data
+DISEASE = {"dash": "ILI", "gambia": "influ_like_ill"}
+DATES = {"dash": ("2020-03-01", "2022-09-30"), "gambia": ("2022-03-01", "2023-09-30")}
+FREQ = "Weekly"
+
+
+def dataset(app, n_rows):
+    """Synthetic CSV of a dashboard, written on first use"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"{app}-{n_rows}.csv")
+    if not os.path.exists(path):
+        make = make_clean_frame if app == "dash" else make_gambia_frame
+        make(n_rows).to_csv(path, index=False)
+    return path
+
+
+def drop_cache(path):
+    for file in glob.glob(f"{cache_path(path)}*"):
+        os.remove(file)
+
+
+def dash_stages(path):
+    """Stages of Dash.py main(), as (name, function, setup) over a shared context"""
+    ctx = {}
+    disease, dates = DISEASE["dash"], DATES["dash"]
+
+    def load():
+        # cache_mb=0: nothing is kept, every query computes
+        ctx["engine"] = QueryEngine(path=path, store_dir=None, cache_mb=0)
+        ctx["engine"].data()
+
+    def engine():
+        return ctx["engine"]
+
+    def reset_alerts():
+        engine().data()["alerts"] = None
+
+    def reset_seasons():
+        engine().data()["seasons"] = None
+
+    def reset_symptoms():
+        engine().data()["symptoms"] = None
+
+    def reset_quality():
+        # The profile file of the version is read back when present: remove it to time the build
+        engine().data()["quality"] = None
+        for file in glob.glob(f"{cache_path(path)}.quality-*"):
+            os.remove(file)
+
+    def reset_breakdowns():
+        engine().data()["breakdowns"] = None
+        for file in glob.glob(f"{cache_path(path)}.breakdowns-*"):
+            os.remove(file)
+
+    def filtered():
+        ctx["df_f"] = engine().filter("All", *dates)
+
+    return [
+        ("load (CSV)", load, lambda: drop_cache(path)),
+        ("load (cache)", load, None),
+        ("meta", lambda: engine().meta(), None),
+        ("filter", filtered, None),
+        ("timeseries", lambda: engine().timeseries(disease, FREQ, "All", *dates), None),
+        ("gender", lambda: engine().gender_counts(disease, "All", *dates), None),
+        ("kpis", lambda: engine().kpis(disease, FREQ, "All", *dates), None),
+        ("alert table", lambda: engine().alert_table(), reset_alerts),
+        ("tab alerts", lambda: engine().alerts(disease, FREQ, "All", "C2", *dates), None),
+        ("tab signals", lambda: engine().signals(FREQ, "C2"), None),
+        ("tab cumulative", lambda: engine().cumulative(disease, FREQ, "All", *dates), None),
+        ("tab statistics", lambda: engine().series_stats(disease, FREQ, "All", *dates), None),
+        ("tab comparison", lambda: engine().comparison("All", *dates), None),
+        ("tab age", lambda: engine().age_counts(disease, "All", *dates), None),
+        ("symptom flags", lambda: engine().symptom_flags(), reset_symptoms),
+        ("tab symptoms", lambda: engine().symptom_analysis(disease, "All", *dates), None),
+        ("season tables", lambda: engine().season_tables(), reset_seasons),
+        ("tab seasonality", lambda: engine().seasonal_profile(disease, "All", "week"), None),
+        ("quality profile", lambda: engine().quality_profile(), reset_quality),
+        ("tab quality", lambda: engine().quality_summary("All", *dates), None),
+        ("breakdown table", lambda: engine().breakdown_table(), reset_breakdowns),
+        ("tab breakdowns", lambda: engine().breakdown("country", "All"), None),
+        ("export", lambda: export_file(ctx["df_f"], where=lambda chunk: chunk[disease] == 1).close(), None),
+    ]
+
+
+def load_app(path):
+    """Import notebooks/app.py without running it, reading ``path``"""
+    os.environ["CLEAN_DATA_FILE_PATH"] = path
+    spec = importlib.util.spec_from_file_location("gambia_app", os.path.join(ROOT, "notebooks", "app.py"))
+    app = importlib.util.module_from_spec(spec)
+    # Streamlit warns on every cached function used outside of a running app
+    set_log_level("error")
+    spec.loader.exec_module(app)
+    return app
+
+
+def gambia_stages(path):
+    """Stages of app.py main(); st.cache_data is bypassed through ``__wrapped__``"""
+    app = load_app(path)
+    ctx = {}
+    disease, dates = DISEASE["gambia"], DATES["gambia"]
+
+    def load():
+        ctx["df"] = app.load_data.__wrapped__()
+
+    def daily():
+        # load_daily reads the frame through the (warm) cached load_data
+        ctx["daily"] = app.load_daily.__wrapped__()
+
+    def filtered():
+        ctx["df_f"] = app.filter_data(ctx["df"], disease, dates)
+
+    def grouped():
+        ctx["grouped"], _ = app.group_data(ctx["daily"], disease, FREQ, dates)
+
+    def kpis():
+        ctx["cases"] = app.calculate_kpis(ctx["grouped"], ctx["df_f"], disease)[-1]
+
+    return [
+        ("load_data (CSV)", load, lambda: drop_cache(path)),
+        ("load_data (cache)", load, None),
+        ("load_daily", daily, lambda: app.load_data()),
+        ("filter_data", filtered, None),
+        ("group_data", grouped, None),
+        ("calculate_kpis", kpis, None),
+        ("export", lambda: export_file(ctx["cases"]).close(), None),
+    ]
+
+
+def measure(fn, setup, repeat):
+    """Best time over ``repeat`` runs and peak traced memory of one more run"""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def commit_id():
+    """Short hash of HEAD, suffixed with -dirty when the tree has changes"""
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty else sha
+
+
+def compare(results, other):
+    keys = ["app", "rows", "stage"]
+    merged = results.merge(other, on=keys, suffixes=("", "_before"))
+    merged["time ratio"] = merged["seconds"] / merged["seconds_before"]
+    merged["memory ratio"] = merged["peak_mb"] / merged["peak_mb_before"]
+    print(f"\ncompared with {other['commit'].iloc[0]} (ratio < 1: faster / smaller now)")
+    columns = keys + ["seconds_before", "seconds", "time ratio", "peak_mb_before", "peak_mb", "memory ratio"]
+    print(merged[columns].to_string(index=False, float_format="{:.3f}".format))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--app", nargs="+", choices=["dash", "gambia"], default=["dash", "gambia"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", default=None, help="results file of another commit")
+    args = parser.parse_args()
+
+    # Read first: the other file may be the one this run overwrites
+    other = pd.read_csv(args.compare) if args.compare else None
+    commit = commit_id()
+    rows = []
+    print(f"{'app':>7} {'rows':>10} {'stage':>18} {'seconds':>9} {'peak MB':>9}")
+    for app in args.app:
+        for n_rows in args.sizes:
+            path = dataset(app, n_rows)
+            stages = dash_stages(path) if app == "dash" else gambia_stages(path)
+            for stage, fn, setup in stages:
+                seconds, peak = measure(fn, setup, args.repeat)
+                print(f"{app:>7} {n_rows:>10} {stage:>18} {seconds:>9.4f} {peak / 1e6:>9.1f}")
+                rows.append({"app": app, "rows": n_rows, "stage": stage, "seconds": seconds, "peak_mb": peak / 1e6})
+            drop_cache(path)
+
+    results = pd.DataFrame(rows)
+    results.insert(0, "commit", commit)
+    results.insert(1, "date", datetime.datetime.now().isoformat(timespec="seconds"))
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"bench-{commit}.csv")
+    results.to_csv(out, index=False, float_format="%.6g")
+    print(f"results written to {out}")
+    if other is not None:
+        compare(results, other)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Batch epidemic alert engine over every disease x country x frequency series.
+
+The per-day totals (src.cube) are reshaped into one matrix per aggregation
+level, with one row per period and one column per (disease, country) stratum.
+Each detection method is then evaluated on the whole matrix at once:
+
+- ``rolling``: mean + k standard deviations of the previous ``window`` periods
+- ``C1``, ``C2``, ``C3``: CDC EARS. C1 uses the 7 previous periods, C2 the 7
+  periods before a 2-period guard band. C3 sums the C2 excess above 1 over
+  the current and the 2 previous periods.
+- ``seasonal``: historical limits, i.e. the same period +/- ``half_width`` in
+  each of the ``years`` previous years
+
+Moving windows use cumulative sums, so the cost does not depend on the window
+length. A baseline only looks back a fixed number of periods. When new days
+arrive, ``update_alerts`` recomputes only the periods from the first new day,
+plus the look-back they need. The other results are kept unchanged.
+"""
+import numpy as np
+import pandas as pd
+
+from src.cube import FREQ_CODES  # type: ignore
+
+# Length of a year in periods, used by the seasonal baseline
+PERIODS_PER_YEAR = {"Daily": 365, "Weekly": 52, "Monthly": 12, "Quarterly": 4, "Yearly": 1}
+
+# Detection methods and their default parameters
+METHODS = {
+    "rolling": {"window": 8, "lag": 0, "k": 2.0},
+    "C1": {"window": 7, "lag": 0, "k": 3.0},
+    "C2": {"window": 7, "lag": 2, "k": 3.0},
+    "C3": {"window": 7, "lag": 2, "k": 2.0},
+    "seasonal": {"years": 3, "half_width": 1, "k": 2.0},
+}
+
+# Columns of the alert table, one row per method, frequency, stratum and period
+KEYS = ["method", "freq", "disease", "country"]
+
+
+def series_matrix(daily: pd.DataFrame, measures, freq: str) -> pd.DataFrame:
+    """
+    Time x stratum matrix of case counts at one aggregation level
+    :param daily: output of ``daily_totals(cube, measures, by="country")``
+    :param measures: disease columns
+    :param freq: "Daily", "Weekly", "Monthly", "Quarterly" or "Yearly"
+    :return: float64 dataframe indexed by a complete PeriodIndex (periods without
+        records are 0), with (disease, country) columns
+    """
+    wide = daily[list(measures)].unstack(0, fill_value=0)
+    code = "D" if freq == "Daily" else FREQ_CODES[freq]
+    wide = wide.groupby(wide.index.to_period(code)).sum()
+    if wide.empty:
+        return wide.astype("float64")
+    full = pd.period_range(wide.index.min(), wide.index.max(), freq=code)
+    return wide.reindex(full, fill_value=0).astype("float64")
+
+
+def _window_stats(x: np.ndarray, window: int, lag: int) -> tuple:
+    # Mean and standard deviation of x[t - lag - window : t - lag], NaN where incomplete
+    csum = np.zeros((len(x) + 1,) + x.shape[1:])
+    csq = np.zeros_like(csum)
+    np.cumsum(x, axis=0, out=csum[1:])
+    np.cumsum(x * x, axis=0, out=csq[1:])
+    stop = np.arange(len(x)) - lag
+    begin = stop - window
+    ok = begin >= 0
+    mean = np.full(x.shape, np.nan)
+    sd = np.full(x.shape, np.nan)
+    s = csum[stop[ok]] - csum[begin[ok]]
+    q = csq[stop[ok]] - csq[begin[ok]]
+    mean[ok] = s / window
+    sd[ok] = np.sqrt(np.clip((q - s * s / window) / (window - 1), 0, None))
+    return mean, sd
+
+
+def _seasonal_stats(x: np.ndarray, period: int, years: int, half_width: int) -> tuple:
+    # Mean and standard deviation of the same period (+/- half_width) in previous years
+    offsets = np.array([y * period + d for y in range(1, years + 1) for d in range(-half_width, half_width + 1)])
+    t = np.arange(len(x))
+    ok = t >= years * period + half_width
+    mean = np.full(x.shape, np.nan)
+    sd = np.full(x.shape, np.nan)
+    if ok.any():
+        ref = x[t[ok][:, None] - offsets]
+        mean[ok] = ref.mean(axis=1)
+        sd[ok] = ref.std(axis=1, ddof=1) if len(offsets) > 1 else 0.0
+    return mean, sd
+
+
+def lookback(method: str, freq: str, **params) -> int:
+    """
+    Number of past periods a method needs to score a period
+    :param method: key of ``METHODS``
+    :param freq: aggregation level
+    :param params: overrides of the method parameters
+    :return: number of periods
+    """
+    p = {**METHODS[method], **params}
+    if method == "seasonal":
+        return p["years"] * PERIODS_PER_YEAR[freq] + p["half_width"]
+    return p["window"] + p["lag"] + (2 if method == "C3" else 0)
+
+
+def evaluate(x: np.ndarray, method: str, freq: str, min_sd: float = 1.0, min_cases: int = 1, **params) -> dict:
+    """
+    Score every period of every stratum with one method
+    :param x: (periods, strata) counts
+    :param method: key of ``METHODS``
+    :param freq: aggregation level of ``x``
+    :param min_sd: floor of the baseline standard deviation, so that a few cases
+        after a run of zeros are not flagged
+    :param min_cases: periods with fewer cases are never flagged
+    :param params: overrides of the method parameters
+    :return: dict of (periods, strata) arrays: ``baseline``, ``threshold``,
+        ``score`` and the boolean ``alert``; NaN (no alert) where the baseline is incomplete
+    """
+    p = {**METHODS[method], **params}
+    if method == "seasonal":
+        mean, sd = _seasonal_stats(x, PERIODS_PER_YEAR[freq], p["years"], p["half_width"])
+    else:
+        mean, sd = _window_stats(x, p["window"], p["lag"])
+    sd = np.maximum(sd, min_sd)
+    score = (x - mean) / sd
+    threshold = mean + p["k"] * sd
+    if method == "C3":
+        excess = np.maximum(score - 1, 0)
+        previous = np.full(x.shape, np.nan)
+        previous[2:] = excess[1:-1] + excess[:-2]
+        score = excess + previous
+        # Count that brings C3 to k given the two previous periods
+        threshold = mean + (1 + np.maximum(p["k"] - previous, 0)) * sd
+    with np.errstate(invalid="ignore"):
+        alert = (score > p["k"]) & (x >= min_cases)
+    return {"baseline": mean, "threshold": threshold, "score": score, "alert": alert}
+
+
+def _dtypes(matrix: pd.DataFrame, methods, freqs) -> dict:
+    # Categories of the alert table keys, in the order the blocks are written
+    columns = matrix.columns
+    return {
+        "method": pd.CategoricalDtype(list(methods)),
+        "freq": pd.CategoricalDtype(list(freqs)),
+        "disease": pd.CategoricalDtype(columns.get_level_values(0).unique()),
+        "country": pd.CategoricalDtype(columns.get_level_values(1).unique()),
+    }
+
+
+def _period_columns(matrix: pd.DataFrame) -> dict:
+    # Period columns of a block, shared by every method at one aggregation level
+    periods, n_strata = matrix.index, matrix.shape[1]
+    return {
+        "period": pd.array(np.tile(periods.astype(str).to_numpy(object), n_strata), dtype="string"),
+        "start": np.tile(periods.start_time.to_numpy(), n_strata),
+        "end": np.tile(periods.end_time.normalize().to_numpy(), n_strata),
+        "cases": matrix.to_numpy().T.ravel(),
+    }
+
+
+def _block(matrix: pd.DataFrame, periods: dict, result: dict, method: str, freq: str, dtypes: dict) -> pd.DataFrame:
+    # Long table of one (method, freq) block, ordered by stratum then period
+    n_periods, n_strata = matrix.shape
+    keys = {"method": [method] * n_strata, "freq": [freq] * n_strata,
+            "disease": matrix.columns.get_level_values(0), "country": matrix.columns.get_level_values(1)}
+    out = {}
+    for col, values in keys.items():
+        codes = dtypes[col].categories.get_indexer(values)
+        out[col] = pd.Categorical.from_codes(np.repeat(codes, n_periods), dtype=dtypes[col])
+    out.update(periods)
+    for name, values in result.items():
+        out[name] = values.T.ravel()
+    return pd.DataFrame(out)
+
+
+def _finish(blocks) -> pd.DataFrame:
+    # Blocks come in key order, so the index is sorted and one series is a slice
+    return pd.concat(blocks, ignore_index=True).set_index(KEYS)
+
+
+def compute_alerts(daily: pd.DataFrame, measures, freqs=tuple(PERIODS_PER_YEAR), methods=tuple(METHODS),
+                   **options) -> pd.DataFrame:
+    """
+    Evaluate every method on every disease x country series at every aggregation level
+    :param daily: output of ``daily_totals(cube, measures, by="country")``
+    :param measures: disease columns
+    :param freqs: aggregation levels
+    :param methods: detection methods (keys of ``METHODS``)
+    :param options: ``min_sd`` / ``min_cases`` passed to ``evaluate``
+    :return: alert table indexed by (method, freq, disease, country), one row per
+        period with ``period``, ``start``, ``end``, ``cases``, ``baseline``,
+        ``threshold``, ``score`` and ``alert``
+    """
+    matrices = {freq: series_matrix(daily, measures, freq) for freq in freqs}
+    periods = {freq: _period_columns(matrix) for freq, matrix in matrices.items()}
+    dtypes = _dtypes(matrices[freqs[0]], methods, freqs)
+    blocks = []
+    for method in methods:
+        for freq, matrix in matrices.items():
+            result = evaluate(matrix.to_numpy(), method, freq, **options)
+            blocks.append(_block(matrix, periods[freq], result, method, freq, dtypes))
+    return _finish(blocks)
+
+
+def update_alerts(alerts: pd.DataFrame, daily: pd.DataFrame, measures, since, **options) -> pd.DataFrame:
+    """
+    Refresh an alert table after new days were added to the totals
+    :param alerts: previous output of ``compute_alerts`` (or of this function)
+    :param daily: updated per-day totals
+    :param measures: disease columns
+    :param since: first date whose counts changed
+    :param options: ``min_sd`` / ``min_cases`` passed to ``evaluate``
+    :return: the same table as ``compute_alerts`` on the updated totals; only the
+        periods from ``since`` on are recomputed
+    """
+    since = pd.Timestamp(since)
+    methods = list(alerts.index.levels[0])
+    freqs = list(alerts.index.levels[1])
+    matrices = {freq: series_matrix(daily, measures, freq) for freq in freqs}
+    periods = {freq: _period_columns(matrix) for freq, matrix in matrices.items()}
+    dtypes = _dtypes(matrices[freqs[0]], methods, freqs)
+    blocks = []
+    for method in methods:
+        for freq, matrix in matrices.items():
+            old = alerts.loc[(method, freq)]
+            n_strata = matrix.shape[1]
+            n_old = len(old) // n_strata
+            first = min(matrix.index.searchsorted(since.to_period(matrix.index.freq)), n_old)
+            if n_old == 0 or len(old) != n_old * n_strata or old["period"].iloc[0] != str(matrix.index[0]) or \
+                    list(old.index[::n_old]) != list(matrix.columns):
+                # New strata or earlier days: every period has to be scored
+                first = 0
+            start = max(0, first - lookback(method, freq))
+            tail = evaluate(matrix.to_numpy()[start:], method, freq, **options)
+            result = {}
+            for name, values in tail.items():
+                kept = old[name].to_numpy()[:n_old * n_strata].reshape(n_strata, n_old)[:, :first].T
+                result[name] = np.concatenate([kept, values[first - start:]])
+            blocks.append(_block(matrix, periods[freq], result, method, freq, dtypes))
+    return _finish(blocks)
+
+
+def alert_series(alerts: pd.DataFrame, method: str, freq: str, disease: str, country: str,
+                 dates=None) -> pd.DataFrame:
+    """
+    One series of the alert table
+    :param alerts: output of ``compute_alerts``
+    :param method: detection method
+    :param freq: aggregation level
+    :param disease: disease column
+    :param country: country, or "All"
+    :param dates: optional (start, end) pair; periods overlapping it are kept
+    :return: dataframe indexed by period label
+    """
+    key = (method, freq, disease, country)
+    if key not in alerts.index:
+        return alerts.iloc[:0].reset_index(drop=True).set_index("period")
+    series = alerts.loc[key].reset_index(drop=True)
+    if dates is not None:
+        series = series[(series["end"] >= pd.Timestamp(dates[0])) & (series["start"] <= pd.Timestamp(dates[1]))]
+    return series.set_index("period")
+
+
+def current_signals(alerts: pd.DataFrame, method: str, freq: str) -> pd.DataFrame:
+    """
+    Strata alerting in the latest period of one aggregation level
+    :param alerts: output of ``compute_alerts``
+    :param method: detection method
+    :param freq: aggregation level
+    :return: one row per alerting (disease, country)
+    """
+    try:
+        rows = alerts.loc[(method, freq)].reset_index()
+    except KeyError:
+        return alerts.iloc[:0].reset_index()
+    latest = rows[rows["start"] == rows["start"].max()]
+    return latest[latest["alert"]].sort_values("score", ascending=False, ignore_index=True)
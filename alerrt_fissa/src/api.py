@@ -0,0 +1,145 @@
+"""
+Local HTTP/JSON API over a shared QueryEngine (src.query).
+
+Every request thread queries the same engine, so the dataset is held once
+however many clients there are, and identical queries are answered from its
+result cache.
+
+Endpoints (GET, parameters in the query string):
+
+- ``/meta``: countries, diseases, frequencies, methods and date range
+- ``/timeseries?disease=ILI&freq=Weekly&country=All&start=&end=``
+- ``/kpis?disease=ILI&freq=Weekly&country=All&start=&end=``
+- ``/alerts?disease=ILI&freq=Weekly&country=All&method=C2&start=&end=``
+- ``/signals?freq=Weekly&method=C2``
+- ``/stats``: data version and result cache hits / misses
+
+Usage: python -m src.api [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load .env before src.config reads the environment (port, cache folder and size)
+load_dotenv()
+
+from src.config import API_PORT  # type: ignore  # noqa: E402
+from src.query import QueryEngine  # type: ignore  # noqa: E402
+
+# Query string parameters accepted by each endpoint, with their defaults
+ENDPOINTS = {
+    "/meta": {},
+    "/timeseries": {"disease": None, "freq": "Weekly", "country": "All", "start": None, "end": None},
+    "/kpis": {"disease": None, "freq": "Weekly", "country": "All", "start": None, "end": None},
+    "/alerts": {"disease": None, "freq": "Weekly", "country": "All", "method": "C2", "start": None, "end": None},
+    "/signals": {"freq": "Weekly", "method": "C2"},
+    "/stats": {},
+}
+
+
+def to_json(result):
+    """
+    JSON-ready version of a query result
+    :param result: dict, series (period -> value) or dataframe (one record per row)
+    :return: dict or list
+    """
+    if isinstance(result, pd.Series):
+        return {"periods": result.index.astype(str).tolist(), "values": result.tolist()}
+    if isinstance(result, pd.DataFrame):
+        frame = result.reset_index() if result.index.name else result
+        return json.loads(frame.to_json(orient="records", date_format="iso"))
+    return result
+
+
+def run_query(engine: QueryEngine, path: str, params: dict):
+    """
+    Answer one API call
+    :param engine: shared query engine
+    :param path: endpoint
+    :param params: query string parameters (single values)
+    :return: JSON-ready result
+    """
+    args = {name: params.get(name, default) for name, default in ENDPOINTS[path].items()}
+    missing = [name for name, value in args.items() if value is None and name not in ("start", "end")]
+    if missing:
+        raise ValueError(f"missing parameter(s): {', '.join(missing)}")
+    if path == "/stats":
+        return engine.cache_info()
+    return to_json(getattr(engine, path[1:])(**args))
+
+
+def make_handler(engine: QueryEngine):
+    """
+    Request handler class bound to an engine
+    :param engine: shared query engine
+    :return: BaseHTTPRequestHandler subclass
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if url.path not in ENDPOINTS:
+                status, body = 404, {"error": f"unknown endpoint {url.path}", "endpoints": list(ENDPOINTS)}
+            else:
+                try:
+                    status, body = 200, run_query(engine, url.path, params)
+                except ValueError as e:
+                    status, body = 400, {"error": str(e)}
+                except Exception as e:
+                    # Keep the client on JSON whatever failed in the engine
+                    status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # One line per request on stderr is too much under load
+            pass
+
+    return Handler
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog (5) makes bursts of clients wait for TCP retries
+    request_queue_size = 128
+
+
+def make_server(engine: QueryEngine, host: str = "127.0.0.1", port: int = API_PORT) -> ThreadingHTTPServer:
+    """
+    Threaded HTTP server answering the API from one engine
+    :param engine: shared query engine
+    :param host: interface to listen on
+    :param port: port (0 picks a free one)
+    :return: server, started with ``serve_forever``
+    """
+    return APIServer((host, port), make_handler(engine))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the FISSA dashboard queries as JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--data", default=None, help="cleaned CSV (default: CLEAN_DATA_FILE_PATH)")
+    args = parser.parse_args()
+
+    engine = QueryEngine(path=args.data, store_dir=os.getenv("FISSA_STORE_DIR"))
+    print(f"Loaded {engine.meta()['rows']} records (version {engine.version})")
+    server = make_server(engine, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Disease breakdowns by country, age group and gender, from one grouped pass.
+
+Each record is reduced to two integers: the code of its cell (the
+combination of its country, age group and gender codes) and its disease
+flags packed into bits (src.symptoms.pack_flags). Both are combined into one
+key and the keys are counted once, which gives the number of records of every
+cell and flag combination. The number of records and cases of each disease
+per cell follow from these counts, without reading the records again.
+
+The cell table (one row per observed cell) is small and is the only thing
+kept: every disease x dimension breakdown, a country subset or an
+age group x gender crosstab is a group-by over its few hundred rows. The query
+engine writes it next to the data, once per version (src.cache.cached_table);
+in low-memory mode it is built from the records read back in batches
+(``breakdown_chunks``).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.cube import COUNT_COL  # type: ignore
+from src.symptoms import count_combinations, pack_flags, unpack  # type: ignore
+
+DIMS = ["country", "age_group", "gender"]
+
+
+def breakdown_cells(df: pd.DataFrame, measures, dims=DIMS) -> pd.DataFrame:
+    """
+    Records and cases per combination of the dimensions
+    :param df: case-level dataframe
+    :param measures: 0/1 columns counted in each cell (missing values count as 0)
+    :param dims: stratification columns; missing values are a cell of their own
+    :return: dataframe with the dims, ``n`` and one column per measure, one row per observed cell
+    """
+    measures, dims = list(measures), list(dims)
+    cell = np.zeros(len(df), dtype=np.uint64)
+    labels = []
+    for dim in dims:
+        codes, uniques = pd.factorize(df[dim], sort=True, use_na_sentinel=False)
+        cell = cell * np.uint64(len(uniques)) + codes.astype(np.uint64)
+        labels.append(uniques)
+    cell_bits = (math.prod(len(u) for u in labels) - 1).bit_length()
+    if cell_bits + len(measures) > 64:
+        raise ValueError(f"{len(measures)} measures and {cell_bits} bits of cells do not fit in 64 bits")
+    keys = (cell << np.uint64(len(measures))) | pack_flags(df, measures).astype(np.uint64)
+    combinations = count_combinations(keys)
+
+    codes = combinations.index.to_numpy()
+    weights = combinations.to_numpy(dtype=np.int64)
+    flags = unpack(codes & np.uint64((1 << len(measures)) - 1), len(measures))
+    table = pd.DataFrame(flags.astype(np.int64) * weights[:, None], columns=measures)
+    table.insert(0, COUNT_COL, weights)
+    table = table.groupby(codes >> np.uint64(len(measures))).sum()
+
+    # Labels of each cell, from its mixed-radix code
+    rest = table.index.to_numpy()
+    columns = {}
+    for dim, uniques in reversed(list(zip(dims, labels))):
+        rest, code = np.divmod(rest, np.uint64(len(uniques)))
+        columns[dim] = uniques.take(code.astype(np.int64))
+    cells = pd.DataFrame({dim: columns[dim] for dim in dims})
+    return pd.concat([cells, table.reset_index(drop=True)], axis=1)
+
+
+def breakdown_chunks(chunks, measures, dims=DIMS) -> pd.DataFrame:
+    """
+    ``breakdown_cells`` of a stream of chunks, the cells of each chunk added up
+    :param chunks: iterable of case-level dataframes with the same dtypes
+    :param measures: 0/1 columns counted in each cell
+    :param dims: stratification columns
+    :return: output of ``breakdown_cells`` for all the records
+    """
+    dims = list(dims)
+    cells = pd.concat([breakdown_cells(chunk, measures, dims) for chunk in chunks], ignore_index=True)
+    return cells.groupby(dims, observed=True, dropna=False).sum().reset_index()
+
+
+def _subset(cells: pd.DataFrame, equals: dict) -> pd.DataFrame:
+    """Cells matching ``column == value`` for each pair ("All" keeps every value)"""
+    for column, value in equals.items():
+        if value != "All":
+            cells = cells[cells[column] == value]
+    return cells
+
+
+def breakdown(cells: pd.DataFrame, dim: str, measures=None, **equals) -> pd.DataFrame:
+    """
+    Records and cases per value of one dimension
+    :param cells: output of ``breakdown_cells``
+    :param dim: dimension of the rows
+    :param measures: measures returned, all by default
+    :param equals: filters on the other dimensions, e.g. ``country="Mali"``
+    :return: dataframe indexed by the values of ``dim`` (missing values excluded),
+        with ``n`` and one column per measure
+    """
+    if measures is None:
+        measures = cells.columns[cells.columns.get_loc(COUNT_COL) + 1:]
+    cells = _subset(cells, equals)
+    return cells.groupby(dim, observed=False)[[COUNT_COL] + list(measures)].sum()
+
+
+def crosstab(cells: pd.DataFrame, index: str, columns: str, value: str = COUNT_COL, **equals) -> pd.DataFrame:
+    """
+    Two-way table of a count, as ``pd.crosstab`` on the records
+    :param cells: output of ``breakdown_cells``
+    :param index: dimension of the rows
+    :param columns: dimension of the columns
+    :param value: ``n`` (records) or a measure (cases)
+    :param equals: filters on the other dimensions
+    :return: dataframe of counts (missing values excluded)
+    """
+    cells = _subset(cells, equals)
+    return cells.pivot_table(index=index, columns=columns, values=value, aggfunc="sum", fill_value=0,
+                             observed=True).astype("int64")
@@ -0,0 +1,156 @@
+"""
+Persistent columnar cache for the CSV extracts.
+
+The first read of a CSV parses it, applies the requested types and writes a
+Parquet copy next to it (or into ``CACHE_DIR``). Later reads memory-map the
+Parquet file instead of parsing the CSV again. The cache is keyed on the size,
+modification time and SHA-1 of the source file, so it is rebuilt only when the
+CSV actually changes.
+"""
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import CACHE_DIR  # type: ignore
+from src.schema import apply_schema, read_dtypes  # type: ignore
+
+# Bump when the on-disk layout or the type coercion rules change
+CACHE_FORMAT_VERSION = 2
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    SHA-1 of a file, read in blocks
+    :param path: file to hash
+    :param block_size: number of bytes read at a time
+    :return: hex digest
+    """
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_fingerprint(path: str) -> dict:
+    """
+    Size, modification time and hash of a file
+    :param path: file to fingerprint
+    :return: dict with ``size``, ``mtime_ns`` and ``sha1``
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": file_hash(path)}
+
+
+def cache_path(path: str) -> str:
+    """
+    Location of the Parquet cache for a CSV file
+    :param path: source CSV
+    :return: path of the Parquet file
+    """
+    name = os.path.basename(path)
+    if not CACHE_DIR:
+        return os.path.join(os.path.dirname(os.path.abspath(path)), f"{name}.cache.parquet")
+    # Files with the same name in different folders share CACHE_DIR
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{name}.{digest}.cache.parquet")
+
+
+def _read_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path: str, meta: dict) -> None:
+    tmp = f"{meta_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def _is_fresh(path: str, target: str, meta: dict, spec: dict) -> bool:
+    """
+    Check the cache against the source file.
+    Size and mtime are compared first; the file is only hashed when they
+    differ, so a touched but unchanged CSV does not trigger a rebuild.
+    """
+    if meta.get("spec") != spec or not os.path.exists(target):
+        return False
+    stat = os.stat(path)
+    source = meta.get("source", {})
+    if stat.st_size != source.get("size"):
+        return False
+    if stat.st_mtime_ns == source.get("mtime_ns"):
+        return True
+    if file_hash(path) != source.get("sha1"):
+        return False
+    source["mtime_ns"] = stat.st_mtime_ns
+    _write_meta(f"{target}.json", meta)
+    return True
+
+
+def read_csv_cached(path: str, schema: dict = None, dates=(), categories=(), flags=()) -> pd.DataFrame:
+    """
+    Read a CSV through its Parquet cache, rebuilding the cache if the CSV changed
+    :param path: source CSV
+    :param schema: dict column -> kind (see src.schema), applied while reading
+    :param dates: columns parsed as datetimes
+    :param categories: columns stored as categoricals
+    :param flags: 0/1 columns stored as nullable int8
+    :return: typed dataframe
+    """
+    schema = dict(schema or {})
+    schema.update({col: "date" for col in dates})
+    schema.update({col: "coded" for col in categories})
+    schema.update({col: "flag" for col in flags})
+    target = cache_path(path)
+    meta_path = f"{target}.json"
+    spec = {"version": CACHE_FORMAT_VERSION, "schema": schema}
+    meta = _read_meta(meta_path)
+    if not _is_fresh(path, target, meta, spec):
+        fingerprint = file_fingerprint(path)
+        df = apply_schema(pd.read_csv(path, dtype=read_dtypes(schema)), schema)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, target)
+        _write_meta(meta_path, {"spec": spec, "source": fingerprint})
+    return pq.read_table(target, memory_map=True).to_pandas()
+
+
+def data_version(path: str) -> str:
+    """
+    Identifier of the data currently behind ``path``, taken from the cache metadata
+    :param path: source CSV
+    :return: SHA-1 of the source file, or an empty string if it was never cached
+    """
+    return _read_meta(f"{cache_path(path)}.json").get("source", {}).get("sha1", "")
+
+
+def cached_table(base: str, version: str, build) -> pd.DataFrame:
+    """
+    Table derived from a data version, persisted as ``<base>-<version>.parquet`` and built on first use
+    The tables of the other versions are removed when a new one is written.
+    :param base: path prefix of the table files
+    :param version: data version
+    :param build: function computing the table
+    :return: table
+    """
+    path = f"{base}-{version}.parquet"
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    table = build()
+    tmp = f"{path}.tmp"
+    table.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    for old in glob.glob(f"{glob.escape(base)}-*.parquet"):
+        if old != path:
+            os.remove(old)
+    return table
@@ -0,0 +1,203 @@
+"""
+Declarative syndromic case definitions.
+
+A case definition is a dict of conditions over 0/1 symptom columns:
+
+- ``any_of`` + ``min_count``: at least ``min_count`` (default 1) of the columns are 1
+- ``all_of``: every column is 1
+- ``none_of``: no column is 1 (missing counts as absent)
+- ``zero_of``: every column is recorded as 0 (missing fails)
+- ``max_duration``: the symptom duration is known and at most this many days
+
+All definitions are compiled together: the symptom columns are packed once
+into a uint64 bitset per patient, and each condition becomes a mask and a
+popcount over that bitset, so every syndrome is classified in one pass.
+"""
+import numpy as np
+import pandas as pd
+
+# Gambia CRF (fissa_gambia_data_cleaning.ipynb)
+GAMBIA_RULES = [
+    {
+        "name": "influ_like_ill",
+        "any_of": ["thorax_1", "orl_6"],            # cough, sore throat
+        "max_duration": 10,
+    },
+    {
+        "name": "arbovirus",
+        "none_of": ["thorax_1", "thorax_2", "thorax_4"],  # cough, dyspnea, chest pain
+        "any_of": ["syst_nev_1", "muscl_1", "muscl_2", "peau_1", "orl_5", "peau_3", "thorax_3"],
+        "min_count": 2,
+    },
+]
+
+# Multi-country FISSA data (Exploronation_All_Fissa_data.ipynb)
+RESPIRATORY = ["sym_chest", "inf_resp"]
+FISSA_RULES = [
+    {
+        "name": "ILI",
+        "any_of": RESPIRATORY,
+        "zero_of": ["hospitalized_last_14_days"],
+        "max_duration": 10,
+    },
+    {
+        "name": "Arbovirus",
+        "none_of": RESPIRATORY,
+        "any_of": ["sym_neurologic", "sym_musc_bone_joint", "sym_skin_mucosa", "sym_ent", "sym_other"],
+        "min_count": 2,
+        "zero_of": ["hospitalized_last_14_days"],
+    },
+    {
+        "name": "Malaria_case",
+        "any_of": ["malaria_result", "eti_malaria", "Malaria"],
+    },
+    {
+        "name": "Diarrhoea",
+        "any_of": ["recent_digestive", "sym_abdomen", "inf_digestive"],
+    },
+    {
+        "name": "SARI",
+        "any_of": RESPIRATORY,
+        "all_of": ["hospitalized_last_14_days"],
+        "max_duration": 10,
+    },
+]
+
+# Clinical priority used for the single "syndrome" label
+FISSA_PRIORITY = [
+    ("SARI", "SARI"),
+    ("Malaria_case", "Malaria"),
+    ("Arbovirus", "Arbovirus"),
+    ("ILI", "ILI"),
+    ("Diarrhoea", "Diarrhoeal disease"),
+]
+
+CONDITIONS = ("any_of", "all_of", "none_of", "zero_of")
+
+_BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits of each uint64 word
+    :param words: uint64 array
+    :return: uint8 array of the same shape
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    as_bytes = np.ascontiguousarray(words)[..., None].view(np.uint8)
+    return _BYTE_COUNTS[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def symptom_columns(rules) -> list:
+    """
+    Columns referenced by a set of rules, in first-seen order
+    :param rules: list of case definitions
+    :return: list of column names
+    """
+    seen = {}
+    for rule in rules:
+        for condition in CONDITIONS:
+            for col in rule.get(condition, []):
+                seen.setdefault(col, None)
+    return list(seen)
+
+
+def pack_symptoms(df: pd.DataFrame, columns) -> tuple:
+    """
+    Pack 0/1 columns into bitsets, one bit per column
+    :param df: case-level dataframe; missing columns are treated as missing values
+    :param columns: columns to pack (bit ``i`` is ``columns[i]``)
+    :return: (present, known) uint64 arrays of shape (words, rows): bits set where
+        the value is 1, and where the value is not missing
+    """
+    n_words = max(1, (len(columns) + 63) // 64)
+    present = np.zeros((n_words, len(df)), dtype=np.uint64)
+    known = np.zeros((n_words, len(df)), dtype=np.uint64)
+    for i, col in enumerate(columns):
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        shift = np.uint64(i % 64)
+        present[i // 64] |= (values == 1).astype(np.uint64) << shift
+        known[i // 64] |= (~np.isnan(values)).astype(np.uint64) << shift
+    return present, known
+
+
+def _mask(columns, index: dict, n_words: int) -> np.ndarray:
+    mask = np.zeros(n_words, dtype=np.uint64)
+    for col in columns:
+        i = index[col]
+        mask[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+    return mask
+
+
+def compile_rules(rules) -> dict:
+    """
+    Turn case definitions into bit masks
+    :param rules: list of case definitions
+    :return: dict with the packed ``columns`` and one compiled entry per rule
+    """
+    columns = symptom_columns(rules)
+    index = {col: i for i, col in enumerate(columns)}
+    n_words = max(1, (len(columns) + 63) // 64)
+    compiled = []
+    for rule in rules:
+        entry = {"name": rule["name"], "max_duration": rule.get("max_duration")}
+        for condition in CONDITIONS:
+            if rule.get(condition):
+                entry[condition] = _mask(rule[condition], index, n_words)
+        entry["min_count"] = rule.get("min_count", 1)
+        compiled.append(entry)
+    return {"columns": columns, "rules": compiled}
+
+
+def classify(df: pd.DataFrame, rules, duration_col: str = None) -> pd.DataFrame:
+    """
+    Evaluate every case definition over a dataframe
+    :param df: case-level dataframe
+    :param rules: list of case definitions, or the output of ``compile_rules``
+    :param duration_col: symptom duration in days, needed by ``max_duration``
+    :return: dataframe with one int8 0/1 column per definition, aligned on ``df``
+    """
+    compiled = rules if isinstance(rules, dict) else compile_rules(rules)
+    present, known = pack_symptoms(df, compiled["columns"])
+    duration = None
+    if duration_col is not None and duration_col in df.columns:
+        duration = pd.to_numeric(df[duration_col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    out = {}
+    for rule in compiled["rules"]:
+        ok = np.ones(len(df), dtype=bool)
+        count = np.zeros(len(df), dtype=np.uint16)
+        for w in range(present.shape[0]):
+            bits, seen = present[w], known[w]
+            if "any_of" in rule:
+                count += popcount(bits & rule["any_of"][w])
+            if "all_of" in rule:
+                ok &= (bits & rule["all_of"][w]) == rule["all_of"][w]
+            if "none_of" in rule:
+                ok &= (bits & rule["none_of"][w]) == 0
+            if "zero_of" in rule:
+                mask = rule["zero_of"][w]
+                ok &= ((seen & mask) == mask) & ((bits & mask) == 0)
+        if "any_of" in rule:
+            ok &= count >= rule["min_count"]
+        if rule["max_duration"] is not None:
+            if duration is None:
+                raise ValueError(f"{rule['name']} needs the symptom duration column")
+            ok &= duration <= rule["max_duration"]
+        out[rule["name"]] = ok.astype("int8")
+    return pd.DataFrame(out, index=df.index)
+
+
+def label_syndrome(flags: pd.DataFrame, priority, default: str = "Other") -> pd.Series:
+    """
+    Single syndrome label per patient, taking the first matching definition
+    :param flags: output of ``classify``
+    :param priority: list of (column, label) in decreasing priority
+    :param default: label when no definition matches
+    :return: categorical series
+    """
+    labels = [label for _, label in priority] + [default]
+    codes = np.select([flags[col].to_numpy() == 1 for col, _ in priority], range(len(priority)), default=len(priority))
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=flags.index, name="syndrome")
@@ -0,0 +1,134 @@
+"""
+Chart payloads with a bounded number of points.
+
+Charts receive aggregated series only: counts for pies and bars, and at most
+``CHART_POINT_BUDGET`` points for time series. Longer series are downsampled
+on the server with LTTB, which keeps the visual shape, or with min-max, which
+keeps every peak and trough of each bucket. The points of a figure can be
+replaced without rebuilding it, so a rerun where only the data changed skips
+building the figure and its traces again.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.config import CHART_POINT_BUDGET  # type: ignore
+
+# Colours of the bars of categorical charts (one per bar)
+PALETTE = ["#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A", "#19D3F3", "#FF6692", "#B6E880",
+           "#FF97FF", "#FECB52"]
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets selection of a series
+    :param y: values, equally spaced
+    :param n_out: number of points to keep (first and last included)
+    :return: sorted positions of the kept points
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype="float64")
+    x = np.arange(n, dtype="float64")
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        # Twice the area of the triangle (previous point, candidate, next bucket average)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Minimum and maximum of each bucket of a series
+    :param y: values, equally spaced
+    :param n_out: number of points to keep (two per bucket)
+    :return: sorted positions of the kept points
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype="float64")
+    n_buckets = n_out // 2
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    filled = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(n_buckets)[filled] * size
+    lows = offsets + np.nanargmin(buckets[filled], axis=1)
+    highs = offsets + np.nanargmax(buckets[filled], axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def downsample(data, budget: int = CHART_POINT_BUDGET, method: str = "lttb", column: str = None,
+               keep=None):
+    """
+    Rows of a series (or frame) to plot within a point budget
+    :param data: series or dataframe in plotting order
+    :param budget: maximum number of points
+    :param method: "lttb" or "minmax"
+    :param column: column of a dataframe driving the selection (default: the first)
+    :param keep: optional boolean array of rows that are always kept (e.g. alert periods)
+    :return: the selected rows, in order; ``data`` itself when it is within budget
+    """
+    if len(data) <= budget:
+        return data
+    values = data[column or data.columns[0]] if isinstance(data, pd.DataFrame) else data
+    select = lttb_indices if method == "lttb" else minmax_indices
+    rows = select(values.to_numpy(dtype="float64", na_value=np.nan), budget)
+    if keep is not None:
+        rows = np.union1d(rows, np.flatnonzero(keep))
+    return data.iloc[rows]
+
+
+def reuse_figure(cache: dict, key: str, traces, **layout) -> go.Figure:
+    """
+    Figure built once per key, whose traces are then only updated
+    :param cache: dict holding the figures (e.g. the Streamlit session state)
+    :param key: name of the chart
+    :param traces: list of trace dicts with a ``type`` (``{"type": "bar", "x": ..., "y": ...}``)
+    :param layout: layout properties (title, axis titles, ...)
+    :return: the figure holding the new data
+    """
+    fig = cache.get(key)
+    if fig is None or [trace.type for trace in fig.data] != [spec["type"] for spec in traces]:
+        fig = go.Figure(data=[dict(spec) for spec in traces], layout=layout)
+        cache[key] = fig
+        return fig
+    with fig.batch_update():
+        for trace, spec in zip(fig.data, traces):
+            trace.update({name: value for name, value in spec.items() if name != "type"})
+        fig.update_layout(**layout)
+    return fig
+
+
+def category_colors(n: int) -> list:
+    """
+    One palette colour per bar
+    :param n: number of bars
+    :return: list of colours
+    """
+    return [PALETTE[i % len(PALETTE)] for i in range(n)]
+
+
+def point_count(fig: go.Figure) -> int:
+    """
+    Number of data points sent with a figure
+    :param fig: plotly figure
+    :return: total length of the trace data
+    """
+    total = 0
+    for trace in fig.data:
+        values = trace.values if trace.type == "pie" else trace.y
+        total += 0 if values is None else len(values)
+    return total
@@ -1,14 +1,453 @@
+import csv
+import os
+import re
+import unicodedata
+import numpy as np
 import pandas as pd
-from src.config import DATA_FILE_PATH, DATA_DICT_FILE_PATH # type: ignore
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.cache import read_csv_cached # type: ignore
+from src.config import DATA_FILE_PATH, DATA_DICT_FILE_PATH, CHUNK_SIZE, CHUNK_CELLS # type: ignore
+from src.schema import apply_schema, arrow_schema, build_schema, dictionary_kinds, to_date # type: ignore
 
 
-def load_data_and_dict() -> tuple:
+def load_data_and_dict(chunksize: int = None) -> tuple:
    """
    Load the dataset and the data dictionary
    Dataset files should not be renamed !
-   :param data_folder: folder where the dataset is stored
-   :return: tuple of the dataset and the data dictionary
+   The dataset is read through its Parquet cache (see src.cache), or streamed
+   in cleaned chunks when ``chunksize`` is given (see ``iter_clean_chunks``)
+   :param chunksize: number of records per chunk, None to load everything at once
+   :return: tuple of the dataset (or a generator of chunks) and the data dictionary
    """
-   df = pd.read_csv(DATA_FILE_PATH)   
    dictionnary = pd.read_csv(DATA_DICT_FILE_PATH)
+   if chunksize:
+      return iter_clean_chunks(DATA_FILE_PATH, dictionnary, chunksize), dictionnary
+   df = read_csv_cached(DATA_FILE_PATH)   
    return df, dictionnary
+
+
+# Missing-value tokens, matched on stripped and lower-cased values
+NA_TOKENS = re.compile(r"^(?:\s*|_+|n/a|na|null|none|unknown|\?)$", re.IGNORECASE)
+
+# Values that may hold a date (digits separated by -, / or .)
+DATE_LIKE = re.compile(r"^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?$")
+
+# Date layouts tried when detecting date columns, day-first before month-first
+DATE_FORMATS = [
+   "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y",
+   "%m/%d/%Y", "%Y/%m/%d", "%d/%m/%Y %H:%M", "%d/%m/%y",
+]
+
+
+def detect_date_format(values: pd.Series, sample_size: int = 200):
+   """
+   Find the date layout matching most values of a sample
+   :param values: stripped, date-like string values
+   :param sample_size: number of values tested
+   :return: strftime format, or None if no value of the sample is a date
+   """
+   sample = values.head(sample_size)
+   best, best_count = None, 0
+   for fmt in DATE_FORMATS:
+      count = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+      if count > best_count:
+         best, best_count = fmt, count
+      if best_count == len(sample):
+         break
+   return best
+
+
+def clean_text_values(values: pd.Series) -> pd.Series:
+   """
+   Normalize string values: dates to dd-mm-YYYY, missing tokens to NA,
+   everything else lower-cased with whitespace runs replaced by "_"
+   :param values: non-missing values of one column
+   :return: cleaned values, aligned with the input
+   """
+   values = values.astype(str).str.strip()
+   cleaned = pd.Series(pd.NA, index=values.index, dtype=object)
+   candidates = values[values.str.match(DATE_LIKE)]
+   # A column may mix a few layouts: parse with the dominant one, then retry on the rest
+   while not candidates.empty:
+      fmt = detect_date_format(candidates)
+      if fmt is None:
+         break
+      dates = pd.to_datetime(candidates, format=fmt, errors="coerce").dropna()
+      cleaned[dates.index] = dates.dt.strftime("%d-%m-%Y")
+      candidates = candidates.drop(dates.index)
+      values = values.drop(dates.index)
+   lower = values.str.lower()
+   text = lower.str.replace(r"\s+", "_", regex=True)
+   cleaned[values.index] = text.where(~lower.str.match(NA_TOKENS), pd.NA)
+   return cleaned
+
+
+def clean_column(col: pd.Series) -> pd.Series:
+   """
+   Vectorized cleaning of an object column.
+   Each distinct value is cleaned once and mapped back through factorize codes.
+   :param col: column to clean
+   :return: cleaned column (object dtype), missing values kept as missing
+   """
+   codes, uniques = pd.factorize(col)
+   cleaned = clean_text_values(pd.Series(uniques, dtype=object)).to_numpy()
+   out = col.to_numpy(dtype=object, copy=True)
+   present = codes >= 0
+   out[present] = cleaned.take(codes[present])
+   return pd.Series(out, index=col.index, name=col.name)
+
+
+def is_text(col: pd.Series) -> bool:
+   """True for object and pandas string columns"""
+   return col.dtype == "object" or isinstance(col.dtype, pd.StringDtype)
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+   """
+   Apply ``clean_column`` to every text column
+   :param df: raw dataframe
+   :return: dataframe with cleaned text columns
+   """
+   return df.apply(lambda col: clean_column(col) if is_text(col) else col)
+
+
+# ---------------------------------------------------------------------------
+# Column names and derived variables
+# ---------------------------------------------------------------------------
+
+def unique_names(columns) -> list:
+   """
+   Make column names unique by suffixing repeats with ".1", ".2", ...
+   :param columns: column names, possibly repeated (Excel exports)
+   :return: list of unique names, first occurrences unchanged
+   """
+   seen, names = {}, []
+   for col in map(str, columns):
+      name = col
+      while name in seen:
+         seen[col] += 1
+         name = f"{col}.{seen[col]}"
+      seen.setdefault(col, 0)
+      seen[name] = 0
+      names.append(name)
+   return names
+
+
+def clean_names(columns) -> list:
+   """
+   Same names as janitor's ``clean_names``: accents stripped, lower case,
+   spaces and punctuation replaced by "_", quotes removed
+   :param columns: column names
+   :return: list of cleaned names, made unique again if cleaning merged some
+   """
+   names = []
+   for col in map(str, columns):
+      name = unicodedata.normalize("NFKD", col).encode("ascii", "ignore").decode("ascii")
+      name = re.sub(r"['’]", "", re.sub(r"[ /:,?()\.\-\xa0]", "_", name.lower()))
+      names.append(name)
+   return [name.replace(".", "_") for name in unique_names(names)]
+
+
+# Age fields of the CRF: years, months, and the columns dropped once reconciled
+AGE_YEAR_COLS = ["age_annee", "age_année"]
+AGE_MONTH_COLS = ["age_mois", "age_enfant_mois"]
+AGE_DROP_COLS = [
+   "date_naissance", "age", "age_mois", "age_en", "age_annee", "age_enfant_mois", "age_année",
+   "age_connu", "date_naissance_connue",
+]
+
+# Age sources, in decreasing priority
+AGE_SOURCES = ["dob", "age", "years", "months"]
+
+
+def _date_values(df: pd.DataFrame, col: str) -> np.ndarray:
+   """Dates of a column as datetime64 values in their own unit, parsed if they are text"""
+   values = df[col]
+   if not pd.api.types.is_datetime64_any_dtype(values):
+      values = to_date(values)
+   return values.to_numpy()
+
+
+def _fill_numbers(row: np.ndarray, df: pd.DataFrame, columns, scale: float = 1.0) -> None:
+   """Element-wise maximum of the numeric columns present in ``df``, written into ``row``"""
+   for col in columns:
+      if col in df.columns:
+         np.fmax(row, pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan) / scale,
+                 out=row)
+
+
+def age_sources(df: pd.DataFrame, date_col: str = "date_inc", dob_col: str = "date_naissance") -> np.ndarray:
+   """
+   Ages in years given by each source, stacked in one array
+   :param df: records with raw or typed age columns
+   :param date_col: inclusion date
+   :param dob_col: date of birth
+   :return: float64 array of shape (len(AGE_SOURCES), rows), NaN where a source is missing
+   """
+   stack = np.full((len(AGE_SOURCES), len(df)), np.nan)
+   if date_col in df.columns and dob_col in df.columns:
+      elapsed = _date_values(df, date_col) - _date_values(df, dob_col)
+      # Whole days, floored as the notebook's .dt.days
+      with np.errstate(invalid="ignore"):
+         np.divide(elapsed // np.timedelta64(1, "D"), 365.25, out=stack[0])
+      stack[0][np.isnat(elapsed)] = np.nan
+   _fill_numbers(stack[1], df, ["age"])
+   _fill_numbers(stack[2], df, AGE_YEAR_COLS)
+   _fill_numbers(stack[3], df, AGE_MONTH_COLS, scale=12)
+   return stack
+
+
+def reconcile_age(df: pd.DataFrame, date_col: str = "date_inc", dob_col: str = "date_naissance",
+                  tolerance: float = 1.0) -> tuple:
+   """
+   Single age in years from the date of birth, the declared age, the year
+   fields and the month fields, in that order of priority (cleaning notebook)
+   The sources are stacked in one array and the first one present is taken
+   for each record, without intermediate columns.
+   :param df: records with raw or typed age columns
+   :param date_col: inclusion date
+   :param dob_col: date of birth
+   :param tolerance: difference in years above which sources are reported as conflicting
+   :return: tuple of the dataframe with one rounded ``age`` column instead of the
+      age fields, and the conflict report (see ``age_conflicts``)
+   """
+   if not any(col in df.columns for col in [date_col, dob_col, "age"] + AGE_YEAR_COLS + AGE_MONTH_COLS):
+      return df, age_conflicts(np.full((len(AGE_SOURCES), 0), np.nan), df.index[:0], tolerance)
+   stack = age_sources(df, date_col, dob_col)
+   # Priority mask: index of the first source present (0 when none is, then NaN anyway)
+   first = (~np.isnan(stack)).argmax(axis=0)
+   age = np.take_along_axis(stack, first[None, :], axis=0)[0]
+   conflicts = age_conflicts(stack, df.index, tolerance, first=first)
+   df = df.drop(columns=[col for col in AGE_DROP_COLS if col in df.columns])
+   df["age"] = np.round(age)
+   return df, conflicts
+
+
+def age_conflicts(stack: np.ndarray, index, tolerance: float = 1.0, first: np.ndarray = None) -> pd.DataFrame:
+   """
+   Records whose age sources disagree by more than ``tolerance`` years
+   :param stack: output of ``age_sources``
+   :param index: record index, aligned on the columns of ``stack``
+   :param tolerance: largest accepted difference between two sources, in years
+   :param first: index of the source used, computed if None
+   :return: one row per conflicting record: the value of each source (``AGE_SOURCES``),
+      the ``reconciled`` age, the ``source`` used and the ``spread`` between sources
+   """
+   spread = np.fmax.reduce(stack, axis=0) - np.fmin.reduce(stack, axis=0)
+   rows = np.flatnonzero(spread > tolerance)
+   sub = stack[:, rows]
+   if first is None:
+      first = (~np.isnan(stack)).argmax(axis=0)
+   chosen = first[rows]
+   report = pd.DataFrame({name: sub[i].astype("float32") for i, name in enumerate(AGE_SOURCES)},
+                         index=pd.Index(index).take(rows))
+   report["reconciled"] = sub[chosen, np.arange(len(rows))].astype("float32")
+   report["source"] = pd.Categorical.from_codes(chosen, AGE_SOURCES)
+   report["spread"] = spread[rows].astype("float32")
+   return report
+
+
+# ---------------------------------------------------------------------------
+# Streaming ingestion
+# ---------------------------------------------------------------------------
+
+def iter_raw_chunks(path: str, usecols=None, chunksize: int = CHUNK_SIZE, as_text: bool = True):
+   """
+   Read a CSV or Excel export in chunks
+   By default every value is read as text so that the types do not depend on the chunk.
+   :param path: CSV or .xlsx file
+   :param usecols: columns to keep, None for all
+   :param chunksize: number of records per chunk
+   :param as_text: False to keep the parsed values (numbers, dates) of each chunk
+   :return: generator of dataframes
+   """
+   if path.lower().endswith((".xlsx", ".xlsm")):
+      yield from _iter_excel_chunks(path, usecols, chunksize, as_text)
+      return
+   yield from pd.read_csv(path, usecols=usecols, dtype=str if as_text else None, chunksize=chunksize)
+
+
+def _iter_excel_chunks(path: str, usecols, chunksize: int, as_text: bool = True):
+   """Stream the first sheet of a workbook with openpyxl's read-only mode."""
+   from openpyxl import load_workbook
+
+   workbook = load_workbook(path, read_only=True, data_only=True)
+   try:
+      rows = workbook.worksheets[0].iter_rows(values_only=True)
+      header = [str(h) if h is not None else "" for h in next(rows)]
+      keep = [i for i, h in enumerate(header) if usecols is None or h in usecols]
+      columns = [header[i] for i in keep]
+      value = str if as_text else (lambda v: v)
+
+      def frame(batch):
+         chunk = pd.DataFrame(batch, columns=columns, dtype=object)
+         return chunk if as_text else chunk.infer_objects()
+
+      batch = []
+      for row in rows:
+         batch.append([None if row[i] is None else value(row[i]) for i in keep])
+         if len(batch) == chunksize:
+            yield frame(batch)
+            batch = []
+      if batch:
+         yield frame(batch)
+   finally:
+      workbook.close()
+
+
+def read_header(path: str) -> list:
+   """
+   Column names of a CSV or Excel export, without reading its records
+   :param path: CSV or .xlsx file
+   :return: list of names as written in the file (repeated names are not suffixed)
+   """
+   if path.lower().endswith((".xlsx", ".xlsm")):
+      from openpyxl import load_workbook
+
+      workbook = load_workbook(path, read_only=True, data_only=True)
+      try:
+         first = next(workbook.worksheets[0].iter_rows(values_only=True), ())
+         return [str(h) if h is not None else "" for h in first]
+      finally:
+         workbook.close()
+   # Not through pandas, which suffixes repeated names
+   with open(path, newline="", encoding="utf-8-sig") as f:
+      return next(csv.reader(f), [])
+
+
+def read_export(path: str, usecols=None, chunksize: int = None, clean: bool = False) -> tuple:
+   """
+   Load an export without its empty rows and columns, with unique names
+   The header is normalized once, and the null mask of each chunk gives its
+   empty columns, which are released with the chunk: only the non-empty
+   columns are kept (one array per chunk) and assembled at the end, one column
+   at a time, without the empty rows. The full-width frame is never built.
+   Chunk values keep their parsed types, as ``pd.read_csv`` / ``pd.read_excel`` give them.
+   :param path: CSV or .xlsx export
+   :param usecols: columns to read, None for all
+   :param chunksize: number of records per chunk, default ``CHUNK_CELLS`` values per chunk
+   :param clean: also apply ``clean_names`` (after ``reconcile_age``, which needs the CRF names, otherwise)
+   :return: (dataframe, report): the report holds the rows and columns read, the
+      ``empty_columns`` dropped and the ``renamed`` columns (new -> original name)
+   """
+   raw = read_header(path)
+   if chunksize is None:
+      width = len(usecols) if usecols is not None else len(raw)
+      chunksize = max(1, min(CHUNK_SIZE, CHUNK_CELLS // max(width, 1)))
+   header, sizes, masks, parts = None, [], [], {}
+   for chunk in iter_raw_chunks(path, usecols, chunksize, as_text=False):
+      if header is None:
+         # pandas has already suffixed the repeated CSV names: the originals come from the raw header
+         positions = {name: i for i, name in enumerate(unique_names(raw))}
+         original = [raw[positions[col]] if col in positions else col for col in map(str, chunk.columns)]
+         header = unique_names(original)
+         if clean:
+            header = clean_names(header)
+      # Renaming the header does not copy the chunk
+      chunk.columns = header
+      # One null mask gives the empty rows and columns of the chunk
+      present = chunk.notna().to_numpy()
+      # One copy per non-empty column, so that the chunk block is released now
+      for j in np.flatnonzero(present.any(axis=0)):
+         parts.setdefault(header[j], {})[len(sizes)] = chunk.iloc[:, j].copy()
+      sizes.append(len(chunk))
+      masks.append(present.any(axis=1))
+      del chunk, present
+   if header is None:
+      return pd.DataFrame(), {"rows_read": 0, "columns_read": 0, "empty_columns": [], "renamed": {}}
+   rows = np.concatenate(masks)
+   data = {}
+   for col in [col for col in header if col in parts]:
+      # The parts of a column are released as soon as it is assembled
+      pieces = parts.pop(col)
+      filled = [pieces[i] if i in pieces else pd.Series(np.nan, index=range(n)) for i, n in enumerate(sizes)]
+      column = pd.concat(filled, ignore_index=True)
+      if column.dtype == object:
+         # Chunks disagreed on the column type (numbers / text)
+         column = column.infer_objects()
+      data[col] = column if rows.all() else column[rows].reset_index(drop=True)
+   df = pd.DataFrame(data, copy=False)
+   report = {
+      "rows_read": len(rows),
+      "columns_read": len(header),
+      "empty_columns": [col for col in header if col not in data],
+      "renamed": {new: old for old, new in zip(original, header) if old != new},
+   }
+   return df, report
+
+
+def clean_chunk(chunk: pd.DataFrame, schema: dict) -> pd.DataFrame:
+   """
+   Clean one chunk of raw strings and cast it to the dataset schema
+   :param chunk: chunk read by ``iter_raw_chunks``
+   :param schema: dict column -> kind (see src.schema); other columns are cleaned as text
+   :return: typed chunk without its empty rows
+   """
+   chunk = chunk.dropna(axis=0, how="all")
+   for col in chunk.columns:
+      kind = schema.get(col, "text")
+      if kind in ("text", "coded"):
+         chunk[col] = clean_column(chunk[col].astype(object))
+   schema = {**{col: "text" for col in chunk.columns}, **schema}
+   chunk = apply_schema(chunk, schema)
+   # Flags stay nullable so that every chunk has the same dtypes
+   flags = [col for col in chunk.columns if schema[col] == "flag"]
+   chunk[flags] = chunk[flags].astype("Int8")
+   return chunk
+
+
+def iter_clean_chunks(path: str = DATA_FILE_PATH, dictionary: pd.DataFrame = None, chunksize: int = CHUNK_SIZE):
+   """
+   Stream an export as cleaned chunks with a fixed set of columns and types
+   :param path: CSV or .xlsx export
+   :param dictionary: data dictionary; only its variables are read (all columns if None)
+   :param chunksize: number of records per chunk
+   :return: generator of typed dataframes
+   """
+   known = dictionary_kinds(dictionary) if dictionary is not None else {}
+   usecols = (lambda col: col in known) if known else None
+   schema = None
+   for chunk in iter_raw_chunks(path, usecols, chunksize):
+      if schema is None:
+         schema = build_schema(chunk.columns, dictionary)
+      yield clean_chunk(chunk, schema)
+
+
+def stream_to_parquet(chunks, out_path: str, drop_empty: bool = True) -> dict:
+   """
+   Write cleaned chunks to a Parquet file without holding the dataset in memory
+   Columns that stayed empty over the whole stream are dropped at the end by
+   rewriting the file row group by row group.
+   :param chunks: iterable of cleaned chunks (e.g. ``iter_clean_chunks``)
+   :param out_path: Parquet file to write
+   :param drop_empty: drop the columns that contain no value at all
+   :return: dict with the number of rows written and the dropped columns
+   """
+   writer, non_null, rows = None, None, 0
+   tmp = f"{out_path}.tmp"
+   try:
+      for chunk in chunks:
+         if writer is None:
+            schema = arrow_schema(chunk)
+            writer = pq.ParquetWriter(tmp, schema)
+            non_null = pd.Series(0, index=chunk.columns)
+         writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+         non_null += chunk.notna().sum()
+         rows += len(chunk)
+   finally:
+      if writer is not None:
+         writer.close()
+   if writer is None:
+      return {"rows": 0, "dropped": []}
+   dropped = list(non_null.index[non_null == 0]) if drop_empty else []
+   if dropped:
+      keep = [c for c in schema.names if c not in dropped]
+      source = pq.ParquetFile(tmp)
+      with pq.ParquetWriter(out_path, schema=pa.schema([schema.field(c) for c in keep], metadata=schema.metadata)) as compact:
+         for i in range(source.num_row_groups):
+            compact.write_table(source.read_row_group(i, columns=keep))
+      os.remove(tmp)
+   else:
+      os.replace(tmp, out_path)
+   return {"rows": rows, "dropped": dropped}
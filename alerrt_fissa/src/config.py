@@ -1,7 +1,51 @@
+import os
 
 # This must be adjusted to the location of your data
 DATA_FOLDER='/mnt/c/Users/sanam/Desktop/Consultancy Data Analysis/TUB0008'
 DATA_FILE='LEO_18037_WANETAM2_CHILDHOODTB_Dataset.csv'
 DATA_DICT_FILE='LEO_18037_WANETAM2_CHILDHOODTB_DataDictionary.csv'
 DATA_FILE_PATH = f'{DATA_FOLDER}/{DATA_FILE}'
-DATA_DICT_FILE_PATH = f'{DATA_FOLDER}/{DATA_DICT_FILE}'
\ No newline at end of file
+DATA_DICT_FILE_PATH = f'{DATA_FOLDER}/{DATA_DICT_FILE}'
+
+# Folder for the columnar (Parquet) caches of the CSV extracts.
+# When unset, the cache is written next to the source CSV.
+CACHE_DIR = os.getenv('FISSA_CACHE_DIR')
+
+# Columns of the data dictionary holding the variable name and its type
+DICT_VARIABLE_COL = os.getenv('DICT_VARIABLE_COL', 'Variable')
+DICT_TYPE_COL = os.getenv('DICT_TYPE_COL', 'Type')
+
+# Number of records read at a time by the streaming loader
+CHUNK_SIZE = int(os.getenv('FISSA_CHUNK_SIZE', '50000'))
+
+# Values (records x columns) per chunk when loading wide exports (src.clean.read_export)
+CHUNK_CELLS = int(os.getenv('FISSA_CHUNK_CELLS', '5000000'))
+
+# Append-only store of cleaned records fed by incremental ingestion (src.store).
+# When set, the dashboard reads this store instead of CLEAN_DATA_FILE_PATH.
+STORE_DIR = os.getenv('FISSA_STORE_DIR')
+
+# Disease flags of the cleaned multi-country dataset and the dashboard age groups
+DISEASES = ['Arbovirus', 'ILI', 'SARI', 'Diarrhoea', 'Malaria_case']
+AGE_BINS = [0, 5, 15, 50, 120]
+AGE_LABELS = ['<5', '5–14', '15–49', '50+']
+
+# Maximum number of points per time series sent to the browser (src.charts)
+CHART_POINT_BUDGET = int(os.getenv('FISSA_POINT_BUDGET', '1000'))
+
+# Port of the local JSON API serving the dashboard queries (src.api)
+API_PORT = int(os.getenv('FISSA_API_PORT', '8765'))
+
+# Memory cap of the process-wide query result cache, in MB (src.result_cache)
+RESULT_CACHE_MB = int(os.getenv('FISSA_RESULT_CACHE_MB', '256'))
+
+# Opt-in instrumentation of the dashboards (src.perf): JSON log file (stderr
+# when unset) and number of recent runs per stage behind the p50 / p95
+PERF_ENABLED = os.getenv('FISSA_PERF', '').lower() in ('1', 'true', 'yes')
+PERF_LOG = os.getenv('FISSA_PERF_LOG')
+PERF_WINDOW = int(os.getenv('FISSA_PERF_WINDOW', '200'))
+
+# Low-memory mode of the query engine (src.rowstore): the records stay on disk and
+# the views are served from the counts, within a RAM budget in MB for the process
+LOW_MEMORY = os.getenv('FISSA_LOW_MEMORY', '').lower() in ('1', 'true', 'yes')
+RAM_BUDGET_MB = int(os.getenv('FISSA_RAM_BUDGET_MB', '512'))
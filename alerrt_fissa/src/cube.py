@@ -0,0 +1,93 @@
+"""
+Pre-aggregated daily count cube.
+
+The cube holds one row per day and stratum (e.g. country x gender x age group)
+with the number of records and the number of cases of each disease. It is built
+once when the data is loaded; the dashboard time series are then rolled up from
+the per-day totals instead of grouping the patient rows on every interaction.
+"""
+import pandas as pd
+
+from src.date_index import date_bounds  # type: ignore
+
+# Sidebar frequency -> pandas period code ("Daily" keeps the calendar day)
+FREQ_CODES = {"Weekly": "W", "Monthly": "M", "Quarterly": "Q", "Yearly": "Y"}
+
+# Column holding the number of records in each cell of the cube
+COUNT_COL = "n"
+
+
+def build_cube(df: pd.DataFrame, date_col: str, measures, dims=()) -> pd.DataFrame:
+    """
+    Count records and cases per day and stratum
+    :param df: case-level dataframe
+    :param date_col: datetime column, truncated to the day
+    :param measures: 0/1 columns summed in each cell (the disease flags)
+    :param dims: stratification columns (country, gender, age group, ...)
+    :return: dataframe with a ``date`` column, the dims, ``n`` and one column per measure
+    """
+    df = df[df[date_col].notna()]
+    keys = [df[date_col].dt.normalize().rename("date")] + [df[d] for d in dims]
+    values = df[list(measures)].fillna(0).astype("int64")
+    values[COUNT_COL] = 1
+    cube = values.groupby(keys, observed=True, dropna=False).sum()
+    return cube.reset_index().sort_values("date", kind="stable", ignore_index=True)
+
+
+def daily_totals(cube: pd.DataFrame, measures, by: str = None) -> pd.DataFrame:
+    """
+    Collapse the cube to one row per day, optionally kept apart for one dimension
+    :param cube: output of ``build_cube``
+    :param measures: measure columns to total (``n`` is always included)
+    :param by: dimension kept in the index (e.g. ``"country"``); the overall
+        total is added under the key ``"All"``
+    :return: dataframe indexed by date, or by (``by``, date) when ``by`` is given
+    """
+    measures = list(measures) + [COUNT_COL]
+    total = cube.groupby("date")[measures].sum()
+    if by is None:
+        return total
+    per_key = cube.groupby([cube[by].astype(object), "date"])[measures].sum()
+    return pd.concat([pd.concat({"All": total}, names=[by]), per_key]).sort_index()
+
+
+def rollup(daily: pd.DataFrame, columns, freq: str, dates=None, key: str = None) -> pd.DataFrame:
+    """
+    Roll per-day totals up to the requested frequency
+    :param daily: output of ``daily_totals``
+    :param columns: measure column(s) to return
+    :param freq: "Daily", "Weekly", "Monthly", "Quarterly" or "Yearly"
+    :param dates: optional (start, end) pair, both ends included
+    :param key: value of the ``by`` level of ``daily`` to select ("All" for every stratum)
+    :return: series (or dataframe for a list of columns) indexed by period labels
+    """
+    if key is not None:
+        keys = daily.index.get_level_values(0)
+        daily = daily.xs(key, level=0) if key in keys else daily.iloc[:0].droplevel(0)
+    if dates is not None:
+        daily = daily.loc[pd.to_datetime(dates[0]):pd.to_datetime(dates[1])]
+    values = daily[columns]
+    if freq == "Daily":
+        grouped = values.copy()
+        grouped.index = grouped.index.strftime("%Y-%m-%d")
+        return grouped
+    grouped = values.groupby(values.index.to_period(FREQ_CODES[freq])).sum()
+    grouped.index = grouped.index.astype(str)
+    return grouped
+
+
+def select(cube: pd.DataFrame, dates=None, **equals) -> pd.DataFrame:
+    """
+    Cells of the cube within a date range and matching the given dimension values
+    :param cube: output of ``build_cube`` (sorted by date)
+    :param dates: optional (start, end) pair, both ends included
+    :param equals: dimension filters, e.g. ``country="Gambia"``; "All" is ignored
+    :return: subset of the cube
+    """
+    if dates is not None:
+        lo, hi = date_bounds(cube["date"].to_numpy(), dates[0], dates[1])
+        cube = cube.iloc[lo:hi]
+    for dim, value in equals.items():
+        if value != "All":
+            cube = cube[cube[dim] == value]
+    return cube
@@ -0,0 +1,126 @@
+"""
+Sorted date index for range filtering without boolean masks.
+
+The loaded frame is kept sorted by its date column, so a date range is two
+binary searches and a zero-copy ``iloc`` slice. Each country keeps the
+(date-sorted) row positions of its records, so a country + date range filter
+only gathers the rows it returns.
+"""
+import numpy as np
+import pandas as pd
+
+
+def date_bounds(dates: np.ndarray, start, end) -> tuple:
+    """
+    Positions delimiting a date range in a sorted datetime64 array
+    :param dates: sorted datetime64 values (NaT last)
+    :param start: first date included
+    :param end: last date included
+    :return: (lo, hi) such that ``dates[lo:hi]`` is the range
+    """
+    start = pd.Timestamp(start).to_datetime64().astype(dates.dtype)
+    end = pd.Timestamp(end).to_datetime64().astype(dates.dtype)
+    return dates.searchsorted(start, side="left"), dates.searchsorted(end, side="right")
+
+
+def sort_by_date(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """
+    Sort a frame by its date column, undated rows last
+    :param df: dataframe
+    :param date_col: datetime column
+    :return: sorted dataframe with a fresh RangeIndex
+    """
+    dates = df[date_col]
+    if dates.is_monotonic_increasing and dates.notna().all():
+        return df.reset_index(drop=True)
+    return df.sort_values(date_col, kind="stable", na_position="last", ignore_index=True)
+
+
+def build_partitions(df: pd.DataFrame, date_col: str, by: str) -> dict:
+    """
+    Row positions of each value of ``by`` in a date-sorted frame
+    :param df: output of ``sort_by_date``
+    :param date_col: datetime column the frame is sorted on
+    :param by: partitioning column (e.g. ``"country"``)
+    :return: dict value -> (row positions, their dates), both in date order
+    """
+    codes, uniques = pd.factorize(df[by])
+    order = np.argsort(codes, kind="stable")
+    edges = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    dates = df[date_col].to_numpy()
+    parts = {}
+    for i, key in enumerate(uniques):
+        rows = order[edges[i]:edges[i + 1]]
+        parts[key] = (rows, dates[rows])
+    return parts
+
+
+def insert_sorted(df: pd.DataFrame, new: pd.DataFrame, date_col: str) -> tuple:
+    """
+    Merge new rows into a date-sorted frame without sorting it again
+    :param df: output of ``sort_by_date``
+    :param new: output of ``sort_by_date`` for the new rows
+    :param date_col: datetime column both frames are sorted on
+    :return: (merged frame, positions of the rows of ``df`` in it, positions of the rows of
+        ``new`` in it); new rows go after the rows of ``df`` with the same date
+    """
+    n, m = len(df), len(new)
+    dates = df[date_col].to_numpy()
+    # NaT sorts last in searchsorted too, so undated rows stay at the end
+    at = dates.searchsorted(new[date_col].to_numpy().astype(dates.dtype), side="right")
+    new_pos = at + np.arange(m)
+    old_pos = np.arange(n) + at.searchsorted(np.arange(n), side="right")
+    order = np.empty(n + m, dtype=np.intp)
+    order[old_pos] = np.arange(n)
+    order[new_pos] = np.arange(n, n + m)
+    merged = pd.concat([df, new], ignore_index=True)
+    # Frames with different category sets concatenate to object columns; restore the categoricals
+    for col in merged.columns:
+        dtype = next((f[col].dtype for f in (df, new)
+                      if col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype)), None)
+        if dtype is not None and not isinstance(merged[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].astype(dtype if dtype.ordered else "category")
+    return merged.take(order).reset_index(drop=True), old_pos, new_pos
+
+
+def merge_partitions(parts: dict, new_parts: dict, old_pos: np.ndarray, new_pos: np.ndarray,
+                     dates: np.ndarray) -> dict:
+    """
+    Partitions of a frame merged by ``insert_sorted``, from those of its two inputs
+    :param parts: output of ``build_partitions`` for the date-sorted frame
+    :param new_parts: output of ``build_partitions`` for the new rows
+    :param old_pos: positions of the frame rows in the merged frame
+    :param new_pos: positions of the new rows in the merged frame
+    :param dates: dates of the merged frame
+    :return: dict as ``build_partitions`` for the merged frame
+    """
+    empty = np.array([], dtype=np.intp)
+    merged = {}
+    for key in list(parts) + [key for key in new_parts if key not in parts]:
+        rows = old_pos[parts[key][0]] if key in parts else empty
+        added = new_pos[new_parts[key][0]] if key in new_parts else empty
+        # Both are increasing, so the new positions are inserted in one pass
+        rows = np.insert(rows, rows.searchsorted(added), added)
+        merged[key] = (rows, dates[rows])
+    return merged
+
+
+def filter_sorted(df: pd.DataFrame, date_col: str, parts: dict, key, start, end) -> pd.DataFrame:
+    """
+    Rows of a date-sorted frame within a date range, optionally for one partition
+    :param df: output of ``sort_by_date``
+    :param date_col: datetime column the frame is sorted on
+    :param parts: output of ``build_partitions``
+    :param key: partition value, or "All" for every row
+    :param start: first date included
+    :param end: last date included
+    :return: a zero-copy slice for "All", the gathered partition rows otherwise
+    """
+    if key == "All":
+        lo, hi = date_bounds(df[date_col].to_numpy(), start, end)
+        return df.iloc[lo:hi]
+    if key not in parts:
+        return df.iloc[:0]
+    rows, dates = parts[key]
+    lo, hi = date_bounds(dates, start, end)
+    return df.take(rows[lo:hi])
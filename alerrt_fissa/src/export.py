@@ -0,0 +1,109 @@
+"""
+Chunked exports of filtered data for the download buttons.
+
+An export is written in slices of ``CHUNK_SIZE`` rows to a temporary file, as
+CSV, gzip-compressed CSV, or Parquet with one row group per slice. The row
+filter is applied slice by slice, so neither the filtered copy nor the whole
+CSV text is held in memory. The dashboards pass ``export_file`` to the
+download button as a callable, so the export runs only when the button is
+clicked, not on every rerun. ``export_chunks`` writes any stream of slices,
+e.g. the records read back from disk by the low-memory engine (src.rowstore).
+"""
+import gzip
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import CHUNK_SIZE  # type: ignore
+from src.schema import arrow_schema  # type: ignore
+
+# Download option -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_slices(df: pd.DataFrame, chunksize: int = CHUNK_SIZE, where=None):
+    """
+    Consecutive slices of a frame, optionally filtered
+    :param df: dataframe to export
+    :param chunksize: rows per slice
+    :param where: optional function slice -> boolean mask of the rows to keep
+    :return: iterator of dataframes (empty slices are skipped)
+    """
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        if where is not None:
+            chunk = chunk[where(chunk)]
+        if len(chunk):
+            yield chunk
+
+
+def write_csv(chunks, out, columns) -> int:
+    """
+    Write slices as one CSV with a single header
+    :param chunks: iterator of dataframes
+    :param out: binary file object (plain or gzip)
+    :param columns: header, written even when there are no rows
+    :return: number of rows written
+    """
+    # Quoted as the data rows are (names holding commas or quotes)
+    out.write(pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8"))
+    rows = 0
+    for chunk in chunks:
+        out.write(chunk.to_csv(index=False, header=False).encode("utf-8"))
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, out, empty: pd.DataFrame) -> int:
+    """
+    Write slices as one Parquet file, one row group per slice
+    :param chunks: iterator of dataframes
+    :param out: binary file object
+    :param empty: zero-row frame with the columns and dtypes of the slices
+    :return: number of rows written
+    """
+    schema = arrow_schema(empty)
+    rows = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def export_chunks(chunks, empty: pd.DataFrame, fmt: str = "CSV (gzip)"):
+    """
+    Export a stream of slices to a temporary file
+    :param chunks: iterator of dataframes with the columns and dtypes of ``empty``
+    :param empty: zero-row frame giving the header and the Parquet schema
+    :param fmt: key of ``EXPORT_FORMATS``
+    :return: the file, opened for reading at its start (deleted when closed)
+    """
+    out = tempfile.TemporaryFile()
+    if fmt == "Parquet":
+        write_parquet(chunks, out, empty)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) as gz:
+            write_csv(chunks, gz, empty.columns)
+    else:
+        write_csv(chunks, out, empty.columns)
+    out.seek(0)
+    return out
+
+
+def export_file(df: pd.DataFrame, fmt: str = "CSV (gzip)", where=None, chunksize: int = CHUNK_SIZE):
+    """
+    Export a frame to a temporary file
+    :param df: dataframe to export
+    :param fmt: key of ``EXPORT_FORMATS``
+    :param where: optional function slice -> boolean mask of the rows to keep
+    :param chunksize: rows converted at a time
+    :return: the file, opened for reading at its start (deleted when closed)
+    """
+    return export_chunks(iter_slices(df, chunksize, where), df.iloc[:0], fmt)
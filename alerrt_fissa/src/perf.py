@@ -0,0 +1,158 @@
+"""
+Opt-in instrumentation of the dashboard hot paths.
+
+Enabled with ``FISSA_PERF=1``. Each instrumented stage (loading, sidebar,
+filter, grouping, KPIs, each tab, the export) records its wall time, the
+rows it processed and the bytes it allocated, measured with tracemalloc:
+
+    with perf.stage("filter") as record:
+        df_f = filter_data(df, ...)
+        record["rows"] = len(df_f)
+
+Every record is emitted as one JSON line on the ``fissa.perf`` logger (to
+``FISSA_PERF_LOG``, or stderr when unset) and kept in a process-wide window
+of the last ``FISSA_PERF_WINDOW`` runs of each stage, summarised by
+``summary`` as rolling p50 / p95. When disabled, ``stage`` does nothing and
+tracemalloc is not started.
+
+Allocations are traced for the whole process, and the peak tracemalloc
+keeps is process-wide too. A stage therefore resets the peak only when no
+other session has a stage open; a stage that overlaps one of another session
+reports ``alloc_bytes`` None and only its ``net_bytes`` (allocated minus
+freed), which still count the other sessions' allocations. Tracing also
+slows allocations down, which is why it is opt-in.
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from src.config import PERF_ENABLED, PERF_LOG, PERF_WINDOW  # type: ignore
+
+logger = logging.getLogger("fissa.perf")
+
+# stage -> deque of the last records
+_history = defaultdict(lambda: deque(maxlen=PERF_WINDOW))
+_lock = threading.Lock()
+# Per-thread (per-session) run ID
+_local = threading.local()
+# thread -> stack of its open stages
+_open = {}
+
+
+def enabled() -> bool:
+    """True when the instrumentation is on (``FISSA_PERF``)"""
+    return PERF_ENABLED
+
+
+def _setup() -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not logger.handlers:
+        handler = logging.FileHandler(PERF_LOG) if PERF_LOG else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def start_run() -> str:
+    """
+    Start a new rerun: the following records of this thread carry its ID
+    :return: run ID
+    """
+    _local.run = uuid.uuid4().hex[:12]
+    return _local.run
+
+
+@contextmanager
+def stage(name: str, rows: int = None):
+    """
+    Record the wall time, rows and allocations of a block
+    Stages may be nested; the allocations of an inner stage count in the outer one.
+    :param name: stage name
+    :param rows: rows processed, if known before the block
+    :return: context manager yielding the record, whose ``rows`` may be set in the block
+    """
+    record = {"stage": name, "rows": rows}
+    if not PERF_ENABLED:
+        yield record
+        return
+    _setup()
+    thread = threading.get_ident()
+    with _lock:
+        stack = _open.setdefault(thread, [])
+        current, peak = tracemalloc.get_traced_memory()
+        # Stages of other sessions are open: the peak is theirs too, and is not reset
+        shared = any(frames for key, frames in _open.items() if key != thread)
+        if shared:
+            for frames in _open.values():
+                for open_frame in frames:
+                    open_frame["shared"] = True
+        elif stack:
+            # The parent keeps the peak reached so far before it is reset
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        frame = {"start": current, "peak": current, "shared": shared}
+        stack.append(frame)
+        if not shared:
+            tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    try:
+        yield record
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        with _lock:
+            current, peak = tracemalloc.get_traced_memory()
+            stack.pop()
+            if not stack:
+                del _open[thread]
+            frame["peak"] = max(frame["peak"], peak)
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], frame["peak"])
+            record.update({
+                "ts": time.time(),
+                "run": getattr(_local, "run", None),
+                "ms": round(ms, 3),
+                "alloc_bytes": None if frame["shared"] else frame["peak"] - frame["start"],
+                "net_bytes": current - frame["start"],
+            })
+            _history[name].append(record)
+        logger.info(json.dumps(record))
+
+
+def summary() -> pd.DataFrame:
+    """
+    Rolling statistics of each stage over its last records
+    :return: dataframe indexed by stage: number of records, p50 / p95 wall time (ms),
+        median rows and median MB allocated (over the stages run alone)
+    """
+    with _lock:
+        history = {name: list(records) for name, records in _history.items()}
+    rows = []
+    for name, records in history.items():
+        ms = np.array([r["ms"] for r in records])
+        counts = [r["rows"] for r in records if r["rows"] is not None]
+        # Stages overlapping another session have no allocation peak
+        allocs = [r["alloc_bytes"] for r in records if r["alloc_bytes"] is not None]
+        rows.append({
+            "stage": name,
+            "n": len(records),
+            "p50 ms": np.percentile(ms, 50),
+            "p95 ms": np.percentile(ms, 95),
+            "rows": int(np.median(counts)) if counts else None,
+            "alloc MB": np.median(allocs) / 1e6 if allocs else None,
+        })
+    return pd.DataFrame(rows, columns=["stage", "n", "p50 ms", "p95 ms", "rows", "alloc MB"]).set_index("stage")
+
+
+def reset() -> None:
+    """Forget the recorded history"""
+    with _lock:
+        _history.clear()
@@ -0,0 +1,212 @@
+"""
+Parallel cleaning of the site exports into one dataset.
+
+Every CSV or Excel export of a folder is cleaned by its own worker process,
+streamed in chunks of ``CHUNK_SIZE`` records through the stages of the
+cleaning notebook:
+
+- ``read``: raw strings (``src.clean.iter_raw_chunks``)
+- ``names``: repeated headers suffixed, as in the notebook
+- ``age``: one ``age`` column from the age fields (``src.clean.reconcile_age``)
+- ``clean``: ``clean_names``, value cleaning and types (``src.clean.clean_chunk``)
+- ``classify``: case definitions (``src.case_definitions``), when requested
+- ``write``: the worker's Parquet part
+
+The parts are then merged into one Parquet file with a harmonized schema:
+the union of the columns of every site, with a ``site`` column naming the
+export. Columns a site does not have are null for its records. The time of
+each stage is reported per file, along with the merge and the wall time.
+
+Usage: python -m src.pipeline INPUT_DIR OUTPUT.parquet [--workers N] [--dict DICT.csv] [--rules gambia|fissa]
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.case_definitions import FISSA_RULES, GAMBIA_RULES, classify  # type: ignore
+from src.clean import clean_chunk, clean_names, iter_raw_chunks, reconcile_age, stream_to_parquet, unique_names  # type: ignore
+from src.config import CHUNK_SIZE  # type: ignore
+from src.schema import arrow_schema, build_schema  # type: ignore
+
+STAGES = ["read", "names", "age", "clean", "classify", "write"]
+
+# Rule sets of --rules -> (case definitions, symptom duration column)
+RULE_SETS = {
+    "gambia": (GAMBIA_RULES, "dur_sympt"),
+    "fissa": (FISSA_RULES, "duration_of_symptoms"),
+}
+
+EXPORT_PATTERNS = ["*.csv", "*.xlsx", "*.xlsm"]
+
+
+def site_files(input_dir: str) -> list:
+    """
+    Exports of a folder, largest first so that the longest jobs start first
+    :param input_dir: folder of site exports
+    :return: list of paths
+    """
+    paths = [p for pattern in EXPORT_PATTERNS for p in glob.glob(os.path.join(input_dir, pattern))]
+    return sorted(paths, key=lambda p: (-os.path.getsize(p), p))
+
+
+def site_name(path: str) -> str:
+    """Site label of an export: its file name without extension"""
+    return Path(path).stem
+
+
+def clean_site(path: str, out_path: str, dictionary: pd.DataFrame = None, rules: str = None,
+               chunksize: int = CHUNK_SIZE) -> dict:
+    """
+    Clean one export into a Parquet part (runs in a worker process)
+    :param path: CSV or Excel export
+    :param out_path: Parquet part to write
+    :param dictionary: optional data dictionary typing the columns
+    :param rules: key of ``RULE_SETS``, None to skip the case definitions
+    :param chunksize: records per chunk
+    :return: dict with the file, rows, age conflicts, columns and seconds spent in each stage
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    stats = {"rows": 0, "age_conflicts": 0}
+    start = time.perf_counter()
+
+    def chunks():
+        raw = iter_raw_chunks(path, chunksize=chunksize)
+        schema = None
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(raw, None)
+            t1 = time.perf_counter()
+            timings["read"] += t1 - t0
+            if chunk is None:
+                return
+            chunk.columns = unique_names(chunk.columns)
+            t2 = time.perf_counter()
+            timings["names"] += t2 - t1
+            chunk, conflicts = reconcile_age(chunk)
+            stats["age_conflicts"] += len(conflicts)
+            t3 = time.perf_counter()
+            timings["age"] += t3 - t2
+            chunk.columns = clean_names(chunk.columns)
+            if schema is None:
+                # The reconciled age is a number even for columns absent from the dictionary
+                schema = build_schema(chunk.columns, dictionary, age="numeric")
+            chunk = clean_chunk(chunk, schema)
+            t4 = time.perf_counter()
+            timings["clean"] += t4 - t3
+            if rules is not None:
+                definitions, duration_col = RULE_SETS[rules]
+                flags = classify(chunk, definitions, duration_col=duration_col)
+                chunk[flags.columns] = flags
+            chunk.insert(0, "site", pd.Categorical([site_name(path)] * len(chunk)))
+            timings["classify"] += time.perf_counter() - t4
+            stats["rows"] += len(chunk)
+            yield chunk
+
+    stream_to_parquet(chunks(), out_path, drop_empty=False)
+    total = time.perf_counter() - start
+    timings["write"] = total - sum(timings.values())
+    columns = len(pq.read_schema(out_path)) if os.path.exists(out_path) else 0
+    return {"file": os.path.basename(path), **stats, "columns": columns, **timings, "total": total}
+
+
+def harmonized_schema(parts) -> pa.Schema:
+    """
+    Union of the columns of the parts, each with the type of its first occurrence
+    :param parts: Parquet files
+    :return: Arrow schema with the pandas metadata (nullable flags, categories), ``site`` first
+    """
+    empty = {}
+    for part in parts:
+        for col, values in pq.read_schema(part).empty_table().to_pandas().items():
+            empty.setdefault(col, values)
+    return arrow_schema(pd.DataFrame(empty))
+
+
+def merge_parts(parts, out_path: str) -> int:
+    """
+    Concatenate Parquet parts row group by row group under the harmonized schema
+    :param parts: Parquet files written by ``clean_site``
+    :param out_path: merged Parquet file
+    :return: number of rows written
+    """
+    schema = harmonized_schema(parts)
+    rows = 0
+    with pq.ParquetWriter(out_path, schema) as writer:
+        for part in parts:
+            source = pq.ParquetFile(part)
+            for i in range(source.num_row_groups):
+                table = source.read_row_group(i)
+                columns = [
+                    table.column(field.name).cast(field.type) if field.name in table.column_names
+                    else pa.nulls(table.num_rows, field.type)
+                    for field in schema
+                ]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                rows += table.num_rows
+    return rows
+
+
+def run_pipeline(input_dir: str, out_path: str, workers: int = None, dictionary: pd.DataFrame = None,
+                 rules: str = None, chunksize: int = CHUNK_SIZE) -> dict:
+    """
+    Clean every export of a folder in parallel and merge them
+    :param input_dir: folder of site exports
+    :param out_path: merged Parquet file
+    :param workers: number of processes (default: one per CPU, at most one per file)
+    :param dictionary: optional data dictionary typing the columns
+    :param rules: key of ``RULE_SETS``, None to skip the case definitions
+    :param chunksize: records per chunk
+    :return: dict with the per-file ``timings`` (dataframe), the ``merge`` and ``wall`` seconds and the ``rows``
+    """
+    paths = site_files(input_dir)
+    if not paths:
+        raise ValueError(f"no CSV or Excel export in {input_dir}")
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    start = time.perf_counter()
+    tmp_dir = tempfile.mkdtemp(prefix="fissa-parts-", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        parts = [os.path.join(tmp_dir, f"part-{i:05d}.parquet") for i in range(len(paths))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(clean_site, path, part, dictionary, rules, chunksize)
+                       for path, part in zip(paths, parts)]
+            timings = [future.result() for future in futures]
+        t0 = time.perf_counter()
+        rows = merge_parts([part for part in parts if os.path.exists(part)], out_path)
+        merge = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {"timings": pd.DataFrame(timings), "merge": merge, "wall": time.perf_counter() - start, "rows": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean a folder of FISSA site exports in parallel")
+    parser.add_argument("input_dir")
+    parser.add_argument("out_path", help="merged Parquet file")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dict", default=None, help="data dictionary CSV")
+    parser.add_argument("--rules", choices=list(RULE_SETS), default=None, help="case definitions to apply")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    dictionary = pd.read_csv(args.dict) if args.dict else None
+    result = run_pipeline(args.input_dir, args.out_path, args.workers, dictionary, args.rules, args.chunksize)
+    timings = result["timings"]
+    with pd.option_context("display.float_format", "{:.2f}".format, "display.width", 200):
+        print(timings.to_string(index=False))
+    print("stage totals (s): " + ", ".join(f"{s} {timings[s].sum():.2f}" for s in STAGES))
+    print(f"{result['rows']} records from {len(timings)} files -> {args.out_path}")
+    print(f"merge {result['merge']:.2f} s, wall {result['wall']:.2f} s "
+          f"(sum of file times {timings['total'].sum():.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Single-pass data-quality profile of a dataset, per column and stratum.
+
+A ``QualityProfiler`` reads the records in chunks (a frame, or the chunks
+of src.clean.iter_raw_chunks for a raw export) and keeps, for each stratum
+(country x month of the date column) and each column:
+
+- the number of records and of missing values
+- the minimum and maximum of numeric and date columns
+- the number of values that are missing-value tokens (``n/a``, ``unknown``,
+  ``?``... see src.clean.NA_TOKENS) not yet converted to missing
+- a HyperLogLog sketch of the distinct values: ``2**PRECISION`` one-byte
+  registers, about 3 % standard error whatever the cardinality
+
+Each chunk is read once, every statistic is a grouped reduction over the
+stratum codes, and every statistic merges across chunks and strata (sums,
+min / max, register-wise max). ``profile`` returns one row per stratum and
+column, with the registers kept so that any set of strata (a country, a
+date range) is summarised by ``summarise`` without reading the records.
+The query engine writes the profile next to the data, once per version
+(src.cache.cached_table).
+"""
+import numpy as np
+import pandas as pd
+
+from src.clean import NA_TOKENS  # type: ignore
+
+# HyperLogLog registers per sketch: 2**10 = 1024 bytes, standard error 1.04 / 32
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+
+# Label of the records without a country or date
+UNKNOWN = "unknown"
+
+
+def hll_update(registers: np.ndarray, groups: np.ndarray, hashes: np.ndarray) -> None:
+    """
+    Add hashed values to HyperLogLog sketches, in place
+    :param registers: (sketches, REGISTERS) uint8 array
+    :param groups: sketch of each value
+    :param hashes: uint64 hash of each value
+    """
+    # The first bits choose the register; the rank is the position of the first
+    # set bit among the next 32 (exact in float64, longer runs have p < 2**-32)
+    bucket = (hashes >> np.uint64(64 - PRECISION)).astype(np.int64)
+    rest = ((hashes >> np.uint64(32 - PRECISION)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    rank = (33 - np.frexp(rest)[1]).astype(np.uint8)
+    np.maximum.at(registers.reshape(-1), groups * REGISTERS + bucket, rank)
+
+
+def hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """
+    Distinct counts of HyperLogLog sketches
+    :param registers: (..., REGISTERS) uint8 array
+    :return: estimates (linear counting for the small cardinalities)
+    """
+    m = REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    flat = registers.reshape(-1, m)
+    powers = np.ldexp(1.0, -np.arange(256))
+    # By blocks of sketches: the float64 terms take 8 times the registers
+    harmonic = np.concatenate([powers[flat[i:i + 1024]].sum(axis=1) for i in range(0, len(flat), 1024)] or [[]])
+    raw = (alpha * m * m / harmonic).reshape(registers.shape[:-1])
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.round(np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw))
+
+
+def _as_number(col: pd.Series):
+    """Float values of a numeric or date column (seconds for dates), None for other columns"""
+    if isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(col.dtype):
+        return None
+    if pd.api.types.is_datetime64_any_dtype(col.dtype):
+        return ((col - pd.Timestamp(0)) / pd.Timedelta(1, "s")).to_numpy("float64", na_value=np.nan)
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        return col.to_numpy("float64", na_value=np.nan)
+    return None
+
+
+def _kind(col: pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(col.dtype):
+        return "date"
+    return "text" if _as_number(col) is None else "number"
+
+
+def _token_rows(col: pd.Series) -> np.ndarray:
+    """Rows of a text column holding a missing-value token, as a boolean mask"""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, uniques = col.cat.codes.to_numpy(), col.cat.categories
+    elif pd.api.types.is_object_dtype(col.dtype) or pd.api.types.is_string_dtype(col.dtype):
+        codes, uniques = pd.factorize(col)
+    else:
+        return np.zeros(len(col), dtype=bool)
+    # Each distinct value is tested once
+    tokens = pd.Series(uniques, dtype=object).astype(str).str.strip().str.match(NA_TOKENS).to_numpy(bool)
+    return (codes >= 0) & tokens[np.maximum(codes, 0)] if len(tokens) else np.zeros(len(col), dtype=bool)
+
+
+class QualityProfiler:
+    """
+    Profile accumulated over the chunks of a dataset
+    """
+
+    def __init__(self, date_col: str = None, country_col: str = "country"):
+        """
+        :param date_col: date of the records, stratified by month (no month strata when None)
+        :param country_col: country of the records (no country strata when absent)
+        """
+        self.date_col = date_col
+        self.country_col = country_col
+        self.columns = None
+        # (country, month code) -> stratum
+        self.strata = {}
+        self.rows = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, n_strata: int) -> None:
+        if n_strata <= len(self.rows):
+            return
+        size = max(n_strata, 2 * len(self.rows), 8)
+        extra = size - len(self.rows)
+        n_cols = len(self.columns)
+        self.rows = np.concatenate([self.rows, np.zeros(extra, dtype=np.int64)])
+        self.missing = np.vstack([self.missing, np.zeros((extra, n_cols), dtype=np.int64)])
+        self.invalid = np.vstack([self.invalid, np.zeros((extra, n_cols), dtype=np.int64)])
+        self.low = np.vstack([self.low, np.full((extra, n_cols), np.nan)])
+        self.high = np.vstack([self.high, np.full((extra, n_cols), np.nan)])
+        self.registers = np.concatenate(
+            [self.registers, np.zeros((n_cols, extra, REGISTERS), dtype=np.uint8)], axis=1)
+
+    def _labels(self, chunk: pd.DataFrame) -> tuple:
+        """
+        Country and month codes of each record
+        :return: (country codes, country names, months as year * 12 + month - 1,
+            -1 without a date and -2 without month strata)
+        """
+        n = len(chunk)
+        if self.country_col in chunk.columns:
+            codes, names = pd.factorize(chunk[self.country_col].astype(object), use_na_sentinel=False)
+            names = [UNKNOWN if pd.isna(name) else str(name) for name in names]
+        else:
+            codes, names = np.zeros(n, dtype=np.int64), ["All"]
+        if self.date_col is None:
+            return codes, names, np.full(n, -2, dtype=np.int64)
+        dates = chunk[self.date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates.dtype):
+            dates = pd.to_datetime(dates, errors="coerce", dayfirst=True)
+        month = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy("float64", na_value=-1).astype(np.int64)
+        return codes, names, month
+
+    def update(self, chunk: pd.DataFrame) -> "QualityProfiler":
+        """
+        Add a chunk of records
+        :param chunk: records, with the columns of the first chunk
+        :return: the profiler
+        """
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            n_cols = len(self.columns)
+            self.missing = np.zeros((0, n_cols), dtype=np.int64)
+            self.invalid = np.zeros((0, n_cols), dtype=np.int64)
+            self.low = np.zeros((0, n_cols))
+            self.high = np.zeros((0, n_cols))
+            self.registers = np.zeros((n_cols, 0, REGISTERS), dtype=np.uint8)
+            self.kinds = [_kind(chunk[name]) for name in self.columns]
+        if chunk.empty:
+            return self
+        codes, names, month = self._labels(chunk)
+        local, keys = pd.factorize(codes.astype(np.int64) << 32 | (month + 2))
+        # Chunk strata -> profile strata
+        pairs = [(names[key >> 32], (key & 0xFFFFFFFF) - 2) for key in keys.tolist()]
+        ids = np.array([self.strata.setdefault(pair, len(self.strata)) for pair in pairs], dtype=np.int64)
+        self._grow(len(self.strata))
+        n_local = len(ids)
+        self.rows[ids] += np.bincount(local, minlength=n_local)
+        groups = ids[local]
+        for j, name in enumerate(self.columns):
+            col = chunk[name]
+            present = col.notna().to_numpy()
+            self.missing[ids, j] += np.bincount(local[~present], minlength=n_local)
+            self.invalid[ids, j] += np.bincount(local[_token_rows(col)], minlength=n_local)
+            if present.any():
+                hashes = pd.util.hash_pandas_object(col[present], index=False).to_numpy()
+                hll_update(self.registers[j], groups[present], hashes)
+            values = _as_number(col)
+            if values is not None:
+                group_values = pd.Series(values).groupby(local)
+                low = group_values.min().reindex(range(n_local)).to_numpy()
+                high = group_values.max().reindex(range(n_local)).to_numpy()
+                self.low[ids, j] = np.fmin(self.low[ids, j], low)
+                self.high[ids, j] = np.fmax(self.high[ids, j], high)
+        return self
+
+    def profile(self) -> pd.DataFrame:
+        """
+        One row per stratum and column
+        :return: dataframe with country, month, column, rows, missing, invalid, distinct,
+            min and max (float; seconds since 1970 for dates), kind ("number", "date" or "text")
+            and the HyperLogLog ``registers`` (bytes)
+        """
+        columns = ["country", "month", "column", "rows", "missing", "invalid", "distinct", "min", "max",
+                   "kind", "registers"]
+        if self.columns is None or not self.strata:
+            return pd.DataFrame(columns=columns)
+        n_strata, n_cols = len(self.strata), len(self.columns)
+        pairs = list(self.strata)
+        registers = self.registers[:, :n_strata].transpose(1, 0, 2).reshape(-1, REGISTERS)
+        return pd.DataFrame({
+            "country": np.repeat([c for c, _ in pairs], n_cols),
+            "month": np.repeat([_month_label(m) for _, m in pairs], n_cols),
+            "column": np.tile(self.columns, n_strata),
+            "rows": np.repeat(self.rows[:n_strata], n_cols),
+            "missing": self.missing[:n_strata].ravel(),
+            "invalid": self.invalid[:n_strata].ravel(),
+            "distinct": hll_estimate(registers).astype(np.int64),
+            "min": self.low[:n_strata].ravel(),
+            "max": self.high[:n_strata].ravel(),
+            "kind": np.tile(self.kinds, n_strata),
+            "registers": [r.tobytes() for r in registers],
+        }, columns=columns)
+
+
+def _month_label(code: int) -> str:
+    if code == -2:
+        return "All"
+    return UNKNOWN if code < 0 else f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def profile_chunks(chunks, date_col: str = None, country_col: str = "country") -> pd.DataFrame:
+    """
+    Profile of a stream of chunks
+    :param chunks: iterable of dataframes (e.g. ``src.clean.iter_raw_chunks``)
+    :param date_col: date column stratified by month
+    :param country_col: country column
+    :return: output of ``QualityProfiler.profile``
+    """
+    profiler = QualityProfiler(date_col, country_col)
+    for chunk in chunks:
+        profiler.update(chunk)
+    return profiler.profile()
+
+
+def profile_frame(df: pd.DataFrame, date_col: str = None, country_col: str = "country",
+                  chunksize: int = 100_000) -> pd.DataFrame:
+    """
+    Profile of an in-memory frame, read in slices of ``chunksize`` records
+    :param df: records
+    :param date_col: date column stratified by month
+    :param country_col: country column
+    :param chunksize: records per slice (bounds the temporary arrays)
+    :return: output of ``QualityProfiler.profile``
+    """
+    chunks = (df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize))
+    return profile_chunks(chunks, date_col, country_col)
+
+
+def summarise(profile: pd.DataFrame, country: str = None, months=None) -> pd.DataFrame:
+    """
+    Quality of each column over a set of strata, from the profile only
+    :param profile: output of ``QualityProfiler.profile``
+    :param country: country to keep (None or "All": every country)
+    :param months: months ("YYYY-MM") to keep, None for all
+    :return: dataframe indexed by column: rows, missing, % missing, invalid tokens,
+        distinct (estimated), min and max
+    """
+    rows = profile
+    if country not in (None, "All"):
+        rows = rows[rows["country"] == country]
+    if months is not None:
+        rows = rows[rows["month"].isin(list(months))]
+    order = pd.unique(profile["column"])
+    grouped = rows.groupby("column", sort=False)
+    summary = grouped[["rows", "missing", "invalid"]].sum().reindex(order, fill_value=0)
+    summary["% missing"] = (summary["missing"] / summary["rows"].where(summary["rows"] > 0) * 100).round(2)
+    registers = {
+        name: np.maximum.reduce(np.frombuffer(b"".join(group["registers"]), np.uint8).reshape(-1, REGISTERS))
+        for name, group in grouped
+    }
+    merged = np.array([registers.get(name, np.zeros(REGISTERS, np.uint8)) for name in order])
+    summary["distinct"] = hll_estimate(merged).astype(np.int64) if len(order) else []
+    kind = profile.groupby("column", sort=False)["kind"].first().reindex(order)
+    low = grouped["min"].min().reindex(order)
+    high = grouped["max"].max().reindex(order)
+    summary["min"] = [_format(v, k) for v, k in zip(low, kind)]
+    summary["max"] = [_format(v, k) for v, k in zip(high, kind)]
+    summary.index.name = "column"
+    return summary[["rows", "missing", "% missing", "invalid", "distinct", "min", "max"]]
+
+
+def _format(value: float, kind: str) -> str:
+    if kind == "text" or pd.isna(value):
+        return ""
+    if kind == "date":
+        return pd.Timestamp(value, unit="s").strftime("%Y-%m-%d")
+    return f"{value:g}"
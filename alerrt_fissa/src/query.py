@@ -0,0 +1,882 @@
+"""
+Headless query engine behind the dashboards and the HTTP API (src.api).
+
+A ``QueryEngine`` holds one copy of the cleaned dataset: the date-sorted
+records, the per-country row partitions, the daily cube and the alert
+table. It answers the dashboard queries (time series, KPIs, alerts) from
+them. Results go to a process-wide cache (src.result_cache), bounded in
+memory and keyed on the data version and the query arguments, so concurrent
+users asking for the same view share one computation. When the source CSV
+or the store changes, the next query reloads the data and drops the results
+of the older version; the parts added to a store are merged into the loaded
+records instead. Each time series is kept as prefix sums
+(src.series_stats), from which the cumulative totals, moving averages and
+descriptive statistics of any date range are read without a rescan.
+
+The engine is thread-safe for reads: queries only slice and aggregate the
+shared frames, and callers get read-only zero-copy views of them.
+
+In low-memory mode (``FISSA_LOW_MEMORY``, for small field servers) the records
+are not loaded: they are written once, in chunks, to an on-disk row store
+(src.rowstore) with the cube, the date index and the packed flags, which are
+memory-mapped. Every dashboard view is then answered from the counts; only
+``filter`` and the exports read records, batch by batch. The result cache is
+capped to a share of ``FISSA_RAM_BUDGET_MB``.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.alerts import METHODS, alert_series, compute_alerts, current_signals  # type: ignore
+from src.breakdowns import DIMS, breakdown, breakdown_cells, breakdown_chunks, crosstab  # type: ignore
+from src.cache import cache_path, cached_table, read_csv_cached  # type: ignore
+from src.config import (AGE_BINS, AGE_LABELS, CHUNK_SIZE, DISEASES, LOW_MEMORY, RAM_BUDGET_MB,  # type: ignore
+                        RESULT_CACHE_MB, STORE_DIR)
+from src.cube import COUNT_COL, build_cube, daily_totals, rollup, select  # type: ignore
+from src.date_index import (build_partitions, date_bounds, filter_sorted, insert_sorted,  # type: ignore
+                            merge_partitions, sort_by_date)
+from src.export import export_chunks, export_file  # type: ignore
+from src.quality import profile_chunks, profile_frame, summarise  # type: ignore
+from src.result_cache import ResultCache  # type: ignore
+from src.rowstore import build_row_store, cached_row_store, store_schema  # type: ignore
+from src.schema import apply_schema, build_schema, read_dtypes  # type: ignore
+from src.seasonality import BANDS, UNITS, build_seasons, period_of  # type: ignore
+from src.series_stats import SeriesPrefix  # type: ignore
+from src.symptoms import count_combinations, pack_flags, symptom_report  # type: ignore
+from src.store import load_alerts, load_store, read_cube, read_manifest, read_parts, store_version  # type: ignore
+
+DATE_COL = "date_inclusion"
+FREQS = ["Daily", "Weekly", "Monthly", "Quarterly", "Yearly"]
+CUBE_DIMS = ["country", "gender", "age_group"]
+
+
+def load_frame(path: str = None, store_dir: str = None) -> tuple:
+    """
+    Cleaned records, sorted by inclusion date, with their cube when the store has one
+    :param path: cleaned CSV (read through the Parquet cache)
+    :param store_dir: incrementally ingested store, used instead of ``path`` when set
+    :return: (records, cube or None)
+    """
+    if store_dir:
+        df, cube = load_store(store_dir)
+        return sort_by_date(df, DATE_COL), cube
+    if not path:
+        raise ValueError("CLEAN_DATA_FILE_PATH not found in .env")
+    # Typed Parquet cache, rebuilt only when the CSV changes; symptom and
+    # disease flags are stored as int8 (see src.schema)
+    df = read_csv_cached(
+        path,
+        schema=build_schema(pd.read_csv(path, nrows=0).columns),
+        dates=[DATE_COL],
+        categories=["country", "gender"],
+        flags=DISEASES
+    )
+    if "age" in df.columns:
+        df["age_group"] = pd.cut(df["age"], AGE_BINS, labels=AGE_LABELS)
+    # Kept sorted by date so that date ranges are binary searches
+    return sort_by_date(df, DATE_COL), None
+
+
+def _csv_dtypes(path: str, columns, chunksize: int) -> dict:
+    """
+    dtype of columns read in chunks: the type parsed in every chunk, widened to
+    float when integer and decimal chunks mix, text when they disagree otherwise
+    """
+    kinds = {col: set() for col in columns}
+    if columns:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            for col, dtype in chunk.dtypes.items():
+                kinds[col].add(dtype.kind)
+    dtypes = {}
+    for col, seen in kinds.items():
+        if seen == {"i"}:
+            dtypes[col] = "int64"
+        elif seen and seen <= {"i", "f"}:
+            dtypes[col] = "float64"
+        elif seen == {"b"}:
+            dtypes[col] = "bool"
+        else:
+            dtypes[col] = "str"
+    return dtypes
+
+
+def _csv_chunks(path: str, chunksize: int):
+    """Chunks of the cleaned CSV, with the columns and dtypes ``load_frame`` gives the whole file"""
+    header = pd.read_csv(path, nrows=0).columns
+    schema = build_schema(header, **{DATE_COL: "date", "country": "coded", "gender": "coded"})
+    schema.update({col: "flag" for col in DISEASES if col in header})
+    # Flags and dates are cast by apply_schema whatever their parsed type; the other
+    # columns are given the same dtype in every chunk
+    dtypes = read_dtypes(schema)
+    dtypes.update(_csv_dtypes(path, [col for col in header if col not in schema], chunksize))
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in header}
+    for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunksize):
+        apply_schema(chunk, schema)
+        if "age" in chunk.columns:
+            chunk["age_group"] = pd.cut(chunk["age"], AGE_BINS, labels=AGE_LABELS)
+        yield chunk
+
+
+def _store_chunks(paths, chunksize: int):
+    """Records of the store parts, in batches"""
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+def source_chunks(path: str = None, store_dir: str = None, chunksize: int = CHUNK_SIZE) -> tuple:
+    """
+    Cleaned records in chunks, typed as by ``load_frame`` (low-memory mode)
+    :param path: cleaned CSV
+    :param store_dir: incrementally ingested store, used instead of ``path`` when set
+    :param chunksize: records per chunk
+    :return: (iterator of dataframes, Arrow schema of all the store parts or None for a CSV)
+    """
+    if store_dir:
+        paths = [os.path.join(store_dir, part) for part in read_manifest(store_dir)["parts"]]
+        if not paths:
+            raise ValueError(f"no records in the store {store_dir}")
+        # Parts written by different ingestions may not have the same columns
+        schema = pa.unify_schemas([store_schema(pq.read_schema(p)) for p in paths], promote_options="permissive")
+        return _store_chunks(paths, chunksize), schema
+    if not path:
+        raise ValueError("CLEAN_DATA_FILE_PATH not found in .env")
+    return _csv_chunks(path, chunksize), None
+
+
+def build_dataset(df: pd.DataFrame, cube: pd.DataFrame = None, parts: dict = None,
+                  daily: pd.DataFrame = None) -> dict:
+    """
+    Indexes and aggregates shared by every query
+    :param df: date-sorted records
+    :param cube: daily cube, built from ``df`` when None
+    :param parts: country partitions of ``df``, built when None
+    :param daily: per-country daily totals of ``cube``, computed when None
+    :return: dict with ``frame``, its sorted ``dates`` and ``columns``, ``parts``, ``cube``,
+        the ``diseases`` it counts, ``daily``, the date range (``start``, ``end``), and the ``alerts`` table, ``seasons``
+        profiles, ``quality`` profile, packed ``symptoms`` flags and ``breakdowns`` cells
+        (computed on first use); ``rows`` is None
+    """
+    if cube is None:
+        dims = [c for c in CUBE_DIMS if c in df.columns]
+        cube = build_cube(df, DATE_COL, [d for d in DISEASES if d in df.columns], dims=dims)
+    # A store or an extract may lack some of the disease columns
+    diseases = [d for d in DISEASES if d in cube.columns]
+    return {
+        "frame": df,
+        "rows": None,
+        "dates": df[DATE_COL].to_numpy(),
+        "columns": list(df.columns),
+        "parts": build_partitions(df, DATE_COL, "country") if parts is None else parts,
+        "cube": cube,
+        "diseases": diseases,
+        "daily": daily_totals(cube, diseases, by="country") if daily is None else daily,
+        "start": df[DATE_COL].min(),
+        "end": df[DATE_COL].max(),
+        "alerts": None,
+        "seasons": None,
+        "quality": None,
+        "symptoms": None,
+        "breakdowns": None,
+    }
+
+
+def extend_dataset(data: dict, new: pd.DataFrame, cube: pd.DataFrame) -> dict:
+    """
+    ``build_dataset`` of the records of a dataset and new ones: the new records are
+    merged into the sorted frame, its partitions and its daily totals, which are
+    not rebuilt from the whole history
+    :param data: output of ``build_dataset``
+    :param new: new records
+    :param cube: daily cube of all the records
+    :return: dict as ``build_dataset``, with the derived tables to compute again
+    """
+    new = sort_by_date(new, DATE_COL)
+    df, old_pos, new_pos = insert_sorted(data["frame"], new, DATE_COL)
+    dates = df[DATE_COL].to_numpy()
+    parts = merge_partitions(data["parts"], build_partitions(new, DATE_COL, "country"), old_pos, new_pos, dates)
+    diseases = [d for d in DISEASES if d in cube.columns]
+    daily = None
+    if diseases == data["diseases"]:
+        dims = [c for c in CUBE_DIMS if c in new.columns]
+        added = daily_totals(build_cube(new, DATE_COL, diseases, dims=dims), diseases, by="country")
+        daily = pd.concat([data["daily"], added]).groupby(level=[0, 1]).sum()
+    return build_dataset(df, cube, parts=parts, daily=daily)
+
+
+def build_row_dataset(rows) -> dict:
+    """
+    Dataset of the low-memory mode: the same entries as ``build_dataset``, read
+    from an on-disk row store instead of a frame
+    :param rows: src.rowstore.RowStore
+    :return: dict as ``build_dataset`` with ``frame`` None and ``rows`` the store;
+        ``dates``, ``parts`` and the packed flags are memory-mapped
+    """
+    cube = rows.cube()
+    diseases = [d for d in DISEASES if d in cube.columns]
+    return {
+        "frame": None,
+        "rows": rows,
+        "dates": rows.dates,
+        "columns": rows.columns,
+        "parts": rows.parts,
+        "cube": cube,
+        "diseases": diseases,
+        "daily": daily_totals(cube, diseases, by="country"),
+        "start": pd.Timestamp(rows.meta["start"]) if rows.meta["start"] else pd.NaT,
+        "end": pd.Timestamp(rows.meta["end"]) if rows.meta["end"] else pd.NaT,
+        "alerts": None,
+        "seasons": None,
+        "quality": None,
+        "symptoms": None,
+        "breakdowns": None,
+    }
+
+
+class QueryEngine:
+    """
+    Shared dataset and result cache answering the dashboard queries
+    """
+
+    def __init__(self, path: str = None, store_dir: str = STORE_DIR, cache_mb: int = RESULT_CACHE_MB,
+                 low_memory: bool = LOW_MEMORY, ram_budget_mb: int = RAM_BUDGET_MB):
+        """
+        :param path: cleaned CSV, defaults to ``CLEAN_DATA_FILE_PATH``
+        :param store_dir: store read instead of the CSV when set (``FISSA_STORE_DIR``)
+        :param cache_mb: memory cap of the result cache (``FISSA_RESULT_CACHE_MB``)
+        :param low_memory: keep the records on disk (``FISSA_LOW_MEMORY``, see src.rowstore)
+        :param ram_budget_mb: memory budget of the low-memory mode (``FISSA_RAM_BUDGET_MB``):
+            the result cache gets at most an eighth of it, a record batch about 1/64
+        """
+        self.path = path or os.getenv("CLEAN_DATA_FILE_PATH")
+        self.store_dir = store_dir
+        self.low_memory = low_memory
+        self.ram_budget_mb = ram_budget_mb
+        if low_memory:
+            cache_mb = min(cache_mb, ram_budget_mb // 8)
+        self.results = ResultCache(cache_mb * 1024 * 1024)
+        self._lock = threading.RLock()
+        self._version = None
+        self._data = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cache_mb: int = RESULT_CACHE_MB) -> "QueryEngine":
+        """
+        Engine over an in-memory frame (benchmarks, notebooks)
+        :param df: cleaned records
+        :param cache_mb: memory cap of the result cache
+        :return: QueryEngine whose data never reloads
+        """
+        engine = cls(path="", store_dir=None, cache_mb=cache_mb, low_memory=False)
+        engine._version = "frame"
+        engine._data = build_dataset(sort_by_date(df, DATE_COL))
+        return engine
+
+    def source_version(self) -> str:
+        """
+        Version of the source data: the store version, or the size and
+        modification time of the CSV
+        :return: version string
+        """
+        if self._version == "frame":
+            return "frame"
+        if self.store_dir:
+            return f"store-{store_version(self.store_dir)}"
+        stat = os.stat(self.path)
+        return f"csv-{stat.st_size}-{stat.st_mtime_ns}"
+
+    def data(self) -> dict:
+        """
+        Current dataset, reloaded when the source changed
+        :return: output of ``build_dataset``
+        """
+        version = self.source_version()
+        if self._data is not None and version == self._version:
+            return self._data
+        with self._lock:
+            if self._data is None or version != self._version:
+                if self.low_memory:
+                    self._data = build_row_dataset(self._row_store(version))
+                elif self.store_dir:
+                    self._data = self._load_store()
+                else:
+                    df, cube = load_frame(self.path)
+                    self._data = build_dataset(df, cube)
+                self._version = version
+                self.results.invalidate(keep_version=version)
+        return self._data
+
+    def _load_store(self) -> dict:
+        """
+        Dataset of the store; only the parts ingested since the loaded version are read
+        :return: output of ``build_dataset``, with the ``store_parts`` it was loaded from
+        """
+        manifest = read_manifest(self.store_dir)
+        seen = self._data.get("store_parts") if self._data is not None else None
+        if seen and manifest["parts"][:len(seen)] == seen:
+            added = manifest["parts"][len(seen):]
+            data = self._data
+            if added:
+                data = extend_dataset(data, read_parts(self.store_dir, added), read_cube(self.store_dir, manifest))
+        else:
+            df, cube = load_store(self.store_dir)
+            data = build_dataset(sort_by_date(df, DATE_COL), cube)
+        data["store_parts"] = list(manifest["parts"])
+        return data
+
+    def _row_store(self, version: str):
+        """Row store of a data version, written next to the data on first use"""
+        def build(folder):
+            chunks, schema = source_chunks(self.path, self.store_dir)
+            return build_row_store(folder, chunks, DATE_COL, DISEASES, CUBE_DIMS, schema=schema,
+                                   batch_bytes=self.ram_budget_mb * 1024 * 1024 // 64)
+        return cached_row_store(self._table_base("rows"), version, build)
+
+    @property
+    def version(self) -> str:
+        """
+        Version of the loaded dataset (loads it if needed)
+        """
+        self.data()
+        return self._version
+
+    def cached(self, name: str, compute, *args):
+        """
+        Result of a query, computed once per data version and arguments
+        :param name: query name
+        :param compute: function of ``*args`` computing the result
+        :param args: hashable query arguments
+        :return: read-only view of the shared result
+        """
+        self.data()
+        return self.results.get((self._version, name) + args, compute, *args)
+
+    def cache_info(self) -> dict:
+        """
+        Result cache counters
+        :return: dict with the data version, hits, misses, evictions, entries and bytes
+        """
+        return {"version": self.version, **self.results.stats()}
+
+    def _dates(self, start, end) -> tuple:
+        data = self.data()
+        start = pd.Timestamp(start) if start else data["start"]
+        end = pd.Timestamp(end) if end else data["end"]
+        # No dated record: the bounds stay NaT and the queries return empty results
+        return tuple(d if pd.isna(d) else d.normalize() for d in (start, end))
+
+    # Queries ----------------------------------------------------------------
+
+    def meta(self) -> dict:
+        """
+        Values accepted by the queries
+        :return: dict with countries, diseases, frequencies, alert methods and the date range
+        """
+        return self.cached("meta", self._meta)
+
+    def _meta(self) -> dict:
+        data = self.data()
+        start, end = self._dates(None, None)
+        return {
+            "version": self._version,
+            "rows": len(data["dates"]),
+            "countries": ["All"] + sorted(data["parts"]),
+            "diseases": data["diseases"],
+            "freqs": FREQS,
+            "methods": list(METHODS),
+            "start": None if pd.isna(start) else start.strftime("%Y-%m-%d"),
+            "end": None if pd.isna(end) else end.strftime("%Y-%m-%d"),
+        }
+
+    def filter(self, country: str = "All", start=None, end=None) -> pd.DataFrame:
+        """
+        Records of a country within a date range
+        :param country: country, or "All"
+        :param start: first date included (default: first record)
+        :param end: last date included (default: last record)
+        :return: read-only view (a slice for "All", the gathered rows otherwise);
+            in low-memory mode, the rows read from disk (prefer ``row_count`` and ``export``)
+        """
+        data = self.data()
+        start, end = self._dates(start, end)
+        if data["rows"] is not None:
+            return data["rows"].read_rows(self._positions(country, (start, end)))
+        return filter_sorted(data["frame"], DATE_COL, data["parts"], country, start, end)
+
+    def row_count(self, country: str = "All", start=None, end=None) -> int:
+        """
+        Number of records of a country within a date range, from the date index
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: number of records
+        """
+        data = self.data()
+        dates = self._dates(start, end)
+        if country == "All":
+            lo, hi = date_bounds(data["dates"], *dates)
+        elif country in data["parts"]:
+            lo, hi = date_bounds(data["parts"][country][1], *dates)
+        else:
+            return 0
+        return int(hi - lo)
+
+    def export(self, country: str = "All", start=None, end=None, fmt: str = "CSV (gzip)", where=None):
+        """
+        Records of a country within a date range, written to a temporary file (see src.export);
+        in low-memory mode they are streamed from disk in source order, one batch at a time
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :param fmt: key of ``src.export.EXPORT_FORMATS``
+        :param where: optional function slice -> boolean mask of the rows to keep
+        :return: the file, opened for reading at its start
+        """
+        data = self.data()
+        if data["rows"] is None:
+            return export_file(self.filter(country, start, end), fmt, where=where)
+        rows = data["rows"]
+        chunks = rows.iter_rows(self._positions(country, self._dates(start, end)))
+        if where is not None:
+            chunks = (chunk[where(chunk)] for chunk in chunks)
+        return export_chunks((chunk for chunk in chunks if len(chunk)), rows.empty(), fmt)
+
+    def timeseries(self, disease: str, freq: str = "Weekly", country: str = "All", start=None, end=None) -> pd.Series:
+        """
+        Cases per period, rolled up from the per-day totals
+        :param disease: disease column
+        :param freq: "Daily", "Weekly", "Monthly", "Quarterly" or "Yearly"
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        _check(freq, FREQS, "freq")
+        dates = self._dates(start, end)
+        return self.cached("timeseries", self._timeseries, disease, freq, country, dates)
+
+    def _timeseries(self, disease, freq, country, dates):
+        return self.series_prefix(disease, freq, country).series(*dates)
+
+    def series_prefix(self, disease: str, freq: str = "Weekly", country: str = "All") -> SeriesPrefix:
+        """
+        Prefix sums of a whole series, built once per data version: the
+        statistics of any date range are then read without a rescan
+        :param disease: disease column
+        :param freq: aggregation level
+        :param country: country, or "All"
+        :return: SeriesPrefix (shared, not to be modified)
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        _check(freq, FREQS, "freq")
+        return self.cached("prefix", self._series_prefix, disease, freq, country)
+
+    def _series_prefix(self, disease, freq, country):
+        daily = self.data()["daily"]
+        if country in daily.index.get_level_values(0):
+            daily = daily.xs(country, level=0)
+        else:
+            daily = daily.iloc[:0].droplevel(0)
+        return SeriesPrefix(daily[disease], freq)
+
+    def series_stats(self, disease: str, freq: str = "Weekly", country: str = "All", start=None, end=None) -> dict:
+        """
+        Descriptive statistics of the cases per period
+        :param disease: disease column
+        :param freq: aggregation level
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: dict with count, sum, mean, median, std, min and max
+        """
+        return self.series_prefix(disease, freq, country).stats(*self._dates(start, end))
+
+    def cumulative(self, disease: str, freq: str = "Weekly", country: str = "All", start=None, end=None) -> pd.Series:
+        """
+        Cumulative cases from the start of the date range
+        :param disease: disease column
+        :param freq: aggregation level
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        return self.series_prefix(disease, freq, country).cumulative(*self._dates(start, end))
+
+    def moving_average(self, disease: str, window: int = 7, freq: str = "Weekly", country: str = "All",
+                       start=None, end=None) -> pd.Series:
+        """
+        Mean cases over the last ``window`` periods (fewer at the start of the range)
+        :param disease: disease column
+        :param window: number of periods
+        :param freq: aggregation level
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        return self.series_prefix(disease, freq, country).moving_average(window, *self._dates(start, end))
+
+    def gender_counts(self, disease: str, country: str = "All", start=None, end=None) -> pd.Series:
+        """
+        Cases per gender, from the cube
+        :param disease: disease column
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by gender
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        return self.cached("gender", self._gender_counts, disease, country, self._dates(start, end))
+
+    def _gender_counts(self, disease, country, dates):
+        cells = select(self.data()["cube"], dates, country=country)
+        return cells.groupby("gender", observed=True)[disease].sum()
+
+    def kpis(self, disease: str, freq: str = "Weekly", country: str = "All", start=None, end=None) -> dict:
+        """
+        Headline figures of the dashboard
+        :param disease: disease column
+        :param freq: aggregation level of the peak period
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: dict with total, mean per period, peak period and the male / female shares (%)
+        """
+        grouped = self.timeseries(disease, freq, country, start, end)
+        by_gender = self.gender_counts(disease, country, start, end)
+        total = int(grouped.sum()) if not grouped.empty else 0
+        male = int(by_gender.get("Male", 0))
+        female = int(by_gender.get("Female", 0))
+        tot = male + female
+        return {
+            "total": total,
+            "mean": float(grouped.mean()) if not grouped.empty else 0.0,
+            "peak": str(grouped.idxmax()) if not grouped.empty else "N/A",
+            "male_pct": int(male / tot * 100) if tot else 0,
+            "female_pct": int(female / tot * 100) if tot else 0,
+        }
+
+    def alert_table(self) -> pd.DataFrame:
+        """
+        Alerts of every method x frequency x disease x country (see src.alerts)
+        :return: alert table, read from the store or computed once per version
+        """
+        data = self.data()
+        if data["alerts"] is None:
+            with self._lock:
+                if data["alerts"] is None:
+                    alerts = load_alerts(self.store_dir) if self.store_dir else None
+                    data["alerts"] = alerts if alerts is not None else compute_alerts(data["daily"], data["diseases"])
+        return data["alerts"]
+
+    def alerts(self, disease: str, freq: str = "Weekly", country: str = "All", method: str = "C2",
+               start=None, end=None) -> pd.DataFrame:
+        """
+        Cases, baseline, threshold and alert flag of one series
+        :param disease: disease column
+        :param freq: aggregation level
+        :param country: country, or "All"
+        :param method: detection method (see src.alerts.METHODS)
+        :param start: first date included
+        :param end: last date included
+        :return: dataframe indexed by period label
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        _check(freq, FREQS, "freq")
+        _check(method, METHODS, "method")
+        return self.cached("alerts", self._alerts, disease, freq, country, method, self._dates(start, end))
+
+    def _alerts(self, disease, freq, country, method, dates):
+        return alert_series(self.alert_table(), method, freq, disease, country, dates)
+
+    def signals(self, freq: str = "Weekly", method: str = "C2") -> pd.DataFrame:
+        """
+        Strata alerting in the latest period
+        :param freq: aggregation level
+        :param method: detection method
+        :return: one row per alerting (disease, country)
+        """
+        _check(freq, FREQS, "freq")
+        _check(method, METHODS, "method")
+        return self.cached("signals", self._signals, freq, method)
+
+    def _signals(self, freq, method):
+        return current_signals(self.alert_table(), method, freq)
+
+    def season_tables(self) -> dict:
+        """
+        Seasonal counts and profiles of every stratum (see src.seasonality)
+        :return: output of ``build_seasons``, computed once per version
+        """
+        data = self.data()
+        if data["seasons"] is None:
+            with self._lock:
+                if data["seasons"] is None:
+                    data["seasons"] = build_seasons(data["daily"], data["diseases"])
+        return data["seasons"]
+
+    def seasonal_profile(self, disease: str, country: str = "All", unit: str = "week") -> pd.DataFrame:
+        """
+        Cases of each year per period of the year, with the baseline of the previous years
+        :param disease: disease column
+        :param country: country, or "All"
+        :param unit: "week" (ISO) or "month"
+        :return: dataframe indexed by period: number of baseline ``years``, ``mean``,
+            ``median`` and percentile bands, then one column of cases per year
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        _check(unit, UNITS, "unit")
+        return self.cached("season_profile", self._seasonal_profile, disease, country, unit)
+
+    def _seasonal_profile(self, disease, country, unit):
+        tables = self.season_tables()[unit]
+        profile = tables["profile"]
+        if (disease, country) not in tables["counts"].columns:
+            return profile.iloc[:0].droplevel([0, 1])
+        by_year = tables["counts"][(disease, country)].unstack("year")
+        by_year.columns = by_year.columns.astype(str)
+        return profile.loc[(disease, country)].join(by_year)
+
+    def season_compare(self, disease: str, country: str = "All", unit: str = "week", date=None) -> dict:
+        """
+        Cases of the period of a date against the same period of the previous year and the baseline
+        :param disease: disease column
+        :param country: country, or "All"
+        :param unit: "week" (ISO) or "month"
+        :param date: date in the period (default: last record)
+        :return: dict with the ``year`` and ``period``, its ``cases`` and whether it is ``complete``,
+            the ``last_year`` cases, and the baseline ``median`` and band (``low``, ``high``)
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        _check(unit, UNITS, "unit")
+        date = self._dates(None, date)[1]
+        if pd.isna(date):
+            nan = float("nan")
+            return {"year": None, "period": None, "cases": 0, "complete": False, "last_year": None,
+                    "median": nan, "low": nan, "high": nan}
+        year, period = period_of(date, unit)
+        return self.cached("season_compare", self._season_compare, disease, country, unit, year, period)
+
+    def _season_compare(self, disease, country, unit, year, period):
+        tables = self.season_tables()[unit]
+        counts = tables["counts"].get((disease, country), pd.Series(dtype="int64"))
+        complete = tables["complete"].get((disease, country), pd.Series(dtype=bool))
+        profile = self.seasonal_profile(disease, country, unit)
+        baseline = profile.loc[period] if period in profile.index else None
+        return {
+            "year": year,
+            "period": period,
+            "cases": int(counts.get((year, period), 0)),
+            "complete": bool(complete.get((year, period), False)),
+            "last_year": int(counts[(year - 1, period)]) if (year - 1, period) in counts.index else None,
+            "median": float(baseline["median"]) if baseline is not None else float("nan"),
+            "low": float(baseline[f"p{BANDS[0]}"]) if baseline is not None else float("nan"),
+            "high": float(baseline[f"p{BANDS[1]}"]) if baseline is not None else float("nan"),
+        }
+
+    # Dashboard tab payloads -------------------------------------------------
+
+    def comparison(self, country: str = "All", start=None, end=None) -> pd.DataFrame:
+        """
+        Monthly cases of every disease
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: dataframe indexed by month, one column per disease
+        """
+        return self.cached("comparison", self._comparison, country, self._dates(start, end))
+
+    def _comparison(self, country, dates):
+        data = self.data()
+        return rollup(data["daily"], data["diseases"], "Monthly", dates, key=country)
+
+    def age_counts(self, disease: str, country: str = "All", start=None, end=None) -> pd.Series:
+        """
+        Cases per age group, from the cube
+        :param disease: disease column
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by age group, largest first (empty without ages)
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        return self.cached("age", self._age_counts, disease, country, self._dates(start, end))
+
+    def _age_counts(self, disease, country, dates):
+        cells = select(self.data()["cube"], dates, country=country)
+        if "age_group" not in cells.columns:
+            return pd.Series(dtype="int64")
+        return cells.groupby("age_group", observed=False)[disease].sum().sort_values(ascending=False)
+
+    def symptom_flags(self) -> dict:
+        """
+        Symptom (``sym_*``) and disease flags of every record, packed into one code
+        per record in the order of the frame (see src.symptoms)
+        :return: dict with the ``codes``, the ``symptoms`` (first bits) and the ``diseases``
+        """
+        data = self.data()
+        if data["symptoms"] is None:
+            with self._lock:
+                if data["symptoms"] is None:
+                    rows = data["rows"]
+                    if rows is not None:
+                        # Packed while the row store was written
+                        data["symptoms"] = {"codes": rows.flags, "symptoms": rows.meta["symptoms"],
+                                            "diseases": rows.meta["measures"]}
+                    else:
+                        df = data["frame"]
+                        symptoms = [c for c in df.columns if c.startswith("sym_")]
+                        diseases = [d for d in DISEASES if d in df.columns]
+                        data["symptoms"] = {"codes": pack_flags(df, symptoms + diseases),
+                                            "symptoms": symptoms, "diseases": diseases}
+        return data["symptoms"]
+
+    def _positions(self, country, dates) -> np.ndarray:
+        """Positions of the records of a country within a date range, in the date-sorted records"""
+        data = self.data()
+        if country == "All":
+            return np.arange(*date_bounds(data["dates"], *dates))
+        if country not in data["parts"]:
+            return np.arange(0)
+        rows, row_dates = data["parts"][country]
+        lo, hi = date_bounds(row_dates, *dates)
+        return rows[lo:hi]
+
+    def _selection(self, values, country, dates):
+        """Values aligned with the date-sorted records, for the records of a country within a date range"""
+        data = self.data()
+        if country == "All":
+            lo, hi = date_bounds(data["dates"], *dates)
+            return values[lo:hi]
+        if country not in data["parts"]:
+            return values[:0]
+        rows, row_dates = data["parts"][country]
+        lo, hi = date_bounds(row_dates, *dates)
+        return values[rows[lo:hi]]
+
+    def symptom_analysis(self, disease: str, country: str = "All", start=None, end=None, top: int = 10) -> dict:
+        """
+        Symptom counts, conditional frequencies, co-occurrence and top combinations of a disease
+        :param disease: disease column
+        :param country: country, or "All"
+        :param start: first date included
+        :param end: last date included
+        :param top: number of symptom combinations
+        :return: output of ``src.symptoms.symptom_report``
+        """
+        _check(disease, self.data()["diseases"], "disease")
+        return self.cached("symptom_analysis", self._symptom_analysis, disease, country, self._dates(start, end), top)
+
+    def _symptom_analysis(self, disease, country, dates, top):
+        flags = self.symptom_flags()
+        if disease not in flags["diseases"]:
+            raise ValueError(f"no {disease!r} column in the data")
+        combinations = count_combinations(self._selection(flags["codes"], country, dates))
+        return symptom_report(combinations, flags["symptoms"], flags["diseases"], disease, top)
+
+    def quality_profile(self) -> pd.DataFrame:
+        """
+        Data-quality profile per country, month and column (see src.quality),
+        read from the file of the current version or built once and written there
+        :return: output of ``QualityProfiler.profile``
+        """
+        data = self.data()
+        if data["quality"] is None:
+            with self._lock:
+                if data["quality"] is None:
+                    def build():
+                        if data["rows"] is not None:
+                            return profile_chunks(data["rows"].iter_chunks(), DATE_COL)
+                        return profile_frame(data["frame"], DATE_COL)
+                    base = self._table_base("quality")
+                    data["quality"] = cached_table(base, self._version, build) if base else build()
+        return data["quality"]
+
+    def _table_base(self, name: str):
+        """Path prefix of the per-version tables derived from the data, None for an in-memory frame"""
+        if self._version == "frame":
+            return None
+        if self.store_dir:
+            return os.path.join(self.store_dir, name)
+        return f"{cache_path(self.path)}.{name}"
+
+    def quality_summary(self, country: str = "All", start=None, end=None) -> pd.DataFrame:
+        """
+        Quality of each column over the months of a date range, from the profile
+        :param country: country, or "All"
+        :param start: first date included (its whole month is counted)
+        :param end: last date included (its whole month is counted)
+        :return: dataframe indexed by column (see ``src.quality.summarise``)
+        """
+        return self.cached("quality", self._quality_summary, country, self._dates(start, end))
+
+    def _quality_summary(self, country, dates):
+        if pd.isna(dates[0]) or pd.isna(dates[1]):
+            return summarise(self.quality_profile(), country, [])
+        months = pd.period_range(dates[0], dates[1], freq="M").strftime("%Y-%m")
+        return summarise(self.quality_profile(), country, months)
+
+    def breakdown_table(self) -> pd.DataFrame:
+        """
+        Records and cases of every disease per country x age group x gender cell (see
+        src.breakdowns), read from the file of the current version or built once and written there
+        :return: output of ``breakdown_cells``
+        """
+        data = self.data()
+        if data["breakdowns"] is None:
+            with self._lock:
+                if data["breakdowns"] is None:
+                    def build():
+                        dims = [d for d in DIMS if d in data["columns"]]
+                        measures = [d for d in DISEASES if d in data["columns"]]
+                        if data["rows"] is not None:
+                            return breakdown_chunks(data["rows"].iter_chunks(), measures, dims)
+                        return breakdown_cells(data["frame"], measures, dims)
+                    base = self._table_base("breakdowns")
+                    data["breakdowns"] = cached_table(base, self._version, build) if base else build()
+        return data["breakdowns"]
+
+    def breakdown(self, dim: str, country: str = "All") -> pd.DataFrame:
+        """
+        Records and cases of every disease per value of a dimension, over all dates
+        :param dim: "country", "age_group" or "gender"
+        :param country: country, or "All"
+        :return: dataframe indexed by the values of ``dim``, with ``n`` and one column per disease
+        """
+        _check(dim, DIMS, "dimension")
+        return self.cached("breakdown", self._breakdown, dim, country)
+
+    def _breakdown(self, dim, country):
+        cells = self.breakdown_table()
+        if dim not in cells.columns:
+            return pd.DataFrame(columns=cells.columns[cells.columns.get_loc(COUNT_COL):], dtype="int64")
+        return breakdown(cells, dim, country=country)
+
+    def breakdown_crosstab(self, index: str = "age_group", columns: str = "gender", value: str = COUNT_COL,
+                           country: str = "All") -> pd.DataFrame:
+        """
+        Two-way table of records (``n``) or cases of a disease, over all dates
+        :param index: dimension of the rows
+        :param columns: dimension of the columns
+        :param value: "n" or a disease column
+        :param country: country, or "All"
+        :return: dataframe of counts
+        """
+        _check(index, DIMS, "dimension")
+        _check(columns, DIMS, "dimension")
+        _check(value, [COUNT_COL] + self.data()["diseases"], "value")
+        return self.cached("crosstab", self._breakdown_crosstab, index, columns, value, country)
+
+    def _breakdown_crosstab(self, index, columns, value, country):
+        return crosstab(self.breakdown_table(), index, columns, value, country=country)
+
+
+def _check(value, allowed, name: str) -> None:
+    if value not in allowed:
+        raise ValueError(f"unknown {name} {value!r}, expected one of {list(allowed)}")
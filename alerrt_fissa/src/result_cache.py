@@ -0,0 +1,133 @@
+"""
+Process-wide cache of query results with a memory cap.
+
+Results are kept in least-recently-used order and evicted once their total
+size exceeds the cap. Callers get zero-copy read-only views of the cached
+objects. A dataframe or series is handed out as a shallow copy, and
+copy-on-write (always on from pandas 3, see requirements.txt) makes any
+modification copy the data first instead of changing the cached values.
+Arrays are handed out as non-writeable views. Entries are keyed on the data
+version; when the data changes, ``invalidate`` drops the entries of the older
+versions.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def nbytes(obj) -> int:
+    """
+    Approximate memory held by a result
+    :param obj: dataframe, series, array, container, object with an ``nbytes`` attribute or scalar
+    :return: number of bytes
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        size = obj.memory_usage(deep=True)
+        return int(size.sum() if isinstance(size, pd.Series) else size)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(nbytes(k) + nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(nbytes(v) for v in obj)
+    # Objects reporting their own size (src.series_stats.SeriesPrefix)
+    if isinstance(getattr(obj, "nbytes", None), int):
+        return obj.nbytes
+    return sys.getsizeof(obj)
+
+
+def read_only(obj):
+    """
+    Zero-copy view of a cached result that cannot modify it
+    :param obj: cached object
+    :return: shallow copy (pandas), non-writeable view (numpy), or the object itself
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj.copy(deep=False)
+    if isinstance(obj, np.ndarray):
+        view = obj.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(obj, dict):
+        return {k: read_only(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return tuple(read_only(v) for v in obj)
+    return obj
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by the memory of its entries
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: memory cap; an entry larger than the cap is not kept
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute, *args):
+        """
+        Cached result of ``compute(*args)``
+        :param key: hashable key; its first element is the data version
+        :param compute: function computing the result on a miss
+        :param args: arguments of ``compute``
+        :return: read-only view of the result
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return read_only(entry[0])
+            self.misses += 1
+        # Computed outside the lock; concurrent misses on one key may both compute it
+        result = compute(*args)
+        self.put(key, result)
+        return read_only(result)
+
+    def put(self, key, value) -> None:
+        """
+        Store a result, evicting the least recently used entries above the cap
+        :param key: hashable key
+        :param value: result
+        """
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def invalidate(self, keep_version=None) -> None:
+        """
+        Drop the entries of other data versions
+        :param keep_version: version whose entries are kept, None to drop everything
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != keep_version]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        """
+        Counters of the cache
+        :return: dict with hits, misses, evictions, entries and bytes
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,280 @@
+"""
+On-disk row store of the low-memory mode.
+
+In low-memory mode the query engine does not hold the records: they are read
+once, in chunks, into one folder per data version::
+
+    rows.arrow       records in source order, Arrow IPC file of small record batches
+    dates.npy        inclusion dates in date order (NaT last)
+    order.npy        source row of each date-order position
+    part_rows.npy    date-order positions grouped by country (as src.date_index partitions)
+    part_dates.npy   their dates
+    flags.npy        packed symptom and disease flags (src.symptoms), in date order
+    cube.parquet     daily count cube (src.cube)
+    meta.json        columns, countries, partition edges, batch lengths and date range
+
+The same pass builds the cube, so the records are never all in memory. The
+arrays are memory-mapped: the views are answered from the cube and from them,
+and a date range only reads the pages it covers. Records are read back only for
+exports and ``filter``: the record batches holding the selected rows are read
+one at a time from the file (not mapped), so the memory held is one batch
+whatever the size of the selection. Rows come back in source order.
+"""
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.cube import build_cube  # type: ignore
+from src.store import merge_cubes  # type: ignore
+from src.symptoms import pack_flags  # type: ignore
+
+ROWS = "rows.arrow"
+META = "meta.json"
+
+# Integer columns are read back as nullable integers, whether or not a batch has missing values
+INTEGER_TYPES = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(),
+                 pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}
+
+
+def store_schema(schema: pa.Schema) -> pa.Schema:
+    """
+    Types of the row store: categoricals as plain strings (their categories differ
+    from chunk to chunk), all-missing columns as strings
+    :param schema: Arrow schema of a chunk or of a Parquet part
+    :return: schema without dictionary, null or large string fields
+    """
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(field.type.value_type)
+        if pa.types.is_null(field.type) or pa.types.is_large_string(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Columns of a chunk cast to the store schema; columns it lacks are missing"""
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(len(table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def build_row_store(folder: str, chunks, date_col: str, measures, dims, by: str = "country",
+                    schema: pa.Schema = None, batch_bytes: int = 16 << 20) -> "RowStore":
+    """
+    Write the records of a stream of chunks, their indexes and their cube
+    :param folder: row store folder (written to ``<folder>.tmp`` first)
+    :param chunks: iterable of typed dataframes
+    :param date_col: inclusion date column
+    :param measures: disease columns counted in the cube and packed with the symptoms
+    :param dims: cube dimensions
+    :param by: partitioning column
+    :param schema: Arrow schema of the store, that of the first chunk by default
+    :param batch_bytes: approximate size of a record batch (the unit of the reads)
+    :return: the opened store
+    """
+    tmp = f"{folder}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    writer, cube, batch_rows = None, None, None
+    batches, countries, categories = [], {}, {}
+    # Per-record dates, country codes and flags are appended to raw files, not kept in lists
+    raw = {name: open(os.path.join(tmp, f"{name}.raw"), "wb") for name in ("dates", "keys", "flags")}
+    for chunk in chunks:
+        if writer is None:
+            schema = store_schema(schema or pa.Schema.from_pandas(chunk, preserve_index=False))
+            writer = pa.ipc.new_file(os.path.join(tmp, ROWS), schema)
+            measures = [m for m in measures if m in chunk.columns]
+            dims = [d for d in dims if d in chunk.columns]
+            symptoms = [c for c in chunk.columns if c.startswith("sym_")]
+        table = _conform(pa.Table.from_pandas(chunk, preserve_index=False), schema)
+        if batch_rows is None:
+            batch_rows = max(1, int(batch_bytes * len(table) / max(table.nbytes, 1)))
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            batches.append(batch.num_rows)
+        del table
+
+        raw["dates"].write(chunk[date_col].to_numpy("datetime64[ns]").tobytes())
+        local, uniques = pd.factorize(chunk[by])
+        codes = [countries.setdefault(key, len(countries)) for key in uniques]
+        raw["keys"].write(np.array(codes + [-1], dtype=np.int32)[local].tobytes())
+        flags = pack_flags(chunk, symptoms + measures)
+        raw["flags"].write(flags.tobytes())
+        for dim in dims:
+            if isinstance(chunk[dim].dtype, pd.CategoricalDtype):
+                spec = categories.setdefault(dim, {"ordered": bool(chunk[dim].cat.ordered), "values": []})
+                spec["values"] += [v for v in chunk[dim].cat.categories if v not in spec["values"]]
+        cube = merge_cubes(cube, build_cube(chunk, date_col, measures, dims), ["date"] + dims)
+    for f in raw.values():
+        f.close()
+    if writer is None:
+        shutil.rmtree(tmp)
+        raise ValueError("no records to store")
+    writer.close()
+
+    # Date order, and the positions of each country within it; the raw files are
+    # mapped and each array is written as soon as it is computed
+    def read_raw(name, dtype):
+        return np.memmap(os.path.join(tmp, f"{name}.raw"), dtype=dtype, mode="r")
+
+    def save(name, values):
+        np.save(os.path.join(tmp, f"{name}.npy"), values)
+
+    rows = sum(batches)
+    index = np.int32 if rows < 2 ** 31 else np.int64
+    order = np.argsort(read_raw("dates", "datetime64[ns]"), kind="stable").astype(index)
+    save("order", order)
+    dates = read_raw("dates", "datetime64[ns]")[order]
+    save("dates", dates)
+    save("flags", read_raw("flags", flags.dtype)[order])
+    keys = read_raw("keys", np.int32)[order]
+    by_key = np.argsort(keys, kind="stable").astype(index)
+    # Records without a country (code -1) sort first
+    counts = np.bincount(keys + 1, minlength=len(countries) + 1)
+    edges = counts[0] + np.concatenate([[0], np.cumsum(counts[1:])])
+    del keys, order
+    save("part_rows", by_key)
+    save("part_dates", dates[by_key])
+    del by_key
+    for name in raw:
+        os.remove(os.path.join(tmp, f"{name}.raw"))
+    cube.to_parquet(os.path.join(tmp, "cube.parquet"), index=False)
+    dated = rows - int(np.isnat(dates).sum())  # undated records sort last
+    meta = {
+        "rows": rows,
+        "columns": schema.names,
+        "date_col": date_col,
+        "keys": list(countries),
+        "edges": edges.tolist(),
+        "batches": batches,
+        "symptoms": symptoms,
+        "measures": measures,
+        "dims": dims,
+        "categories": categories,
+        "start": str(pd.Timestamp(dates[0])) if dated else None,
+        "end": str(pd.Timestamp(dates[dated - 1])) if dated else None,
+    }
+    with open(os.path.join(tmp, META), "w") as f:
+        json.dump(meta, f, indent=1, default=str)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+    return RowStore(folder)
+
+
+def cached_row_store(base: str, version: str, build) -> "RowStore":
+    """
+    Row store of a data version, in ``<base>-<version>``, built on first use
+    The stores of the other versions are removed when a new one is written.
+    :param base: path prefix of the store folders
+    :param version: data version
+    :param build: function folder -> RowStore (e.g. calling ``build_row_store``)
+    :return: RowStore
+    """
+    folder = f"{base}-{version}"
+    if os.path.exists(os.path.join(folder, META)):
+        return RowStore(folder)
+    store = build(folder)
+    for old in glob.glob(f"{glob.escape(base)}-*"):
+        if old != folder and os.path.isdir(old):
+            shutil.rmtree(old, ignore_errors=True)
+    return store
+
+
+class RowStore:
+    """
+    Read access to a row store folder
+    """
+
+    def __init__(self, folder: str):
+        """
+        :param folder: folder written by ``build_row_store``
+        """
+        self.folder = folder
+        with open(os.path.join(folder, META)) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta["columns"]
+        self.dates = self._array("dates")
+        self.order = self._array("order")
+        self.flags = self._array("flags")
+        rows, dates, edges = self._array("part_rows"), self._array("part_dates"), self.meta["edges"]
+        self.parts = {key: (rows[edges[i]:edges[i + 1]], dates[edges[i]:edges[i + 1]])
+                      for i, key in enumerate(self.meta["keys"])}
+        self.offsets = np.concatenate([[0], np.cumsum(self.meta["batches"], dtype=np.int64)])
+
+    def _array(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.folder, f"{name}.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def _categorical(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Restore the categoricals of the dimensions, with the same categories in every chunk"""
+        for col, spec in self.meta["categories"].items():
+            values = spec["values"] if spec["ordered"] else sorted(spec["values"])
+            df[col] = pd.Categorical(df[col], categories=values, ordered=spec["ordered"])
+        return df
+
+    def _frame(self, batch) -> pd.DataFrame:
+        """Dataframe of a record batch or table, with the dtypes of every chunk"""
+        return self._categorical(batch.to_pandas(types_mapper=INTEGER_TYPES.get))
+
+    def cube(self) -> pd.DataFrame:
+        """Daily count cube of the records"""
+        return self._categorical(pd.read_parquet(os.path.join(self.folder, "cube.parquet")))
+
+    def empty(self) -> pd.DataFrame:
+        """Zero-row frame with the columns and types of the records"""
+        with pa.OSFile(os.path.join(self.folder, ROWS)) as f:
+            return self._frame(pa.ipc.open_file(f).schema.empty_table())
+
+    def iter_chunks(self):
+        """
+        All records, one record batch at a time
+        :return: generator of dataframes, in source order
+        """
+        with pa.OSFile(os.path.join(self.folder, ROWS)) as f:
+            reader = pa.ipc.open_file(f)
+            for i in range(reader.num_record_batches):
+                yield self._frame(reader.get_batch(i))
+
+    def iter_rows(self, positions):
+        """
+        Records at date-order positions, reading only the record batches holding some
+        :param positions: date-order positions (e.g. a partition slice)
+        :return: generator of dataframes, in source order
+        """
+        rows = np.sort(self.order[np.asarray(positions)])
+        bounds = np.searchsorted(rows, self.offsets)
+        with pa.OSFile(os.path.join(self.folder, ROWS)) as f:
+            reader = pa.ipc.open_file(f)
+            for i in range(reader.num_record_batches):
+                lo, hi = bounds[i], bounds[i + 1]
+                if lo < hi:
+                    batch = reader.get_batch(i).take(pa.array(rows[lo:hi] - self.offsets[i]))
+                    yield self._frame(batch)
+
+    def read_rows(self, positions) -> pd.DataFrame:
+        """
+        Records at date-order positions, in memory
+        :param positions: date-order positions
+        :return: dataframe in date order, with a fresh RangeIndex
+        """
+        positions = np.asarray(positions)
+        chunks = list(self.iter_rows(positions))
+        if not chunks:
+            return self.empty()
+        df = pd.concat(chunks, ignore_index=True)
+        # Rows were read in source order: put them back in date order
+        rank = np.empty(len(positions), dtype=np.int64)
+        rank[np.argsort(self.order[positions], kind="stable")] = np.arange(len(positions))
+        return df.take(rank).reset_index(drop=True)
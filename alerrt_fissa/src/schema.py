@@ -0,0 +1,185 @@
+"""
+Column schema of the FISSA datasets, built from the data dictionary.
+
+Each variable gets a storage kind and each kind a compact dtype:
+
+- ``flag``: yes/no and 0/1 variables -> ``int8`` (nullable ``Int8`` if incomplete)
+- ``coded``: categorical answers (radio, dropdown, ...) -> ``category``
+- ``integer``: counts -> nullable ``Int32``
+- ``numeric``: measurements -> ``float32``
+- ``date``: dates -> ``datetime64[ns]``
+- ``text``: free text -> Arrow-backed ``string``
+
+Variables missing from the dictionary fall back to name patterns, so the
+symptom flags and disease columns of the cleaned extracts are typed as well.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.config import DICT_VARIABLE_COL, DICT_TYPE_COL  # type: ignore
+
+KIND_DTYPES = {
+    "flag": "Int8",
+    "coded": "category",
+    "integer": "Int32",
+    "numeric": "float32",
+    "date": "datetime64[ns]",
+    "text": "string[pyarrow]",
+}
+
+# Dictionary type labels -> kind, tested in order on the lower-cased label
+TYPE_PATTERNS = [
+    ("date", r"date|time"),
+    ("flag", r"yes|bool|check|binary|flag"),
+    ("coded", r"radio|dropdown|select|categor|choice|coded|list"),
+    ("integer", r"int"),
+    ("numeric", r"num|float|decimal|calc|real|double"),
+]
+
+# 0/1 variables recognised by name when they are not in the dictionary
+FLAG_PATTERN = re.compile(
+    r"^(thorax|orl|muscl|peau|sym|syst_nev|eti|dic_etiol)_\w+$"
+    r"|^(arbovirus|influ_like_ill|ili|sari|diarrhoea|malaria_case)$",
+    re.IGNORECASE,
+)
+
+# Text answers accepted for flags
+FLAG_TOKENS = {"yes": 1, "no": 0, "oui": 1, "non": 0, "true": 1, "false": 0, "y": 1, "n": 0}
+
+
+def dictionary_kinds(dictionary: pd.DataFrame) -> dict:
+    """
+    Storage kind of each variable of the data dictionary
+    :param dictionary: data dictionary (one row per variable)
+    :return: dict variable -> kind
+    """
+    names = dictionary[DICT_VARIABLE_COL].astype(str).str.strip()
+    labels = dictionary[DICT_TYPE_COL].astype(str).str.lower()
+    kinds = np.select(
+        [labels.str.contains(pattern) for _, pattern in TYPE_PATTERNS],
+        [kind for kind, _ in TYPE_PATTERNS],
+        default="text",
+    )
+    return dict(zip(names, kinds))
+
+
+def build_schema(columns, dictionary: pd.DataFrame = None, **overrides) -> dict:
+    """
+    Kind of each column, from the dictionary first and from name patterns otherwise
+    :param columns: column names of the dataset
+    :param dictionary: optional data dictionary
+    :param overrides: explicit kinds, e.g. ``country="coded"``
+    :return: dict column -> kind (columns with no known kind are left out)
+    """
+    known = dictionary_kinds(dictionary) if dictionary is not None else {}
+    schema = {}
+    for col in columns:
+        if col in overrides:
+            schema[col] = overrides[col]
+        elif col in known:
+            schema[col] = known[col]
+        elif FLAG_PATTERN.match(col):
+            schema[col] = "flag"
+    return schema
+
+
+def to_flag(series: pd.Series) -> pd.Series:
+    """
+    Cast a 0/1 or yes/no column to int8; other values become missing
+    :param series: column to cast
+    :return: int8 column, or nullable Int8 if some values are missing
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        text = series.astype("string").str.strip().str.lower()
+        series = text.map(FLAG_TOKENS).fillna(pd.to_numeric(text, errors="coerce"))
+    values = pd.to_numeric(series, errors="coerce")
+    values = values.where((values % 1 == 0) & values.between(-128, 127))
+    # Complete flags fit in plain int8 (1 byte); the nullable type adds a mask byte
+    return values.astype("int8" if values.notna().all() else "Int8")
+
+
+def to_date(series: pd.Series) -> pd.Series:
+    """
+    Parse dates: ISO 8601 first, then day-first for the values that are not ISO
+    :param series: column to parse
+    :return: datetime64[ns] column, NaT where the value is not a date
+    """
+    dates = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    retry = dates.isna() & series.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(series[retry], errors="coerce", dayfirst=True, format="mixed")
+    return dates.astype(KIND_DTYPES["date"])
+
+
+def cast_column(series: pd.Series, kind: str) -> pd.Series:
+    """
+    Cast a column to the dtype of its kind
+    :param series: column to cast
+    :param kind: one of ``KIND_DTYPES``
+    :return: cast column
+    """
+    if kind == "flag":
+        return to_flag(series)
+    if kind in ("integer", "numeric"):
+        values = pd.to_numeric(series, errors="coerce")
+        if kind == "integer":
+            values = values.where(values % 1 == 0)
+        return values.astype(KIND_DTYPES[kind])
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.astype(KIND_DTYPES[kind])
+        return to_date(series)
+    return series.astype(KIND_DTYPES[kind])
+
+
+def read_dtypes(schema: dict) -> dict:
+    """
+    ``dtype`` argument for ``pd.read_csv``: the kinds the parser can produce directly
+    :param schema: dict column -> kind
+    :return: dict column -> dtype for the coded and text columns
+    """
+    return {col: KIND_DTYPES[kind] for col, kind in schema.items() if kind in ("coded", "text")}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Cast the columns of a dataframe in place
+    :param df: dataframe
+    :param schema: dict column -> kind; columns absent from ``df`` are ignored
+    :return: the same dataframe
+    """
+    for col, kind in schema.items():
+        if col in df.columns:
+            df[col] = cast_column(df[col], kind)
+    return df
+
+
+def arrow_schema(df: pd.DataFrame) -> pa.Schema:
+    """
+    Arrow schema of a typed frame, with all-missing text columns kept as strings
+    :param df: dataframe typed with ``apply_schema``
+    :return: Arrow schema usable for every chunk of the same stream
+    """
+    base = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in base:
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string(), field.type.ordered))
+        elif pa.types.is_large_string(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=base.metadata)
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Deep memory footprint of a dataframe in bytes
+    :param df: dataframe
+    :return: number of bytes
+    """
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,142 @@
+"""
+Seasonal profiles of every disease x country series, built once per data version.
+
+The per-day totals (src.cube) are counted per year and calendar unit:
+
+- ``week``: ISO 8601 weeks (Monday to Sunday, week 1 holding the first
+  Thursday), the epidemiological weeks of the WHO; some years have 53
+- ``month``: calendar months
+
+for all strata at once (one grouped pass over the days). A period is
+*complete* for a country when the data covers all of its days, from the
+country's first record to the last record of the data; the first and last
+periods usually are not, nor the periods before a site started reporting. The profile of a unit is then, per period of
+the year, the mean, median and percentile bands of the complete periods of
+the baseline years (the years before the latest one). Seasonal curves and
+same-period-last-year comparisons are lookups in these tables.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+UNITS = ["week", "month"]
+
+# Percentiles of the band around the median
+BANDS = (10, 90)
+
+
+def _calendar(days: pd.DatetimeIndex, unit: str) -> tuple:
+    """Year and period of year of each day, and the number of days in its period"""
+    if unit == "week":
+        iso = days.isocalendar()
+        return iso["year"].to_numpy("int64"), iso["week"].to_numpy("int64"), np.full(len(days), 7)
+    return days.year.to_numpy("int64"), days.month.to_numpy("int64"), days.days_in_month.to_numpy("int64")
+
+
+def season_counts(daily: pd.DataFrame, measures, unit: str = "week") -> tuple:
+    """
+    Cases per year and period of year, for every stratum
+    :param daily: output of ``daily_totals(cube, measures, by="country")``
+    :param measures: disease columns
+    :param unit: "week" (ISO) or "month"
+    :return: (counts, complete): counts is an int64 dataframe indexed by (year, ``unit``)
+        with (disease, country) columns; complete a boolean dataframe of the same shape
+    """
+    wide = daily[list(measures)].unstack(0, fill_value=0)
+    if wide.empty:
+        index = pd.MultiIndex.from_arrays([[], []], names=["year", unit])
+        return (pd.DataFrame(index=index, columns=wide.columns, dtype="int64"),
+                pd.DataFrame(index=index, columns=wide.columns, dtype=bool))
+    # Days without records are days with 0 cases
+    days = pd.date_range(wide.index.min(), wide.index.max(), freq="D")
+    wide = wide.reindex(days, fill_value=0)
+    year, period, length = _calendar(days, unit)
+    keys = [pd.Index(year, name="year"), pd.Index(period, name=unit)]
+    counts = wide.groupby(keys).sum().astype("int64")
+    # Each country is covered from its first record on; earlier days are not zero counts
+    dates = daily.index.get_level_values(1)
+    first = pd.Series(dates).groupby(daily.index.get_level_values(0).to_numpy()).min()
+    covered = pd.DataFrame(days.to_numpy()[:, None] >= first.to_numpy()[None, :], index=days, columns=first.index)
+    coverage = covered.groupby(keys).sum()
+    complete = coverage.eq(pd.Series(length, index=days).groupby(keys).first(), axis=0)
+    complete = complete[wide.columns.get_level_values(1)]
+    complete.columns = wide.columns
+    return counts, complete
+
+
+def season_profile(counts: pd.DataFrame, complete: pd.Series, years: int = None, bands=BANDS) -> pd.DataFrame:
+    """
+    Baseline of each period of the year, over the complete periods of the
+    years before the latest one
+    :param counts: first output of ``season_counts``
+    :param complete: second output of ``season_counts``
+    :param years: number of baseline years (default: all)
+    :param bands: lower and upper percentiles
+    :return: dataframe indexed by (disease, country, period) with the number of
+        baseline ``years`` and the ``mean``, ``median``, ``p<low>`` and ``p<high>`` cases
+    """
+    unit = counts.index.names[1]
+    low, high = f"p{bands[0]}", f"p{bands[1]}"
+    if counts.empty:
+        index = pd.MultiIndex.from_arrays([[], [], []], names=["disease", "country", unit])
+        return pd.DataFrame({"years": pd.Series(index=index, dtype="int64"),
+                             **{name: pd.Series(index=index, dtype="float64") for name in ("mean", "median", low, high)}})
+    year = counts.index.get_level_values("year")
+    last = year.max() if len(year) else 0
+    first = last - years if years else -np.inf
+    history = counts.astype("float64").where(complete, np.nan)[(year < last) & (year >= first)]
+    periods = pd.Index(sorted(counts.index.get_level_values(unit).unique()), name=unit)
+    baseline_years = sorted(history.index.get_level_values("year").unique())
+    strata = counts.columns
+    # periods x strata x years, NaN for incomplete or missing periods (week 53)
+    values = np.full((len(periods), len(strata), len(baseline_years)), np.nan)
+    for k, y in enumerate(baseline_years):
+        values[:, :, k] = history.xs(y, level="year").reindex(periods).to_numpy()
+    with warnings.catch_warnings():
+        # Periods without any baseline year give NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = {
+            "years": (~np.isnan(values)).sum(axis=2),
+            "mean": np.nanmean(values, axis=2),
+            "median": np.nanmedian(values, axis=2),
+            low: np.nanpercentile(values, bands[0], axis=2),
+            high: np.nanpercentile(values, bands[1], axis=2),
+        }
+    index = pd.MultiIndex.from_arrays([
+        np.repeat(strata.get_level_values(0), len(periods)),
+        np.repeat(strata.get_level_values(1), len(periods)),
+        np.tile(periods, len(strata)),
+    ], names=["disease", "country", unit])
+    # strata-major order: one contiguous block of periods per stratum
+    return pd.DataFrame({name: stat.T.ravel() for name, stat in stats.items()}, index=index).sort_index()
+
+
+def build_seasons(daily: pd.DataFrame, measures, years: int = None) -> dict:
+    """
+    Counts and profiles of every unit
+    :param daily: output of ``daily_totals(cube, measures, by="country")``
+    :param measures: disease columns
+    :param years: number of baseline years (default: all)
+    :return: dict unit -> dict with ``counts``, ``complete`` and ``profile``
+    """
+    seasons = {}
+    for unit in UNITS:
+        counts, complete = season_counts(daily, measures, unit)
+        seasons[unit] = {"counts": counts, "complete": complete,
+                         "profile": season_profile(counts, complete, years)}
+    return seasons
+
+
+def period_of(date, unit: str) -> tuple:
+    """
+    Year and period of year of a date
+    :param date: date
+    :param unit: "week" (ISO) or "month"
+    :return: (year, period)
+    """
+    date = pd.Timestamp(date)
+    if unit == "week":
+        iso = date.isocalendar()
+        return iso[0], iso[1]
+    return date.year, date.month
@@ -0,0 +1,226 @@
+"""
+Prefix sums over the aggregated time series, for date-range statistics
+without rescanning the series.
+
+A ``SeriesPrefix`` is built once per stratum, measure and frequency from the
+per-day totals (src.cube.daily_totals). It keeps:
+
+- the cumulative totals and the number of days with records, per calendar day
+- the periods having records, their totals, and the prefix sums of the
+  totals and of their squares
+- sparse tables of the period totals, for range minimum / maximum
+
+A date range then maps to a run of whole periods plus at most two partial
+periods at its ends, whose totals come from the daily prefix sums. Range
+sums, means, variances, minima and maxima are O(1). The series of a range,
+its cumulative totals and its moving averages cost O(1) per period returned.
+The median is the only statistic that reads the range values (O(periods)).
+
+The periods are the ones ``rollup`` returns: only periods with at least one
+day of records in the range are counted.
+"""
+import numpy as np
+import pandas as pd
+
+from src.cube import FREQ_CODES  # type: ignore
+
+
+def _sparse_table(values: np.ndarray, op) -> list:
+    """Levels of a sparse table: level j holds ``op`` over windows of 2**j values"""
+    levels = [values]
+    width = 1
+    while 2 * width <= len(values):
+        prev = levels[-1]
+        levels.append(op(prev[:-width], prev[width:]))
+        width *= 2
+    return levels
+
+
+def _range_query(levels: list, lo: int, hi: int, op):
+    """``op`` over ``values[lo:hi + 1]`` from two overlapping windows"""
+    j = int(hi - lo + 1).bit_length() - 1
+    return op(levels[j][lo], levels[j][hi - (1 << j) + 1])
+
+
+class SeriesPrefix:
+    """
+    Range statistics of one aggregated series (stratum x measure x frequency)
+    """
+
+    def __init__(self, daily: pd.Series, freq: str):
+        """
+        :param daily: per-day totals indexed by (sorted, unique) date; days without records are absent
+        :param freq: "Daily", "Weekly", "Monthly", "Quarterly" or "Yearly"
+        """
+        self.name = daily.name
+        self.index_name = daily.index.name
+        self.freq = freq
+        days = pd.DatetimeIndex(daily.index).normalize()
+        self.empty = len(days) == 0
+        if self.empty:
+            return
+        self.day0 = days[0]
+        pos = (days - self.day0).days.to_numpy()
+        n_days = int(pos[-1]) + 1
+        on_day = np.zeros(n_days, dtype=np.int64)
+        on_day[pos] = daily.to_numpy(dtype=np.int64)
+        present = np.zeros(n_days, dtype=np.int64)
+        present[pos] = 1
+        self.day_sum = np.concatenate([[0], np.cumsum(on_day)])
+        self.day_count = np.concatenate([[0], np.cumsum(present)])
+
+        if freq == "Daily":
+            self.start = self.end = pos
+            self.labels = days.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        else:
+            periods = days.to_period(FREQ_CODES[freq]).unique()
+            self.start = np.maximum((periods.start_time - self.day0).days.to_numpy(), 0)
+            self.end = np.minimum((periods.end_time.normalize() - self.day0).days.to_numpy(), n_days - 1)
+            self.labels = periods.astype(str).to_numpy(dtype=object)
+        values = self.day_sum[self.end + 1] - self.day_sum[self.start]
+        self.values = values
+        self.sum = np.concatenate([[0], np.cumsum(values)])
+        self.sum_sq = np.concatenate([[0], np.cumsum(values.astype(np.float64) ** 2)])
+        self.min_table = _sparse_table(values, np.minimum)
+        self.max_table = _sparse_table(values, np.maximum)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays"""
+        if self.empty:
+            return 0
+        arrays = [self.day_sum, self.day_count, self.start, self.end, self.values, self.sum, self.sum_sq]
+        tables = self.min_table + self.max_table
+        return sum(a.nbytes for a in arrays + tables) + 8 * len(self.labels)
+
+    def _day(self, date) -> int:
+        return (pd.Timestamp(date).normalize() - self.day0).days
+
+    def _edge(self, i: int, lo: int, hi: int) -> tuple:
+        """Total of period ``i`` within days lo..hi, and whether it has records there"""
+        first, last = max(self.start[i], lo), min(self.end[i], hi)
+        total = int(self.day_sum[last + 1] - self.day_sum[first])
+        return total, bool(self.day_count[last + 1] - self.day_count[first])
+
+    def _range(self, start=None, end=None):
+        """
+        Periods of a date range
+        :return: None if the range has no records, otherwise (a, b, first, last):
+            ``a`` and ``b`` are the first and last periods overlapping the range,
+            ``first`` and ``last`` the (total, has records) of their parts in the range
+        """
+        if self.empty:
+            return None
+        lo = 0 if start is None else max(0, self._day(start))
+        hi = len(self.day_sum) - 2 if end is None else min(len(self.day_sum) - 2, self._day(end))
+        if lo > hi:
+            return None
+        a = int(np.searchsorted(self.end, lo, side="left"))
+        b = int(np.searchsorted(self.start, hi, side="right")) - 1
+        if a > b:
+            return None
+        first = self._edge(a, lo, hi)
+        last = self._edge(b, lo, hi) if b > a else (0, False)
+        if not first[1] and not last[1] and b - a < 2:
+            return None
+        return a, b, first, last
+
+    def _positions(self, a: int, b: int, first: tuple, last: tuple) -> np.ndarray:
+        """Periods returned for a range: the interior ones and the edges with records"""
+        head = [a] if first[1] else []
+        tail = [b] if last[1] else []
+        return np.concatenate([np.array(head, dtype=np.int64), np.arange(a + 1, b), np.array(tail, dtype=np.int64)])
+
+    def _local_prefix(self, a: int, b: int, first: tuple, last: tuple) -> np.ndarray:
+        """Cumulative totals of the range, one value per returned period, with a leading 0"""
+        base = first[0] if first[1] else 0
+        parts = [[0]]
+        if first[1]:
+            parts.append([base])
+        if b > a:
+            parts.append(base + self.sum[a + 2:b + 1] - self.sum[a + 1])
+            if last[1]:
+                parts.append([base + self.sum[b] - self.sum[a + 1] + last[0]])
+        return np.concatenate(parts).astype(np.int64)
+
+    def _series(self, values, span=None, dtype="int64") -> pd.Series:
+        """Series of the returned periods of a range, labelled as ``rollup`` labels them"""
+        if span is None:
+            return pd.Series([], dtype=dtype, name=self.name, index=pd.Index([], dtype=object, name=self.index_name))
+        index = pd.Index(self.labels[self._positions(*span)], name=self.index_name)
+        return pd.Series(values, index=index, name=self.name)
+
+    def series(self, start=None, end=None) -> pd.Series:
+        """
+        Totals per period within a date range (same as ``src.cube.rollup``)
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        span = self._range(start, end)
+        if span is None:
+            return self._series([])
+        return self._series(np.diff(self._local_prefix(*span)), span)
+
+    def cumulative(self, start=None, end=None) -> pd.Series:
+        """
+        Cumulative totals from the start of a date range
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        span = self._range(start, end)
+        if span is None:
+            return self._series([])
+        return self._series(self._local_prefix(*span)[1:], span)
+
+    def moving_average(self, window: int, start=None, end=None) -> pd.Series:
+        """
+        Mean of the last ``window`` periods, as ``rolling(window, min_periods=1).mean()``
+        on the series of the range
+        :param window: number of periods
+        :param start: first date included
+        :param end: last date included
+        :return: series indexed by period label
+        """
+        span = self._range(start, end)
+        if span is None:
+            return self._series([], dtype="float64")
+        prefix = self._local_prefix(*span)
+        upper = np.arange(1, len(prefix))
+        lower = np.maximum(upper - window, 0)
+        means = (prefix[upper] - prefix[lower]) / (upper - lower)
+        return self._series(means, span)
+
+    def stats(self, start=None, end=None) -> dict:
+        """
+        Descriptive statistics of the period totals within a date range
+        :param start: first date included
+        :param end: last date included
+        :return: dict with count, sum, mean, median, std (ddof=1), min and max
+        """
+        span = self._range(start, end)
+        if span is None:
+            nan = float("nan")
+            return {"count": 0, "sum": 0, "mean": nan, "median": nan, "std": nan, "min": nan, "max": nan}
+        a, b, first, last = span
+        edges = [total for total, has_records in (first, last) if has_records]
+        count = len(edges) + max(b - a - 1, 0)
+        total = sum(edges) + (int(self.sum[b] - self.sum[a + 1]) if b > a else 0)
+        sum_sq = sum(float(e) ** 2 for e in edges) + (self.sum_sq[b] - self.sum_sq[a + 1] if b > a else 0.0)
+        lows, highs = list(edges), list(edges)
+        if b - a > 1:
+            lows.append(_range_query(self.min_table, a + 1, b - 1, min))
+            highs.append(_range_query(self.max_table, a + 1, b - 1, max))
+        mean = total / count
+        var = (sum_sq - count * mean ** 2) / (count - 1) if count > 1 else float("nan")
+        return {
+            "count": count,
+            "sum": total,
+            "mean": mean,
+            # The only statistic reading the values of the range
+            "median": float(np.median(np.diff(self._local_prefix(*span)))),
+            "std": float(np.sqrt(max(var, 0.0))) if count > 1 else float("nan"),
+            "min": int(min(lows)),
+            "max": int(max(highs)),
+        }
@@ -0,0 +1,322 @@
+"""
+Append-only store of cleaned records with incrementally maintained counts.
+
+Layout of a store folder::
+
+    manifest.json           parts, watermark, version and the cube definition
+    part-00001.parquet ...  cleaned and classified records, one file per ingestion
+    cube-00003.parquet      daily count cube (src.cube) at version 3
+    alerts-00003.parquet    alert table (src.alerts) at version 3
+    keys-00003.parquet      key of every record ingested up to version 3
+
+New records are the incoming ones whose key (the record ID, or a hash of the
+row when there is no ID) is not stored yet, so late and backdated records are
+picked up and repeated ones skipped. Their free text is cleaned as by the batch
+pipeline (src.clean.clean_chunk), coded labels are kept as they are, and they
+are classified and written as a new part. Their cube is added to the stored
+cube, so the counts never need the full history, and the alerts are rescored
+from the first new day on. Readers load only the parts they have not seen yet.
+
+Usage: python -m src.store STORE_DIR NEW_FILE [--id-col record_id] [--classify]
+"""
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+
+from src.alerts import compute_alerts, update_alerts  # type: ignore
+from src.case_definitions import FISSA_RULES, classify  # type: ignore
+from src.clean import clean_chunk, is_text  # type: ignore
+from src.config import AGE_BINS, AGE_LABELS, DISEASES  # type: ignore
+from src.cube import COUNT_COL, build_cube, daily_totals  # type: ignore
+from src.schema import apply_schema, build_schema  # type: ignore
+
+MANIFEST = "manifest.json"
+
+
+def read_manifest(store_dir: str) -> dict:
+    """
+    Manifest of a store, or an empty manifest if the store does not exist yet
+    :param store_dir: store folder
+    :return: dict
+    """
+    try:
+        with open(os.path.join(store_dir, MANIFEST)) as f:
+            return json.load(f)
+    except OSError:
+        return {"version": 0, "parts": [], "rows": 0, "watermark": {}, "cube": None, "alerts": None, "keys": None}
+
+
+def store_version(store_dir: str) -> int:
+    """
+    Version of a store, increased by every ingestion that added records
+    :param store_dir: store folder
+    :return: version number (0 for an empty store)
+    """
+    return read_manifest(store_dir)["version"]
+
+
+def _write_atomic(df: pd.DataFrame, path: str, index: bool = False) -> None:
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=index)
+    os.replace(tmp, path)
+
+
+def record_keys(df: pd.DataFrame, id_col: str = None) -> pd.Series:
+    """
+    Key identifying each incoming record
+    :param df: incoming records, as read from the source file
+    :param id_col: record ID column, None to hash the values of the whole row
+    :return: series of IDs (as text) or of 64-bit row hashes, aligned on ``df``
+    """
+    if id_col is not None:
+        return df[id_col].astype(str).rename("key")
+    return pd.util.hash_pandas_object(df.astype(str), index=False).rename("key")
+
+
+def stored_keys(store_dir: str, manifest: dict, id_col: str = None) -> pd.Series:
+    """
+    Keys of the records already ingested
+    Stores written before the keys were kept get the IDs of their parts, or None
+    (the watermark is then used) when there is no ID.
+    :param store_dir: store folder
+    :param manifest: store manifest
+    :param id_col: record ID column
+    :return: series of keys, or None
+    """
+    if manifest.get("keys"):
+        return pd.read_parquet(os.path.join(store_dir, manifest["keys"]))["key"]
+    if not manifest["parts"]:
+        return pd.Series(dtype=object, name="key")
+    if id_col is None:
+        return None
+    parts = [pd.read_parquet(os.path.join(store_dir, part), columns=[id_col]) for part in manifest["parts"]]
+    return record_keys(pd.concat(parts, ignore_index=True), id_col)
+
+
+def new_records(df: pd.DataFrame, manifest: dict, date_col: str, id_col: str = None,
+                seen: pd.Series = None) -> pd.DataFrame:
+    """
+    Records not ingested yet
+    Records whose key is stored, or repeated in ``df``, are skipped, whatever their date.
+    Without stored keys (older stores without IDs), the date watermark is used
+    instead: records from the last inclusion day on are kept, that day included.
+    :param df: incoming records (may repeat records already ingested)
+    :param manifest: store manifest
+    :param date_col: inclusion date column
+    :param id_col: record ID column, None to compare whole rows
+    :param seen: output of ``stored_keys``
+    :return: the new records only
+    """
+    keys = record_keys(df, id_col)
+    fresh = ~keys.duplicated()
+    if seen is not None:
+        return df[fresh & ~keys.isin(seen)]
+    last = manifest["watermark"].get("date")
+    if last:
+        fresh &= pd.to_datetime(df[date_col], errors="coerce") >= pd.Timestamp(last).normalize()
+    return df[fresh]
+
+
+def prepare_records(df: pd.DataFrame, date_col: str, rules=None, duration_col: str = None) -> pd.DataFrame:
+    """
+    Clean, classify, type and derive the dashboard columns of new records
+    Free-text values are cleaned and empty records dropped as by the batch pipeline
+    (``src.clean.clean_chunk``); coded labels (country, gender) are kept as they are, as
+    in the cleaned CSV, and columns already read as numbers keep their type.
+    :param df: new raw or cleaned records
+    :param date_col: inclusion date column
+    :param rules: case definitions to apply (see src.case_definitions), None to keep the existing flags
+    :param duration_col: symptom duration column used by the definitions
+    :return: prepared records
+    """
+    schema = build_schema(df.columns, country="coded", gender="coded", **{date_col: "date"})
+    schema.update({col: "flag" for col in DISEASES if col in df.columns})
+    kept = [col for col in df.columns
+            if schema.get(col) == "coded" or (col not in schema and not is_text(df[col]))]
+    df = df.dropna(axis=0, how="all")
+    cleaned = clean_chunk(df.drop(columns=kept), schema)
+    df = pd.concat([cleaned, df.loc[cleaned.index, kept]], axis=1)[list(df.columns)]
+    df = apply_schema(df, {col: "coded" for col in kept if schema.get(col) == "coded"})
+    if rules is not None:
+        flags = classify(df, rules, duration_col=duration_col)
+        df[flags.columns] = flags
+        df = apply_schema(df, {col: "flag" for col in flags.columns})
+    if "age" in df.columns:
+        df["age_group"] = pd.cut(pd.to_numeric(df["age"], errors="coerce"), AGE_BINS, labels=AGE_LABELS)
+    return df
+
+
+def merge_cubes(cube: pd.DataFrame, delta: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    Add the counts of ``delta`` to ``cube``
+    :param cube: stored cube (or None)
+    :param delta: cube of the new records
+    :param keys: cell keys (``date`` and the dims)
+    :return: merged cube sorted by date
+    """
+    if cube is None or cube.empty:
+        return delta
+    merged = pd.concat([cube, delta], ignore_index=True)
+    merged = merged.groupby(list(keys), observed=True, dropna=False, sort=False).sum().reset_index()
+    return merged.sort_values("date", kind="stable", ignore_index=True)
+
+
+def append_records(store_dir: str, df: pd.DataFrame, date_col: str = "date_inclusion", id_col: str = None,
+                   dims=("country", "gender", "age_group"), rules=None, duration_col: str = None) -> dict:
+    """
+    Ingest the new records of ``df`` into a store
+    :param store_dir: store folder (created if needed)
+    :param df: incoming records; those already ingested are skipped
+    :param date_col: inclusion date column
+    :param id_col: record ID column, None to compare whole rows
+    :param dims: cube dimensions
+    :param rules: case definitions applied to the new records, None to keep existing flags
+    :param duration_col: symptom duration column used by the definitions
+    :return: dict with the number of new rows and the new version
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = read_manifest(store_dir)
+    seen = stored_keys(store_dir, manifest, id_col)
+    incoming = new_records(df, manifest, date_col, id_col, seen)
+    new = prepare_records(incoming, date_col, rules, duration_col)
+    if new.empty:
+        return {"rows": 0, "version": manifest["version"]}
+
+    version = manifest["version"] + 1
+    keys_file = None
+    if seen is not None:
+        keys = record_keys(incoming, id_col)
+        keys = pd.concat([seen, keys], ignore_index=True) if len(seen) else keys
+        keys_file = f"keys-{version:05d}.parquet"
+        _write_atomic(keys.to_frame(), os.path.join(store_dir, keys_file))
+    part = f"part-{version:05d}.parquet"
+    _write_atomic(new, os.path.join(store_dir, part))
+
+    measures = [col for col in DISEASES if col in new.columns]
+    dims = [d for d in dims if d in new.columns]
+    delta = build_cube(new, date_col, measures, dims)
+    old = pd.read_parquet(os.path.join(store_dir, manifest["cube"])) if manifest["cube"] else None
+    cube = merge_cubes(old, delta, ["date"] + dims)[["date"] + dims + measures + [COUNT_COL]]
+    cube_file = f"cube-{version:05d}.parquet"
+    _write_atomic(cube, os.path.join(store_dir, cube_file))
+
+    alerts_file = None
+    if "country" in dims:
+        daily = daily_totals(cube, measures, by="country")
+        if manifest.get("alerts"):
+            previous = pd.read_parquet(os.path.join(store_dir, manifest["alerts"]))
+            alerts = update_alerts(previous, daily, measures, new[date_col].min())
+        else:
+            alerts = compute_alerts(daily, measures)
+        alerts_file = f"alerts-{version:05d}.parquet"
+        _write_atomic(alerts, os.path.join(store_dir, alerts_file), index=True)
+
+    watermark = dict(manifest["watermark"])
+    last = new[date_col].max()
+    if watermark.get("date"):
+        last = max(last, pd.Timestamp(watermark["date"]))
+    watermark["date"] = str(last)
+    manifest.update({
+        "version": version,
+        "parts": manifest["parts"] + [part],
+        "rows": manifest["rows"] + len(new),
+        "watermark": watermark,
+        "cube": cube_file,
+        "alerts": alerts_file,
+        "keys": keys_file,
+        "date_col": date_col,
+        "dims": dims,
+        "measures": measures,
+    })
+    tmp = os.path.join(store_dir, f"{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(store_dir, MANIFEST))
+
+    # Older cubes and alerts are no longer referenced; keep the previous ones for readers still on them
+    for prefix in ("cube", "alerts", "keys"):
+        for path in sorted(glob.glob(os.path.join(store_dir, f"{prefix}-*.parquet")))[:-2]:
+            os.remove(path)
+    return {"rows": len(new), "version": version}
+
+
+def _sort_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Unordered categoricals with sorted categories, as when the CSV is read (and in src.rowstore)"""
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and not dtype.ordered:
+            df[col] = df[col].cat.reorder_categories(sorted(dtype.categories))
+    return df
+
+
+def read_parts(store_dir: str, parts) -> pd.DataFrame:
+    """
+    Records of some parts of a store
+    :param store_dir: store folder
+    :param parts: part file names, as listed in the manifest
+    :return: records, in part order (empty dataframe without parts)
+    """
+    added = [pd.read_parquet(os.path.join(store_dir, part)) for part in parts]
+    if not added:
+        return pd.DataFrame()
+    frame = pd.concat(added, ignore_index=True)
+    # Parts have their own category sets; restore the categoricals lost by concat
+    for col in added[0].columns:
+        if isinstance(added[0][col].dtype, pd.CategoricalDtype) and frame[col].dtype == object:
+            frame[col] = frame[col].astype("category")
+    return _sort_categories(frame)
+
+
+def read_cube(store_dir: str, manifest: dict) -> pd.DataFrame:
+    """
+    Count cube of a store version
+    :param store_dir: store folder
+    :param manifest: output of ``read_manifest``
+    :return: cube dataframe (see src.cube)
+    """
+    return _sort_categories(pd.read_parquet(os.path.join(store_dir, manifest["cube"])))
+
+
+def load_store(store_dir: str) -> tuple:
+    """
+    Records and cube of a store (see ``read_parts`` to read only the newer parts)
+    :param store_dir: store folder
+    :return: (records, cube) dataframes
+    """
+    manifest = read_manifest(store_dir)
+    if not manifest["parts"]:
+        return pd.DataFrame(), pd.DataFrame()
+    return read_parts(store_dir, manifest["parts"]), read_cube(store_dir, manifest)
+
+
+def load_alerts(store_dir: str) -> pd.DataFrame:
+    """
+    Alert table of a store, as maintained by the ingestion
+    :param store_dir: store folder
+    :return: output of ``src.alerts.compute_alerts``, None if the store has no alerts
+    """
+    name = read_manifest(store_dir).get("alerts")
+    return pd.read_parquet(os.path.join(store_dir, name)) if name else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new surveillance records to a FISSA store")
+    parser.add_argument("store_dir")
+    parser.add_argument("path", help="CSV or Parquet file with the new (or all) records")
+    parser.add_argument("--date-col", default="date_inclusion")
+    parser.add_argument("--id-col", default=None)
+    parser.add_argument("--classify", action="store_true", help="apply FISSA_RULES to the new records")
+    parser.add_argument("--duration-col", default="duration_of_symptoms")
+    args = parser.parse_args()
+
+    df = pd.read_parquet(args.path) if args.path.endswith(".parquet") else pd.read_csv(args.path)
+    result = append_records(args.store_dir, df, args.date_col, args.id_col,
+                            rules=FISSA_RULES if args.classify else None, duration_col=args.duration_col)
+    print(f"{result['rows']} new records, store version {result['version']}")
+
+
+if __name__ == "__main__":
+    main()
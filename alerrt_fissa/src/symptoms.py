@@ -0,0 +1,115 @@
+"""
+Symptom analytics on bit-packed 0/1 flags.
+
+The symptom and disease flags of each record are packed into one unsigned
+integer (bit ``j`` set when flag ``j`` is 1), built once per data version
+and kept in the order of the date-sorted records. For a country and date
+range, the codes of the selected records are counted with ``bincount`` (one
+counter per possible combination, at most ``2**16``). Everything else is
+computed from these combination counts, not from the records:
+
+- marginal counts and conditional frequencies P(symptom | disease)
+- co-occurrence: ``X.T @ (w * X)`` over the distinct combinations ``X``
+  (0/1 matrix) weighted by their counts ``w``
+- the most frequent symptom combinations
+
+so the cost per query is one pass over 1 or 2 bytes per selected record.
+"""
+import numpy as np
+import pandas as pd
+
+# Flags a code can hold (uint64)
+MAX_FLAGS = 64
+
+# Codes counted at a time by ``count_combinations`` (bincount converts them to int64)
+BLOCK = 1 << 20
+
+
+def pack_flags(df: pd.DataFrame, columns) -> np.ndarray:
+    """
+    One integer per record with bit ``j`` set when ``columns[j]`` is 1
+    :param df: records
+    :param columns: 0/1 columns (missing values count as 0)
+    :return: uint8 / uint16 / uint32 / uint64 array
+    """
+    columns = list(columns)
+    if len(columns) > MAX_FLAGS:
+        raise ValueError(f"at most {MAX_FLAGS} flags can be packed, got {len(columns)}")
+    dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(t).bits >= len(columns))
+    bits = np.zeros(len(df), dtype=dtype)
+    for j, col in enumerate(columns):
+        bits |= (df[col] == 1).to_numpy(dtype=bool, na_value=False).astype(dtype) << dtype(j)
+    return bits
+
+
+def count_combinations(bits: np.ndarray) -> pd.Series:
+    """
+    Number of records of each flag combination
+    :param bits: output of ``pack_flags`` (or a selection of it)
+    :return: counts indexed by combination code, present combinations only
+    """
+    if bits.dtype.itemsize <= 2:
+        counts = np.zeros(1 << (8 * bits.dtype.itemsize), dtype=np.int64)
+        for i in range(0, len(bits), BLOCK):
+            counts += np.bincount(bits[i:i + BLOCK], minlength=len(counts))
+        codes = np.flatnonzero(counts)
+        return pd.Series(counts[codes], index=codes.astype(np.uint64))
+    codes, counts = np.unique(bits, return_counts=True)
+    return pd.Series(counts, index=codes.astype(np.uint64))
+
+
+def unpack(codes: np.ndarray, n_flags: int) -> np.ndarray:
+    """
+    0/1 matrix of packed codes
+    :param codes: packed codes
+    :param n_flags: number of flags
+    :return: int8 array (codes x flags)
+    """
+    codes = np.asarray(codes, dtype=np.uint64)
+    return ((codes[:, None] >> np.arange(n_flags, dtype=np.uint64)) & np.uint64(1)).astype(np.int8)
+
+
+def symptom_report(combinations: pd.Series, symptoms, diseases, disease: str, top: int = 10) -> dict:
+    """
+    Symptom views of a disease from the combination counts of a selection
+    :param combinations: output of ``count_combinations`` on codes packed as symptoms + diseases
+    :param symptoms: symptom columns (the first bits)
+    :param diseases: disease columns (the next bits)
+    :param disease: disease of interest
+    :param top: number of symptom combinations returned
+    :return: dict with ``cases`` and ``records``, ``counts`` (cases with each symptom),
+        ``conditional`` (P(symptom | disease) and P(symptom | no disease)), ``cooccurrence``
+        (cases with both symptoms, symptoms x symptoms) and ``combinations`` (most frequent
+        symptom sets among the cases, with their count and share)
+    """
+    symptoms, diseases = list(symptoms), list(diseases)
+    flags = unpack(combinations.index.to_numpy(), len(symptoms) + len(diseases))
+    weights = combinations.to_numpy(dtype=np.int64)
+    is_case = flags[:, len(symptoms) + diseases.index(disease)].astype(bool)
+    x = flags[:, :len(symptoms)].astype(np.int64)
+    cases, others = int(weights[is_case].sum()), int(weights[~is_case].sum())
+    in_cases = weights[is_case] @ x[is_case]
+    in_others = weights[~is_case] @ x[~is_case]
+    cooccurrence = x[is_case].T @ (weights[is_case, None] * x[is_case])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        conditional = pd.DataFrame({
+            f"P(symptom | {disease})": in_cases / cases,
+            f"P(symptom | no {disease})": in_others / others,
+        }, index=symptoms)
+    # Symptom sets of the cases, whatever the other diseases
+    sets = pd.Series(weights[is_case], index=x[is_case] @ (1 << np.arange(len(symptoms), dtype=np.int64)))
+    sets = sets.groupby(level=0).sum().sort_values(ascending=False, kind="stable").head(top)
+    labels = [" + ".join(s for s, on in zip(symptoms, row) if on) or "(none)"
+              for row in unpack(sets.index.to_numpy(), len(symptoms))]
+    return {
+        "cases": cases,
+        "records": cases + others,
+        "counts": pd.Series(in_cases, index=symptoms),
+        "conditional": conditional,
+        "cooccurrence": pd.DataFrame(cooccurrence, index=symptoms, columns=symptoms),
+        "combinations": pd.DataFrame({
+            "symptoms": labels,
+            "cases": sets.to_numpy(),
+            "share": sets.to_numpy() / cases if cases else np.nan,
+        }),
+    }
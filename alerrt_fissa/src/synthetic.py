@@ -0,0 +1,62 @@
+"""
+Synthetic FISSA-shaped data for benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+from src.config import DISEASES  # type: ignore
+
+COUNTRIES = ["Gambia", "Senegal", "Mali", "Guinea", "Burkina Faso", "Niger", "Ghana", "Nigeria"]
+
+# Symptom flags of the multi-country data (Dash.py) and of the Gambia CRF (app.py)
+FISSA_SYMPTOMS = ["sym_chest", "sym_neurologic", "sym_musc_bone_joint", "sym_skin_mucosa", "sym_ent", "sym_other"]
+GAMBIA_SYMPTOMS = [
+    "thorax_1", "orl_6", "thorax_2", "thorax_4", "syst_nev_1",
+    "muscl_1", "muscl_2", "peau_1", "peau_3", "thorax_3", "orl_5",
+]
+
+
+def make_clean_frame(n_rows: int, seed: int = 0, start: str = "2019-01-01", days: int = 5 * 365) -> pd.DataFrame:
+    """
+    Random case-level frame with the columns the dashboards expect
+    :param n_rows: number of records
+    :param seed: random seed
+    :param start: first inclusion date
+    :param days: number of days covered
+    :return: dataframe with typed columns (as produced by the Parquet cache)
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "record_id": np.arange(n_rows, dtype="int64"),
+        "date_inclusion": pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n_rows), unit="D"),
+        "country": pd.Categorical.from_codes(rng.integers(0, len(COUNTRIES), n_rows), COUNTRIES),
+        "gender": pd.Categorical.from_codes(rng.integers(0, 2, n_rows), ["Male", "Female"]),
+        "age": rng.integers(0, 90, n_rows).astype("float64"),
+    })
+    for disease in DISEASES:
+        df[disease] = (rng.random(n_rows) < 0.2).astype("int8")
+    for symptom in FISSA_SYMPTOMS:
+        df[symptom] = (rng.random(n_rows) < 0.3).astype("int8")
+    return df
+
+
+def make_gambia_frame(n_rows: int, seed: int = 0, start: str = "2022-01-01", days: int = 2 * 365) -> pd.DataFrame:
+    """
+    Random case-level frame with the columns of the Gambia dashboard (app.py)
+    :param n_rows: number of records
+    :param seed: random seed
+    :param start: first inclusion date
+    :param days: number of days covered
+    :return: dataframe as read from the cleaned Gambia CSV (sexe coded 1 / 2)
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "date_inc": pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n_rows), unit="D"),
+        "sexe": rng.integers(1, 3, n_rows).astype("int8"),
+        "age": rng.integers(0, 90, n_rows).astype("float64"),
+    })
+    for disease in ["arbovirus", "influ_like_ill"]:
+        df[disease] = (rng.random(n_rows) < 0.2).astype("int8")
+    for symptom in GAMBIA_SYMPTOMS:
+        df[symptom] = (rng.random(n_rows) < 0.3).astype("int8")
+    return df
@@ -0,0 +1,29 @@
+"""
+Shared fixtures: a small synthetic dataset (src.synthetic), as a frame and as
+the cleaned CSV the dashboards read.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+from src.synthetic import make_clean_frame  # noqa: E402
+
+DISEASE = "ILI"
+DATES = ("2021-03-01", "2022-09-30")
+
+
+@pytest.fixture(scope="session")
+def records():
+    """Synthetic records over two years, in no particular order"""
+    return make_clean_frame(5_000, start="2021-01-01", days=2 * 365)
+
+
+@pytest.fixture()
+def csv_path(records, tmp_path):
+    """The records written as a cleaned CSV; its caches are written next to it"""
+    path = tmp_path / "clean.csv"
+    records.to_csv(path, index=False)
+    return str(path)
@@ -0,0 +1,56 @@
+"""
+Breakdown cells (src.breakdowns) against group-bys of the records.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISEASE
+from src.breakdowns import breakdown, breakdown_cells, breakdown_chunks, crosstab  # type: ignore
+from src.config import DISEASES  # type: ignore
+from src.cube import COUNT_COL  # type: ignore
+from src.export import iter_slices  # type: ignore
+
+DIMS = ["country", "age_group", "gender"]
+
+
+@pytest.fixture(scope="module")
+def frame(records):
+    df = records.copy()
+    df["age_group"] = pd.cut(df["age"], [0, 5, 15, 50, 120], right=False)
+    # Missing dimension values are a cell of their own
+    df.loc[df.index[::97], "gender"] = np.nan
+    return df
+
+
+@pytest.fixture(scope="module")
+def cells(frame):
+    return breakdown_cells(frame, DISEASES, DIMS)
+
+
+@pytest.mark.parametrize("dim", DIMS)
+def test_breakdown_matches_groupby(frame, cells, dim):
+    expected = frame.groupby(dim, observed=False)[DISEASES].sum()
+    expected.insert(0, COUNT_COL, frame.groupby(dim, observed=False).size())
+    pd.testing.assert_frame_equal(breakdown(cells, dim), expected, check_dtype=False, check_categorical=False)
+
+
+def test_breakdown_of_a_country(frame, cells):
+    subset = frame[frame["country"] == "Mali"]
+    got = breakdown(cells, "gender", [DISEASE], country="Mali")
+    assert got[COUNT_COL].sum() == subset["gender"].notna().sum()
+    assert got[DISEASE].to_dict() == subset.groupby("gender", observed=False)[DISEASE].sum().to_dict()
+
+
+@pytest.mark.parametrize("value", [COUNT_COL, DISEASE])
+def test_crosstab_matches_pandas(frame, cells, value):
+    rows = frame if value == COUNT_COL else frame[frame[value] == 1]
+    expected = pd.crosstab(rows["age_group"], rows["gender"])
+    got = crosstab(cells, "age_group", "gender", value)
+    assert got.to_numpy().tolist() == expected.to_numpy().tolist()
+
+
+def test_chunks_add_up(frame, cells):
+    chunked = breakdown_chunks(iter_slices(frame, 700), DISEASES, DIMS)
+    for dim in DIMS:
+        pd.testing.assert_frame_equal(breakdown(chunked, dim), breakdown(cells, dim))
@@ -0,0 +1,49 @@
+"""
+Chunked exports (src.export) read back against the frame they were written from.
+"""
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import DISEASE
+from src.export import EXPORT_FORMATS, export_file  # type: ignore
+
+
+def read_back(out, fmt: str) -> pd.DataFrame:
+    if fmt == "Parquet":
+        return pd.read_parquet(out)
+    if fmt == "CSV (gzip)":
+        return pd.read_csv(gzip.GzipFile(fileobj=out))
+    return pd.read_csv(out)
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_round_trip(records, fmt):
+    with export_file(records, fmt, chunksize=777) as out:
+        got = read_back(out, fmt)
+    expected = records if fmt == "Parquet" else pd.read_csv(io.StringIO(records.to_csv(index=False)))
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_filtered(records, fmt):
+    with export_file(records, fmt, where=lambda chunk: chunk[DISEASE] == 1, chunksize=500) as out:
+        got = read_back(out, fmt)
+    assert len(got) == int((records[DISEASE] == 1).sum())
+    assert (got[DISEASE] == 1).all()
+
+
+def test_no_rows_keeps_the_header(records):
+    with export_file(records, "CSV", where=lambda chunk: chunk[DISEASE] > 1) as out:
+        got = pd.read_csv(out)
+    assert got.empty
+    assert list(got.columns) == list(records.columns)
+
+
+def test_header_is_quoted():
+    df = pd.DataFrame({"a,b": [1, 2], 'say "hi"': ["x", "y"]})
+    with export_file(df, "CSV") as out:
+        text = out.read().decode("utf-8")
+    assert text == df.to_csv(index=False)
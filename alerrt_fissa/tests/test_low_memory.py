@@ -0,0 +1,95 @@
+"""
+Low-memory mode (src.rowstore): every view and export against the in-memory
+engine over the same data.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATES
+from src.query import QueryEngine  # type: ignore
+from src.store import append_records  # type: ignore
+
+COUNTRIES = ["All", "Mali", "Nowhere"]
+DISEASES = ["ILI", "Malaria_case"]
+VIEWS = ["timeseries", "kpis", "gender_counts", "age_counts", "alerts", "cumulative", "series_stats",
+         "symptom_analysis"]
+
+
+def assert_same(x, y):
+    if isinstance(x, pd.DataFrame):
+        pd.testing.assert_frame_equal(x, y, check_dtype=False, check_categorical=False, check_index_type=False,
+                                      check_column_type=False)
+    elif isinstance(x, pd.Series):
+        pd.testing.assert_series_equal(x, y, check_dtype=False, check_categorical=False, check_index_type=False)
+    elif isinstance(x, dict):
+        assert x.keys() == y.keys()
+        for key in x:
+            assert_same(x[key], y[key])
+    elif isinstance(x, float) and np.isnan(x):
+        assert np.isnan(y)
+    else:
+        assert x == y
+
+
+@pytest.fixture(params=["csv", "store"])
+def engines(request, records, csv_path, tmp_path):
+    """(in-memory, low-memory) engines over the CSV or over a store; small batches"""
+    if request.param == "csv":
+        options = {"path": csv_path, "store_dir": None}
+    else:
+        store_dir = str(tmp_path / "store")
+        df = records.sort_values("date_inclusion", ignore_index=True)
+        for start in range(0, len(df), 2_000):
+            append_records(store_dir, df.iloc[start:start + 2_000], id_col="record_id")
+        options = {"store_dir": store_dir}
+    return (QueryEngine(**options, low_memory=False),
+            QueryEngine(**options, low_memory=True, ram_budget_mb=8))
+
+
+def test_meta(engines):
+    memory, low = engines
+    a, b = dict(memory.meta()), dict(low.meta())
+    a.pop("version")
+    b.pop("version")
+    assert a == b
+
+
+@pytest.mark.parametrize("country", COUNTRIES)
+def test_views(engines, country):
+    memory, low = engines
+    for disease in DISEASES:
+        for view in VIEWS:
+            assert_same(getattr(memory, view)(disease, country=country, start=DATES[0], end=DATES[1]),
+                        getattr(low, view)(disease, country=country, start=DATES[0], end=DATES[1]))
+        assert_same(memory.seasonal_profile(disease, country), low.seasonal_profile(disease, country))
+        assert_same(memory.season_compare(disease, country), low.season_compare(disease, country))
+    assert_same(memory.comparison(country, *DATES), low.comparison(country, *DATES))
+    assert_same(memory.quality_summary(country, *DATES), low.quality_summary(country, *DATES))
+    for dim in ["country", "age_group", "gender"]:
+        assert_same(memory.breakdown(dim, country), low.breakdown(dim, country))
+
+
+@pytest.mark.parametrize("country", ["All", "Mali"])
+def test_rows_and_exports(engines, country):
+    memory, low = engines
+    expected = memory.filter(country, *DATES)
+    assert_same(expected.reset_index(drop=True), low.filter(country, *DATES))
+    assert memory.row_count(country, *DATES) == low.row_count(country, *DATES) == len(expected)
+    for fmt in ["CSV", "Parquet"]:
+        read = pd.read_csv if fmt == "CSV" else pd.read_parquet
+        a = read(memory.export(country, *DATES, fmt=fmt, where=lambda chunk: chunk["ILI"] == 1))
+        b = read(low.export(country, *DATES, fmt=fmt, where=lambda chunk: chunk["ILI"] == 1))
+        # Low-memory exports are in source order
+        key = list(a.columns)
+        assert_same(a.sort_values(key, ignore_index=True), b.sort_values(key, ignore_index=True))
+
+
+def test_signals(engines):
+    memory, low = engines
+    assert_same(memory.signals(), low.signals())
+
+
+def test_cache_within_budget(csv_path):
+    engine = QueryEngine(path=csv_path, store_dir=None, low_memory=True, ram_budget_mb=64)
+    assert engine.cache_info()["max_bytes"] <= 64 * 1024 * 1024 // 8
@@ -0,0 +1,91 @@
+"""
+Query engine (src.query) against masks and group-bys of the records, as the
+dashboards computed the views before the engine.
+"""
+import pandas as pd
+import pytest
+
+from conftest import DATES, DISEASE
+from src.query import QueryEngine  # type: ignore
+
+
+def mask_filter(df, country, dates):
+    df = df[(df["date_inclusion"] >= pd.to_datetime(dates[0])) & (df["date_inclusion"] <= pd.to_datetime(dates[1]))]
+    if country != "All":
+        df = df[df["country"] == country]
+    return df
+
+
+@pytest.fixture()
+def engine(csv_path):
+    return QueryEngine(path=csv_path, store_dir=None)
+
+
+@pytest.mark.parametrize("country", ["All", "Mali"])
+def test_filter_and_row_count(engine, records, country):
+    expected = mask_filter(records, country, DATES)
+    got = engine.filter(country, *DATES)
+    assert engine.row_count(country, *DATES) == len(expected) == len(got)
+    assert sorted(got["record_id"]) == sorted(expected["record_id"])
+
+
+def test_filter_unknown_country(engine):
+    assert engine.filter("Nowhere", *DATES).empty
+    assert engine.row_count("Nowhere", *DATES) == 0
+
+
+@pytest.mark.parametrize("freq, code", [("Weekly", "W"), ("Monthly", "M"), ("Yearly", "Y")])
+@pytest.mark.parametrize("country", ["All", "Mali"])
+def test_timeseries_matches_groupby(engine, records, freq, code, country):
+    df = mask_filter(records, country, DATES)
+    expected = df.groupby(df["date_inclusion"].dt.to_period(code))[DISEASE].sum()
+    got = engine.timeseries(DISEASE, freq, country, *DATES)
+    assert got.index.tolist() == expected.index.astype(str).tolist()
+    assert got.tolist() == expected.tolist()
+
+
+def test_kpis(engine, records):
+    df = mask_filter(records, "All", DATES)
+    kpis = engine.kpis(DISEASE, "Weekly", "All", *DATES)
+    assert kpis["total"] == df[DISEASE].sum()
+    cases = df[df[DISEASE] == 1]
+    assert kpis["male_pct"] == int((cases["gender"] == "Male").sum() / len(cases) * 100)
+
+
+def test_counts_by_gender_and_age(engine, records):
+    df = mask_filter(records, "Mali", DATES)
+    by_gender = engine.gender_counts(DISEASE, "Mali", *DATES)
+    assert by_gender.to_dict() == df.groupby("gender", observed=True)[DISEASE].sum().to_dict()
+    assert engine.age_counts(DISEASE, "Mali", *DATES).sum() == df.loc[df["age"] < 120, DISEASE].sum()
+
+
+def test_results_are_shared(engine):
+    first = engine.timeseries(DISEASE, "Weekly", "All", *DATES)
+    hits = engine.cache_info()["hits"]
+    pd.testing.assert_series_equal(engine.timeseries(DISEASE, "Weekly", "All", *DATES), first)
+    assert engine.cache_info()["hits"] == hits + 1
+    # A caller changing its result does not change the shared one
+    expected = first.copy(deep=True)
+    first.iloc[0] = -1
+    pd.testing.assert_series_equal(engine.timeseries(DISEASE, "Weekly", "All", *DATES), expected)
+
+
+def test_unknown_values_are_rejected(engine):
+    with pytest.raises(ValueError):
+        engine.timeseries("Cholera")
+    with pytest.raises(ValueError):
+        engine.timeseries(DISEASE, freq="Hourly")
+
+
+def test_empty_dataset(records):
+    engine = QueryEngine.from_frame(records.iloc[:0])
+    meta = engine.meta()
+    assert meta["rows"] == 0 and meta["start"] is None and meta["end"] is None
+    assert engine.row_count() == 0
+    assert engine.timeseries(DISEASE).empty
+    assert engine.kpis(DISEASE)["total"] == 0
+    assert engine.alerts(DISEASE).empty
+    assert engine.signals().empty
+    assert engine.seasonal_profile(DISEASE).empty
+    assert engine.season_compare(DISEASE)["cases"] == 0
+    assert engine.quality_summary().empty
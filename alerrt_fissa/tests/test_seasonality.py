@@ -0,0 +1,36 @@
+"""
+Seasonal counts (src.seasonality): periods before a country's first record are
+not baseline periods of that country.
+"""
+import pandas as pd
+
+from conftest import DISEASE
+from src.config import DISEASES  # type: ignore
+from src.cube import build_cube, daily_totals  # type: ignore
+from src.seasonality import build_seasons, season_counts  # type: ignore
+
+START = pd.Timestamp("2022-01-01")
+
+
+def late_daily(records):
+    """Daily totals where Mali only reports from ``START``"""
+    df = records[(records["country"] != "Mali") | (records["date_inclusion"] >= START)]
+    return daily_totals(build_cube(df, "date_inclusion", DISEASES, dims=["country"]), DISEASES, by="country")
+
+
+def test_coverage_starts_at_first_record(records):
+    counts, complete = season_counts(late_daily(records), DISEASES, "month")
+    assert complete.shape == counts.shape
+    before = complete.index.get_level_values("year") < START.year
+    assert not complete.loc[before, (DISEASE, "Mali")].any()
+    assert complete.loc[before, (DISEASE, "All")].any()
+    # Whole months after the first record are complete for every country
+    assert complete.loc[(2022, 6)].all()
+
+
+def test_late_country_baseline(records):
+    profile = build_seasons(late_daily(records), DISEASES)["month"]["profile"]
+    # 2021, the only baseline year, is before Mali's first record
+    assert (profile.loc[(DISEASE, "Mali"), "years"] == 0).all()
+    assert profile.loc[(DISEASE, "Mali"), "median"].isna().all()
+    assert (profile.loc[(DISEASE, "All"), "years"] == 1).all()
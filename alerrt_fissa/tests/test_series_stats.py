@@ -0,0 +1,52 @@
+"""
+Prefix sums (src.series_stats) against the rollup of the per-day totals.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISEASE
+from src.config import DISEASES  # type: ignore
+from src.cube import build_cube, daily_totals, rollup  # type: ignore
+from src.series_stats import SeriesPrefix  # type: ignore
+
+RANGES = [(None, None), ("2021-03-03", "2022-09-28"), ("2021-06-15", "2021-06-15"), ("2030-01-01", None)]
+
+
+@pytest.fixture(scope="module")
+def daily(records):
+    return daily_totals(build_cube(records, "date_inclusion", DISEASES), DISEASES)
+
+
+@pytest.mark.parametrize("freq", ["Daily", "Weekly", "Monthly", "Quarterly", "Yearly"])
+@pytest.mark.parametrize("start, end", RANGES)
+def test_series_matches_rollup(daily, freq, start, end):
+    prefix = SeriesPrefix(daily[DISEASE], freq)
+    dates = None if start is None and end is None else (start or "1900-01-01", end or "2100-01-01")
+    expected = rollup(daily, DISEASE, freq, dates)
+    got = prefix.series(start, end)
+    pd.testing.assert_series_equal(got, expected, check_dtype=False, check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(prefix.cumulative(start, end), expected.cumsum(),
+                                   check_dtype=False, check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(prefix.moving_average(4, start, end), expected.rolling(4, min_periods=1).mean(),
+                                   check_dtype=False, check_names=False, check_index_type=False)
+
+
+@pytest.mark.parametrize("freq", ["Daily", "Weekly", "Monthly"])
+@pytest.mark.parametrize("start, end", RANGES)
+def test_stats_match_pandas(daily, freq, start, end):
+    dates = None if start is None and end is None else (start or "1900-01-01", end or "2100-01-01")
+    values = rollup(daily, DISEASE, freq, dates)
+    stats = SeriesPrefix(daily[DISEASE], freq).stats(start, end)
+    assert stats["count"] == len(values)
+    assert stats["sum"] == values.sum()
+    expected = {"mean": values.mean(), "median": values.median(), "std": values.std(),
+                "min": values.min(), "max": values.max()}
+    for name, value in expected.items():
+        assert np.isclose(stats[name], value, equal_nan=True), name
+
+
+def test_empty_series():
+    prefix = SeriesPrefix(pd.Series([], index=pd.DatetimeIndex([]), dtype="int64", name=DISEASE), "Weekly")
+    assert prefix.series().empty
+    assert prefix.stats()["count"] == 0
@@ -0,0 +1,86 @@
+"""
+Incremental ingestion (src.store): repeated, late and backdated records, and
+the views of a store against those of the same records loaded at once.
+"""
+import pandas as pd
+import pytest
+
+from conftest import DATES, DISEASE
+from src.query import QueryEngine  # type: ignore
+from src.store import append_records, read_manifest  # type: ignore
+
+
+@pytest.mark.parametrize("id_col", ["record_id", None])
+def test_overlapping_ingests(records, tmp_path, id_col):
+    df = records.sort_values("date_inclusion", ignore_index=True)
+    first = append_records(str(tmp_path), df.iloc[:3_000], id_col=id_col)
+    # The second export repeats the last records of the first one
+    second = append_records(str(tmp_path), df.iloc[2_500:], id_col=id_col)
+    again = append_records(str(tmp_path), df, id_col=id_col)
+    assert (first["rows"], second["rows"], again["rows"]) == (3_000, 2_000, 0)
+    assert read_manifest(str(tmp_path))["rows"] == len(df)
+
+
+def test_backdated_records_are_ingested(records, tmp_path):
+    df = records.sort_values("date_inclusion", ignore_index=True)
+    late = df.iloc[::10]
+    append_records(str(tmp_path), df.drop(late.index), id_col="record_id")
+    # Entered after the others, with inclusion dates before the watermark
+    assert append_records(str(tmp_path), late, id_col="record_id")["rows"] == len(late)
+
+
+def test_records_are_cleaned(records, tmp_path):
+    df = records.head(100).assign(comment="Fever")
+    append_records(str(tmp_path / "clean"), df, id_col="record_id")
+    # Case and padding of free text and an empty record do not reach the store
+    df["comment"] = "  FEVER "
+    df.loc[len(df)] = pd.NA
+    assert append_records(str(tmp_path / "raw"), df, id_col="record_id")["rows"] == 100
+    clean, raw = (QueryEngine(store_dir=str(tmp_path / name), low_memory=False) for name in ("clean", "raw"))
+    assert raw.filter()["comment"].tolist() == clean.filter()["comment"].tolist() == ["fever"] * 100
+    # Coded labels are kept as they are
+    assert sorted(raw.filter()["country"].unique()) == sorted(records.head(100)["country"].unique())
+
+
+def test_store_matches_csv(records, csv_path, tmp_path):
+    df = records.sort_values("date_inclusion", ignore_index=True)
+    for start in range(0, len(df), 1_500):
+        append_records(str(tmp_path), df.iloc[start:start + 1_500], id_col="record_id")
+    store = QueryEngine(store_dir=str(tmp_path), low_memory=False)
+    csv = QueryEngine(path=csv_path, store_dir=None, low_memory=False)
+    assert store.meta()["rows"] == csv.meta()["rows"]
+    for freq in ["Daily", "Weekly", "Monthly"]:
+        assert store.timeseries(DISEASE, freq, "All", *DATES).tolist() == csv.timeseries(DISEASE, freq, "All", *DATES).tolist()
+    assert store.kpis(DISEASE, "Weekly", "All", *DATES) == csv.kpis(DISEASE, "Weekly", "All", *DATES)
+
+
+def test_labels_match_csv(records, csv_path, tmp_path):
+    append_records(str(tmp_path), records, id_col="record_id")
+    store = QueryEngine(store_dir=str(tmp_path), low_memory=False)
+    csv = QueryEngine(path=csv_path, store_dir=None, low_memory=False)
+    assert store.meta()["countries"] == csv.meta()["countries"]
+    pd.testing.assert_frame_equal(store.breakdown("gender"), csv.breakdown("gender"), check_dtype=False,
+                                  check_index_type=False, check_categorical=False)
+
+
+def test_new_parts_are_merged(records, tmp_path):
+    # Each part spans the whole date range, so its records go between the loaded ones
+    df = records.sort_values("record_id", ignore_index=True)
+    engine = QueryEngine(store_dir=str(tmp_path), low_memory=False)
+    for start in range(0, len(df), 2_000):
+        append_records(str(tmp_path), df.iloc[start:start + 2_000], id_col="record_id")
+        merged = engine.data()
+        loaded = QueryEngine(store_dir=str(tmp_path), low_memory=False).data()
+        pd.testing.assert_frame_equal(merged["frame"], loaded["frame"])
+        pd.testing.assert_frame_equal(merged["daily"], loaded["daily"])
+        assert merged["parts"].keys() == loaded["parts"].keys()
+        for key, (rows, dates) in loaded["parts"].items():
+            assert (merged["parts"][key][0] == rows).all() and (merged["parts"][key][1] == dates).all()
+
+
+def test_missing_disease(records, tmp_path):
+    append_records(str(tmp_path), records.drop(columns=["SARI"]), id_col="record_id")
+    engine = QueryEngine(store_dir=str(tmp_path), low_memory=False)
+    assert "SARI" not in engine.meta()["diseases"]
+    with pytest.raises(ValueError):
+        engine.timeseries("SARI")